@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Benchmarks hors ligne (données synthétiques de bench/synth.py, sessions HTTP factices) des parseurs
+des fetchers et de chaque étape du build, comparés à bench/baselines.json.
+
+    python bench/run_bench.py                          # échelle small, échec si régression > 25 %
+    python bench/run_bench.py --scale medium --only 'build.*'
+    python bench/run_bench.py --scale medium --update  # réécrit les références de cette échelle
+
+Chaque cas est lancé --warmup fois hors chrono (imports, caches, allocations), puis --repeat fois: on
+retient la médiane, et le bruit relatif (écart interquartile / médiane) de chaque mesure. Une régression
+= médiane > référence × (1 + seuil) ET écart > --min-delta-ms, où le seuil vaut
+max(--threshold, 3 × bruit de la mesure), doublé sous --short-ms (cas de quelques ms, dominés par
+l'ordonnanceur). Code de sortie 1 si une régression ou un contrôle de résultat échoue. Les références et
+leur bruit (clé "_noise") dépendent de la machine: les régénérer (--update) sur la machine de CI avant de
+s'en servir comme seuil.
+"""
+import argparse, fnmatch, json, os, platform, shutil, statistics, sys, tempfile, time
+
+import synth
+from synth import SCALES
+
+import instrument
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+def case_eia_aggregate(p, tmp):
+    """aggregate_prices sur N états × M mois (états, régions ISO, US pondéré)."""
+    from fetch_eia import aggregate_prices
+    records = synth.eia_records(p["eia_states"], p["eia_months"])
+    def run(i):
+        return aggregate_prices(records)
+    def check(agg):
+        us = int((agg["level"] == "us").sum())
+        return None if us == p["eia_months"] else f"{us} mois US agrégés, attendu {p['eia_months']}"
+    return run, check
+
+def case_eia_fetch(p, tmp):
+    """fetch_us_commercial_price_monthly: pagination v2 + décodage JSON + agrégation."""
+    from fetch_eia import fetch_us_commercial_price_monthly
+    records = synth.eia_records(p["eia_states"], p["eia_months"])
+    page_size = 5000
+    session = synth.eia_session(records, page_size)
+    def run(i):
+        return fetch_us_commercial_price_monthly("bench", "2000-01", "2026-09", session=session, page_size=page_size)
+    def check(rows):
+        return None if len(rows) == p["eia_months"] else f"{len(rows)} lignes US, attendu {p['eia_months']}"
+    return run, check
+
+def case_vast_snapshot(p, tmp):
+    """pick_endpoint + iter_offers + stream_snapshot (snapshot + historique partitionné)."""
+    from fetch_vast_api import pick_endpoint, iter_offers, stream_snapshot
+    n = p["vast_offers"]
+    session = synth.vast_session(synth.vast_offers(n), 500)
+    def run(i):
+        out = os.path.join(tmp, f"vast_{i}")
+        chosen, first = pick_endpoint(session=session, page_size=500)
+        return stream_snapshot(iter_offers(chosen, first, session=session, page_size=500), chosen,
+                               out_path=os.path.join(out, "snapshot.csv"), history_root=os.path.join(out, "history"),
+                               snapshot_at=f"20260101T00000{i}Z")
+    def check(counts):
+        return None if sum(counts.values()) == n else f"{sum(counts.values())} offres écrites, attendu {n}"
+    return run, check
+
+def case_lambda_extract(p, tmp):
+    """extract_prices_from_html sur une page de cartes GPU."""
+    from fetch_lambda_gpu import extract_prices_from_html
+    html = synth.gpu_pricing_html(p["gpu_cards"])
+    def run(i):
+        return extract_prices_from_html(html)
+    def check(rows):
+        found = {r["gpu_model"] for r in rows}
+        return None if found == {"H100", "L4"} else f"GPU extraits: {sorted(found)}"
+    return run, check
+
+def case_openai_parse(p, tmp):
+    """fetch_openai_pricing: parsing d'une grande page de prix $/1M tokens."""
+    from fetch_openai_pricing import fetch_openai_pricing
+    session = synth.html_session("https://openai.com/pricing", synth.llm_pricing_html(p["html_models"]))
+    def run(i):
+        return fetch_openai_pricing("bench", session=session)
+    def check(rows):
+        n = p["html_models"]
+        return None if len(rows) == n else f"{len(rows)} modèles extraits, attendu {n}"
+    return run, check
+
+def case_build(p, tmp):
+    """build_monthly_series.main complet; les étapes build.* sont relevées via instrument."""
+    import build_monthly_series
+    paths = synth.write_build_inputs(os.path.join(tmp, "inputs"), p)
+    def run(i):
+        out = os.path.join(tmp, f"build_{i}.csv")
+        build_monthly_series.main([
+            "--start", p["start"], "--end", p["end"], "--out", out,
+            "--eia_prices", paths["eia"], "--gpu_overrides", paths["overrides"],
+            "--region_prices", paths["eia_regions"], "--company_regions", "", "--grid", paths["grid"],
+        ])
+        return out
+    def check(out):
+        import pandas as pd
+        df = pd.read_csv(out, usecols=["company", "cost_per_million_tokens_usd"])
+        if df["company"].nunique() != p["grid_entities"]:
+            return f"{df['company'].nunique()} entités en sortie, attendu {p['grid_entities']}"
+        return None if df["cost_per_million_tokens_usd"].notna().all() else "coûts manquants en sortie"
+    return run, check
+
+# Nom → préparation (hors chrono) renvoyant (run(i), check(résultat) → message d'erreur ou None)
+CASES = {
+    "eia.aggregate": case_eia_aggregate,
+    "eia.fetch_us_commercial": case_eia_fetch,
+    "vast.stream_snapshot": case_vast_snapshot,
+    "lambda.extract_prices": case_lambda_extract,
+    "openai.parse": case_openai_parse,
+    "build.main": case_build,
+}
+
+def _quiet(fn, *args):
+    """Exécute fn en muet (les scripts impriment leurs échantillons)."""
+    import contextlib, io
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args)
+
+def run_case(name, prepare, p, repeat, tmp, warmup=1):
+    """
+    Médiane et bruit relatif du cas et de chaque étape instrumentée émise pendant le cas:
+    ({mesure: secondes}, {mesure: (q3 - q1) / médiane}, erreur de contrôle ou None).
+    """
+    run, check = prepare(p, tmp)
+    samples, error = {}, None
+    for i in range(warmup + repeat):
+        n0 = len(instrument.records())
+        t0 = time.perf_counter()
+        result = _quiet(run, i)
+        dt = time.perf_counter() - t0
+        if i == 0:
+            error = check(result)
+        if i < warmup:
+            continue
+        samples.setdefault(name, []).append(dt)
+        for rec in instrument.records()[n0:]:
+            if rec["stage"] != name:
+                samples.setdefault(rec["stage"], []).append(rec["wall_s"])
+    return ({k: statistics.median(v) for k, v in samples.items()},
+            {k: spread(v) for k, v in samples.items()}, error)
+
+def spread(values):
+    """Écart interquartile relatif à la médiane (0 si moins de 4 mesures)."""
+    if len(values) < 4:
+        return 0.0
+    q1, _, q3 = statistics.quantiles(values, n=4)
+    med = statistics.median(values)
+    return (q3 - q1) / med if med > 0 else 0.0
+
+def case_threshold(base, noise, threshold, short_s):
+    """Seuil relatif d'une mesure: au moins 3 × son bruit, doublé pour les cas courts."""
+    thr = max(threshold, 3 * noise)
+    return 2 * thr if base < short_s else thr
+
+def compare(timings, baselines, threshold, min_delta, noise=None, short_s=0.0):
+    """
+    Lignes (mesure, secondes, référence, ratio, seuil, verdict) triées par nom. `noise`: {mesure: bruit relatif}
+    (le plus grand de la référence et du run courant).
+    """
+    out = []
+    for k in sorted(timings):
+        t, base = timings[k], baselines.get(k)
+        if base is None:
+            out.append((k, t, None, None, None, "new"))
+            continue
+        thr = case_threshold(base, (noise or {}).get(k, 0.0), threshold, short_s)
+        ratio = t / base if base > 0 else float("inf")
+        if ratio > 1 + thr and t - base > min_delta:
+            verdict = "REGRESSION"
+        elif ratio < 1 - min(thr, 0.5) and base - t > min_delta:
+            verdict = "faster"
+        else:
+            verdict = "ok"
+        out.append((k, t, base, ratio, thr, verdict))
+    return out
+
+def load_baselines(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_baselines(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp, path)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmarks synthétiques hors ligne avec seuils de régression.")
+    ap.add_argument("--scale", choices=list(SCALES), default="small")
+    ap.add_argument("--only", help="Cas à exécuter (motifs glob séparés par des virgules, ex: 'eia.*,build.main')")
+    ap.add_argument("--repeat", type=int, default=7, help="Exécutions chronométrées (médiane)")
+    ap.add_argument("--warmup", type=int, default=1, help="Exécutions hors chrono avant les mesures")
+    ap.add_argument("--threshold", type=float, default=0.25, help="Régression relative tolérée (0.25 = +25 %%)")
+    ap.add_argument("--min-delta-ms", type=float, default=5.0, help="Écart absolu minimal pour conclure (ms)")
+    ap.add_argument("--short-ms", type=float, default=50.0, help="Sous cette référence, seuil doublé (ms)")
+    ap.add_argument("--baselines", default=BASELINES)
+    ap.add_argument("--update", action="store_true", help="Réécrit les références de l'échelle avec ces mesures")
+    ap.add_argument("--out", help="JSON des mesures de ce run")
+    ap.add_argument("--list", action="store_true", help="Liste les cas puis sort")
+    args = ap.parse_args(argv)
+
+    if args.list:
+        for name, fn in CASES.items():
+            print(f"{name:<26} {(fn.__doc__ or '').strip()}")
+        return 0
+    patterns = [s.strip() for s in (args.only or "*").split(",") if s.strip()]
+    selected = {n: fn for n, fn in CASES.items() if any(fnmatch.fnmatchcase(n, pat) for pat in patterns)}
+    if not selected:
+        ap.error(f"--only: aucun cas ne correspond (cas: {', '.join(CASES)})")
+
+    p = SCALES[args.scale]
+    timings, noise, errors = {}, {}, {}
+    tmp = tempfile.mkdtemp(prefix="llmecon-bench-")
+    try:
+        for name, prepare in selected.items():
+            med, spr, err = run_case(name, prepare, p, args.repeat, os.path.join(tmp, name), args.warmup)
+            timings.update(med)
+            noise.update(spr)
+            if err:
+                errors[name] = err
+            print(f"{name:<26} {med[name] * 1000:10.1f} ms  ±{spr[name]:.0%}" + (f"  [contrôle: {err}]" if err else ""),
+                  flush=True)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    data = load_baselines(args.baselines)
+    baselines = data.get(args.scale, {})
+    base_noise = data.get("_noise", {}).get(args.scale, {})
+    worst = {k: max(v, base_noise.get(k, 0.0)) for k, v in noise.items()}
+    rows = compare(timings, baselines, args.threshold, args.min_delta_ms / 1000, worst, args.short_ms / 1000)
+    print(f"\nÉchelle {args.scale} | médiane de {args.repeat} (+{args.warmup} à vide) | seuil ≥ +{args.threshold:.0%}, "
+          f"×2 sous {args.short_ms:g} ms, et > {args.min_delta_ms:g} ms | {args.baselines}")
+    print(f"{'mesure':<26} {'ms':>10} {'réf ms':>10} {'ratio':>7} {'bruit':>6} {'seuil':>6}  verdict")
+    for k, t, base, ratio, thr, verdict in rows:
+        ref = f"{base * 1000:10.1f}" if base is not None else f"{'-':>10}"
+        r = f"{ratio:7.2f}" if ratio is not None else f"{'-':>7}"
+        th = f"{thr:6.0%}" if thr is not None else f"{'-':>6}"
+        print(f"{k:<26} {t * 1000:10.1f} {ref} {r} {worst[k]:6.0%} {th}  {verdict}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"scale": args.scale, "timings_s": timings, "noise": noise, "errors": errors}, f, indent=2)
+    if args.update:
+        if errors:
+            raise SystemExit(f"--update refusé: contrôles en échec {errors}")
+        data.setdefault(args.scale, {}).update({k: round(v, 6) for k, v in timings.items()})
+        data.setdefault("_noise", {}).setdefault(args.scale, {}).update({k: round(v, 4) for k, v in noise.items()})
+        data["_machine"] = {"python": platform.python_version(), "machine": platform.machine(),
+                            "processor": platform.processor() or platform.machine(), "cpus": os.cpu_count(),
+                            "updated": time.strftime("%Y-%m-%d")}
+        save_baselines(args.baselines, data)
+        print(f"Références {args.scale} mises à jour: {len(timings)} mesures → {args.baselines}")
+        return 0
+
+    regressions = [k for k, *_, verdict in rows if verdict == "REGRESSION"]
+    if regressions or errors:
+        print(f"ÉCHEC: {len(regressions)} régression(s) {regressions}, {len(errors)} contrôle(s) {sorted(errors)}",
+              file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
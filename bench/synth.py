@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Générateurs de données synthétiques (déterministes, graine fixe) pour les benchmarks, et une
+session HTTP factice qui sert des réponses préparées à l'avance: aucun accès réseau.
+
+    python bench/synth.py --scale medium --out /tmp/synth     # écrit les fichiers pour inspection
+"""
+import argparse, json, os, sys
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from fetch_eia import BASE_URL, REGION_STATES
+from fetch_vast_api import CANDIDATES
+from price_extract import synthetic_page
+
+# Tailles par échelle: small = secondes (CI), medium = croissance attendue, large = stress (10^6 offres)
+SCALES = {
+    "small": dict(eia_states=52, eia_months=36, vast_offers=1_000, html_models=500, gpu_cards=200,
+                  csv_rows=2_000, grid_entities=20, grid_freq="weekly", start="2023-08", end="2026-09"),
+    "medium": dict(eia_states=60, eia_months=240, vast_offers=100_000, html_models=5_000, gpu_cards=5_000,
+                   csv_rows=50_000, grid_entities=100, grid_freq="daily", start="2015-01", end="2026-09"),
+    "large": dict(eia_states=60, eia_months=600, vast_offers=1_000_000, html_models=50_000, gpu_cards=50_000,
+                  csv_rows=1_000_000, grid_entities=500, grid_freq="daily", start="2000-01", end="2026-09"),
+}
+
+STATES = sorted({s for sts in REGION_STATES.values() for s in sts} | {"AK", "HI"})
+GPU_NAMES = ["H100 SXM", "H100 PCIE", "H200", "A100 SXM4", "A100 PCIE", "L4", "RTX 4090", "A6000"]
+
+def months(n, end="2026-09"):
+    """n mois 'YYYY-MM' se terminant à `end` (inclus)."""
+    y, m = int(end[:4]), int(end[5:7])
+    k = y * 12 + m - 1
+    return [f"{i // 12:04d}-{i % 12 + 1:02d}" for i in range(k - n + 1, k + 1)]
+
+def state_codes(n):
+    """Vrais codes état d'abord, puis codes fictifs à 2 lettres (hors REGION_STATES)."""
+    fake = [f"{a}{b}" for a in "QXZ" for b in "ABCDEFGHIJKLMNOPQRSTUVWXYZ"]
+    return (STATES + fake)[:n]
+
+def eia_records(n_states, n_months, seed=0):
+    """
+    Enregistrements retail-sales v2 (période × état), plus le total US et des divisions census que
+    l'agrégation doit écarter; revenue/sales en texte comme dans l'API, quelques valeurs manquantes.
+    """
+    rng = np.random.default_rng(seed)
+    ids = state_codes(n_states) + ["US", "NEW", "PACC", "MATL"]
+    periods = months(n_months)
+    sales = rng.uniform(500, 20_000, (len(periods), len(ids)))
+    price = rng.uniform(0.08, 0.30, (len(periods), len(ids)))
+    holes = rng.random((len(periods), len(ids))) < 0.005
+    out = []
+    for i, p in enumerate(periods):
+        for j, s in enumerate(ids):
+            out.append({
+                "period": p, "stateid": s, "stateDescription": s, "sectorid": "COM",
+                "sectorName": "commercial",
+                "revenue": None if holes[i, j] else f"{sales[i, j] * price[i, j]:.5f}",
+                "sales": f"{sales[i, j]:.5f}",
+                "revenue-units": "million dollars", "sales-units": "million kilowatt hours",
+            })
+    return out
+
+def vast_offers(n, seed=0):
+    rng = np.random.default_rng(seed)
+    names = rng.integers(len(GPU_NAMES), size=n)
+    dph = rng.uniform(0.2, 6.0, n).round(4)
+    spot = rng.random(n) < 0.3
+    return [{
+        "id": 1_000_000 + i, "gpu_name": GPU_NAMES[names[i]], "num_gpus": int(1 + i % 8), "dph": float(dph[i]),
+        "geolocation": f"Region {i % 37}, US" if i % 5 else None, "country": "US",
+        "is_spot": bool(spot[i]), "reliability": 0.99, "cpu_cores": 32, "disk_space": 512.0,
+    } for i in range(n)]
+
+def gpu_pricing_html(n_cards, seed=0):
+    """Page de prix cloud GPU: une carte par offre (nom, puis prix '/ GPU / hr' quelques blocs plus bas)."""
+    rng = np.random.default_rng(seed)
+    names = rng.integers(len(GPU_NAMES), size=n_cards)
+    price = rng.uniform(0.4, 5.0, n_cards)
+    cards = "".join(
+        f"<div class='card'><h3>NVIDIA {GPU_NAMES[names[i]]}</h3><ul><li>{8 * (1 + i % 8)} vCPUs</li>"
+        f"<li>{1 + i % 8}x GPU</li></ul><p>${price[i]:.2f} / GPU / hr</p></div>"
+        for i in range(n_cards))
+    return ("<html><head><style>.card{}</style></head><body><nav>Pricing</nav>"
+            f"<section>{cards}</section><script>var p = '$9 / hr';</script></body></html>")
+
+def llm_pricing_html(n_models):
+    """Page de prix LLM ($/1M input/output): celle de price_extract, profondément imbriquée."""
+    return synthetic_page(n_models)
+
+def write_build_inputs(out_dir, p, seed=0):
+    """
+    Intrants du build à l'échelle `p`: EIA US + par région (CSV), overrides $/GPU-h quotidiens
+    (décimales à virgule, trous), grille JSON + table d'entités. Retour: dict des chemins.
+    """
+    import pandas as pd
+    rng = np.random.default_rng(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    periods = [f"{m}-01" for m in months(p["eia_months"])]
+    us = pd.DataFrame({"date": periods, "price_usd_per_kwh": rng.uniform(0.10, 0.16, len(periods)),
+                       "sector": "commercial", "region": "US_weighted", "source_series_id": "synthetic",
+                       "source_url": BASE_URL})
+    regions = state_codes(p["eia_states"]) + list(REGION_STATES)
+    reg = pd.DataFrame({"date": np.repeat(periods, len(regions)), "region": np.tile(regions, len(periods)),
+                        "price_usd_per_kwh": rng.uniform(0.07, 0.35, len(periods) * len(regions)),
+                        "sector": "commercial", "source_series_id": "synthetic", "source_url": BASE_URL})
+    days = pd.date_range(end=f"{p['end']}-28", periods=p["csv_rows"], freq="D").strftime("%Y-%m-%d")
+    h100 = pd.Series(rng.uniform(1.5, 4.0, len(days)).round(2)).astype(str).str.replace(".", ",", regex=False)
+    l4 = pd.Series(rng.uniform(0.4, 1.0, len(days)).round(2)).astype(str).str.replace(".", ",", regex=False)
+    h100[rng.random(len(days)) < 0.02] = ""
+    ovr = pd.DataFrame({"date": days, "H100": h100, "L4": l4, "source": "synthetic"})
+    n = p["grid_entities"]
+    pue = pd.Series(rng.uniform(1.05, 1.4, n).round(3))
+    pue[rng.random(n) < 0.2] = np.nan
+    ents = pd.DataFrame({"company": [f"Co{i:04d}" for i in range(n)],
+                         "region": [regions[i % len(regions)] for i in range(n)], "pue": pue})
+    paths = {k: os.path.join(out_dir, f) for k, f in (
+        ("eia", "eia_us.csv"), ("eia_regions", "eia_by_region.csv"), ("overrides", "gpu_hour_overrides.csv"),
+        ("entities", "entities.csv"), ("grid", "grid.json"))}
+    us.to_csv(paths["eia"], index=False)
+    reg.to_csv(paths["eia_regions"], index=False)
+    ovr.to_csv(paths["overrides"], index=False)
+    ents.to_csv(paths["entities"], index=False)
+    with open(paths["grid"], "w", encoding="utf-8") as f:
+        json.dump({"freq": p["grid_freq"], "entities": "entities.csv"}, f)
+    return paths
+
+class FakeResponse:
+    def __init__(self, body, status_code=200, content_type="application/json"):
+        self.content = body
+        self.status_code = status_code
+        self.headers = {"Content-Type": content_type, "Content-Length": str(len(body))}
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            import requests
+            raise requests.HTTPError(f"{self.status_code} (synthétique)", response=self)
+
+class FakeSession:
+    """
+    Remplace PooledSession dans les fetchers: `routes` = {préfixe d'URL: fonction(params) → FakeResponse}.
+    Les corps sont sérialisés à la préparation: le chrono ne mesure que le parsing côté fetcher.
+    """
+    def __init__(self, routes):
+        self.routes = routes
+        self.calls = 0
+
+    def get(self, url, params=None, headers=None, timeout=None, **kwargs):
+        self.calls += 1
+        for prefix, handler in self.routes.items():
+            if url.startswith(prefix):
+                return handler(params or {})
+        return FakeResponse(b"{}", 404)
+
+def paged_json(items, page_size, wrap):
+    """Pages pré-sérialisées indexées par offset; `wrap(page, total)` → objet JSON de la réponse."""
+    pages = {o: json.dumps(wrap(items[o:o + page_size], len(items))).encode()
+             for o in range(0, max(len(items), 1), page_size)}
+    empty = json.dumps(wrap([], len(items))).encode()
+    return lambda offset: pages.get(int(offset), empty)
+
+def eia_session(records, page_size):
+    page = paged_json(records, page_size, lambda data, total: {"response": {"total": str(total), "data": data}})
+    return FakeSession({BASE_URL: lambda params: FakeResponse(page(params.get("offset", 0)))})
+
+def vast_session(offers, page_size):
+    page = paged_json(offers, page_size, lambda data, total: {"offers": data})
+    return FakeSession({CANDIDATES[0]: lambda params: FakeResponse(page(params.get("offset", 0)))})
+
+def html_session(url, html):
+    body = html.encode("utf-8")
+    return FakeSession({url: lambda params: FakeResponse(body, content_type="text/html")})
+
+def main():
+    ap = argparse.ArgumentParser(description="Écrit les données synthétiques d'une échelle (inspection / profilage).")
+    ap.add_argument("--scale", choices=list(SCALES), default="small")
+    ap.add_argument("--out", required=True, help="Répertoire de sortie")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    p = SCALES[args.scale]
+    paths = write_build_inputs(args.out, p, args.seed)
+    docs = {
+        "eia_records.json": eia_records(p["eia_states"], p["eia_months"], args.seed),
+        "vast_offers.json": vast_offers(p["vast_offers"], args.seed),
+    }
+    for name, obj in docs.items():
+        with open(os.path.join(args.out, name), "w", encoding="utf-8") as f:
+            json.dump(obj, f)
+    for name, html in (("llm_pricing.html", llm_pricing_html(p["html_models"])),
+                       ("gpu_pricing.html", gpu_pricing_html(p["gpu_cards"], args.seed))):
+        with open(os.path.join(args.out, name), "w", encoding="utf-8") as f:
+            f.write(html)
+    print(f"Échelle {args.scale} écrite dans {args.out}: {sorted(os.listdir(args.out))}")
+    print("Intrants du build:", paths)
+
+if __name__ == "__main__":
+    main()
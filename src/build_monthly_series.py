@@ -1,15 +1,98 @@
 #!/usr/bin/env python3
-import argparse, os
+import argparse, json, os, sys
+
+if __name__ == "__main__" and "--incremental" in sys.argv[1:]:
+    # Cron: sortie à jour → on sort avant d'importer pandas (comme incremental.py)
+    from incremental import up_to_date
+    if up_to_date(sys.argv[1:]):
+        sys.exit(0)
+
 import pandas as pd
 import numpy as np
 
+from instrument import Steps, stage
+
+# Intrants par défaut du modèle (remplacés si overrides présents)
+DEFAULTS = {
+    "mix_mini_pct": 85.0,
+    "mix_flagship_pct": 15.0,
+    "gpu_price_hour_mini": 0.80,
+    "gpu_price_hour_flagship": 3.00,
+    "gpu_power_w_mini": 72.0,
+    "gpu_power_w_flagship": 700.0,
+    "throughput_tok_s_mini": 120.0,
+    "throughput_tok_s_flagship": 280.0,
+    "pue": 1.09,
+    "electricity_price_usd_kwh": 0.132,
+}
+
+# Abonnements break-even: marge cible + profils d’usage (tokens/mois/utilisateur) — ajuste comme tu veux
+TARGET_MARGIN = 0.70  # 70%
+TIER_LITE     = 200_000
+TIER_STANDARD = 1_000_000
+TIER_PRO      = 5_000_000
+TIERS = {"lite": TIER_LITE, "standard": TIER_STANDARD, "pro": TIER_PRO}
+
+OUTPUT_COLS = [
+    "date","company","run_rate_revenue_usd","tokens_volume_est_m",
+    "mix_mini_pct","mix_flagship_pct",
+    "gpu_type_mini","gpu_type_flagship",
+    "gpu_price_hour_mini","gpu_price_hour_flagship",
+    "gpu_power_w_mini","gpu_power_w_flagship",
+    "throughput_tok_s_mini","throughput_tok_s_flagship",
+    "pue","electricity_price_usd_kwh",
+    "price_per_million_tokens_usd","cost_per_million_tokens_usd","gross_margin_pct",
+    "break_even_lite_usd","break_even_standard_usd","break_even_pro_usd"
+]
+
+# Grille par défaut: mensuelle × OpenAI/Anthropic (remplaçable par --grid CONFIG)
+FREQ_ALIASES = {"monthly": "MS", "weekly": "W-MON", "daily": "D"}
+DEFAULT_GRID = {"freq": "MS", "entities": [{"company": "OpenAI"}, {"company": "Anthropic"}]}
+LARGE_CSV_ROWS = 1_000_000  # au-delà, write_outputs suggère .parquet
+
+# Colonnes d'une ligne de la grille et leurs valeurs par défaut (surchargeables par entité)
+ENTITY_DEFAULTS = {
+    "run_rate_revenue_usd": None,
+    "tokens_volume_est_m": None,
+    "mix_mini_pct": DEFAULTS["mix_mini_pct"],
+    "mix_flagship_pct": DEFAULTS["mix_flagship_pct"],
+    "gpu_type_mini": "L4",
+    "gpu_type_flagship": "H100",
+    "gpu_price_hour_mini": DEFAULTS["gpu_price_hour_mini"],
+    "gpu_price_hour_flagship": DEFAULTS["gpu_price_hour_flagship"],
+    "gpu_power_w_mini": DEFAULTS["gpu_power_w_mini"],
+    "gpu_power_w_flagship": DEFAULTS["gpu_power_w_flagship"],
+    "throughput_tok_s_mini": DEFAULTS["throughput_tok_s_mini"],
+    "throughput_tok_s_flagship": DEFAULTS["throughput_tok_s_flagship"],
+    "pue": DEFAULTS["pue"],
+    "electricity_price_usd_kwh": None,  # fallback par entité si pas d'EIA (sinon DEFAULTS)
+    "price_per_million_tokens_usd": None,
+    "cost_per_million_tokens_usd": None,
+    "gross_margin_pct": None,
+}
+
 def month_range(start_yyyy_mm: str, end_yyyy_mm: str):
     start = start_yyyy_mm + "-01"
     end   = end_yyyy_mm   + "-01"
     return pd.date_range(start=start, end=end, freq="MS")
 
+def grid_dates(start_yyyy_mm: str, end_yyyy_mm: str, freq="MS"):
+    """Dates de la grille: mensuelle (MS) ou plus fine jusqu'au dernier jour du mois de fin."""
+    if freq == "MS":
+        return month_range(start_yyyy_mm, end_yyyy_mm)
+    last = pd.Timestamp(end_yyyy_mm + "-01") + pd.offsets.MonthEnd(0)
+    return pd.date_range(start=start_yyyy_mm + "-01", end=last, freq=freq)
+
 def load_csv(path):
-    return pd.read_csv(path) if (path and os.path.exists(path)) else pd.DataFrame()
+    """Table d'intrants: chemin CSV / Parquet, ou DataFrame déjà en mémoire (llmecon run)."""
+    if isinstance(path, pd.DataFrame):
+        return path
+    if not (path and os.path.exists(path)):
+        return pd.DataFrame()
+    if path.endswith(".parquet") or os.path.isdir(path):
+        from storage import read_frame
+        return read_frame(path)
+    return pd.read_csv(path)
 
 def normalize_month_str(s):
     s = str(s)
@@ -21,82 +104,166 @@ def normalize_month_str(s):
         return f"{s[:4]}-{s[4:6]}-01"
     return None
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--start", required=True, help="YYYY-MM (ex: 2023-08)")
-    ap.add_argument("--end",   required=True, help="YYYY-MM (ex: 2026-09)")
-    ap.add_argument("--out",   required=True, help="CSV de sortie")
-    ap.add_argument("--eia_prices", default="data/eia_electricity_us_commercial.csv")
-    ap.add_argument("--gpu_overrides", default="data/gpu_hour_overrides.csv")
-    args = ap.parse_args()
-
-    # 1) Grille mensuelle OpenAI/Anthropic
-    dates = month_range(args.start, args.end)
-    companies = ["OpenAI", "Anthropic"]
-    base_rows = []
-    for d in dates:
-        d_iso = d.date().isoformat()
-        for company in companies:
-            base_rows.append({
-                "date": d_iso,
-                "company": company,
-                "run_rate_revenue_usd": None,
-                "tokens_volume_est_m": None,
-                "mix_mini_pct": 85.0,
-                "mix_flagship_pct": 15.0,
-                "gpu_type_mini": "L4",
-                "gpu_type_flagship": "H100",
-                # Valeurs par défaut (seront remplacées si overrides présents)
-                "gpu_price_hour_mini": 0.80,
-                "gpu_price_hour_flagship": 3.00,
-                "gpu_power_w_mini": 72.0,
-                "gpu_power_w_flagship": 700.0,
-                "throughput_tok_s_mini": 120.0,
-                "throughput_tok_s_flagship": 280.0,
-                "pue": 1.09,
-                "electricity_price_usd_kwh": None,
-                "price_per_million_tokens_usd": None,
-                "cost_per_million_tokens_usd": None,
-                "gross_margin_pct": None
-            })
-    df = pd.DataFrame(base_rows)
-
-    # 2) Électricité EIA (join exact + ffill)
-    df_eia = load_csv(args.eia_prices)
+def normalize_month_series(s):
+    """normalize_month_str vectorisé sur une Series (None si format inconnu)."""
+    s = s.astype(str)
+    n = s.str.len()
+    out = np.select([n == 7, n == 10, n == 6],
+                    [s + "-01", s, s.str[:4] + "-" + s.str[4:6] + "-01"], default=None)
+    return pd.Series(out, index=s.index, dtype=object)
+
+def parse_numeric(s):
+    """
+    Texte '€2,50' / '3 $' / nombres → float (NaN si illisible). Colonnes texte: seules les
+    valeurs distinctes sont analysées (factorize), puis redistribuées par leurs codes.
+    """
+    if s.dtype != object and not pd.api.types.is_string_dtype(s):
+        return pd.to_numeric(s, errors="coerce")
+    codes, uniq = pd.factorize(s)
+    u = pd.Series(uniq, dtype=object)
+    is_str = u.map(type).eq(str).to_numpy()
+    txt = u.where(~is_str, u[is_str].str.strip().str.replace(r"[€$ ]", "", regex=True).str.replace(",", ".", regex=False))
+    parsed = np.append(pd.to_numeric(txt, errors="coerce").to_numpy(dtype=float), np.nan)
+    return pd.Series(parsed[codes], index=s.index)
+
+def load_grid(grid=None):
+    """
+    Config de grille (chemin JSON, dict ou None → DEFAULT_GRID) → (freq, table des entités).
+    JSON: {"freq": "monthly" | "weekly" | "daily" | alias pandas,
+           "entities": [{"company": "OpenAI", "region": "CA", "pue": 1.12, ...}, ...] ou "entities.csv"}
+    company est la clé (unique: la série reste indexée par (date, company) en aval — Monte Carlo,
+    quote_service, load_db). Les colonnes hors ENTITY_DEFAULTS décrivent l'entité et sont reprises en
+    sortie ("region" remplace la pondération company_regions); les autres surchargent ses défauts.
+    """
+    base = ""
+    if isinstance(grid, str):
+        base = os.path.dirname(grid)
+        with open(grid, encoding="utf-8") as f:
+            grid = json.load(f)
+    cfg = {**DEFAULT_GRID, **(grid or {})}
+    freq = FREQ_ALIASES.get(cfg["freq"], cfg["freq"])
+    ents = cfg["entities"]
+    if isinstance(ents, str):
+        path = ents if os.path.exists(ents) or not base else os.path.join(base, ents)
+        ents = load_csv(path)
+        if ents.empty:
+            raise SystemExit(f"Table d'entités vide ou introuvable: {path}")
+    table = pd.DataFrame(ents)
+    if "company" not in table.columns or table.empty:
+        raise SystemExit("Grille: au moins une entité avec une colonne 'company'")
+    dups = sorted(table.loc[table["company"].duplicated(), "company"].astype(str).unique())
+    if dups:
+        raise SystemExit(f"Grille: company en double {dups[:5]}: la sortie est indexée par (date, company), "
+                         "donner un nom distinct à chaque entité (ex: 'OpenAI/gpt-4o')")
+    attrs = ["company"] + [c for c in table.columns if c != "company" and c not in ENTITY_DEFAULTS]
+    out = table[attrs].reset_index(drop=True)
+    for c, v in ENTITY_DEFAULTS.items():
+        if c in table.columns:
+            col = table[c].reset_index(drop=True)
+            out[c] = col.fillna(v) if v is not None else col
+        else:
+            out[c] = v
+    return freq, out
+
+def entity_columns(df):
+    """Colonnes d'entité de la grille (company + attributs de la config: model, region...)."""
+    known = set(ENTITY_DEFAULTS) | set(OUTPUT_COLS)
+    return ["company"] + [c for c in df.columns if c not in known and c not in ("date", "company")]
+
+def output_columns(df):
+    """OUTPUT_COLS avec les attributs d'entité (model, region...) après company."""
+    extra = entity_columns(df)[1:]
+    i = OUTPUT_COLS.index("company") + 1
+    return OUTPUT_COLS[:i] + extra + OUTPUT_COLS[i:]
+
+def asof_on_grid(src, dates, cols, pivot=None, bfill=False):
+    """
+    As-of arrière vectorisé: pour chaque date de `dates`, dernière valeur non nulle de chaque colonne
+    à une date source ≤ date de grille. `src` a une colonne date normalisée 'YYYY-MM-DD'; doublons:
+    la dernière ligne gagne; sources restreintes à l'étendue de la grille (comme un reindex);
+    `bfill` complète le début avec la première valeur. `pivot` (ex: "region") → une colonne par valeur.
+    """
+    subset = ["date"] + ([pivot] if pivot else [])
+    src = src.drop_duplicates(subset=subset, keep="last")
+    t = pd.to_datetime(src["date"], format="%Y-%m-%d", errors="coerce")
+    src = src.assign(_t=t)[t.between(dates[0], dates[-1])]
+    if pivot:
+        wide = src.pivot(index="_t", columns=pivot, values=cols)
+    else:
+        wide = src.set_index("_t")[cols].sort_index(kind="stable")
+    out = wide.reindex(wide.index.union(dates)).ffill().reindex(dates)
+    return out.bfill() if bfill else out
+
+def build_inputs(start, end, eia_prices=None, gpu_overrides=None, region_prices=None, company_regions=None,
+                 grid=None):
+    """
+    Étapes 1 → 4: grille dates × entités + intrants effectifs (EIA as-of ffill/bfill, prix régionaux
+    pondérés, overrides $/GPU-h, défauts par entité). `grid`: voir load_grid (défaut: mensuel ×
+    OpenAI/Anthropic). Retour: DataFrame date × entité, sans les colonnes de coût.
+    Chaque étape numérotée est mesurée (instrument: build.1_grid, build.2_eia, ...).
+    """
+    with Steps("build") as steps:
+        return _build_inputs(steps, start, end, eia_prices, gpu_overrides, region_prices, company_regions, grid)
+
+def _build_inputs(steps, start, end, eia_prices, gpu_overrides, region_prices, company_regions, grid):
+    # 1) Grille = produit cartésien dates × entités (dates en externe, entités en interne)
+    st = steps.next("1_grid")
+    freq, entities = load_grid(grid)
+    dates = grid_dates(start, end, freq)
+    n_d, n_e = len(dates), len(entities)
+    df = entities.iloc[np.tile(np.arange(n_e), n_d)].reset_index(drop=True)
+    df.insert(0, "date", np.repeat(dates.strftime("%Y-%m-%d").to_numpy(dtype=object), n_e))
+    st.rows_out = len(df)
+    st.set(freq=freq, entities=n_e)
+
+    # 2) Électricité EIA (as-of + ffill/bfill)
+    st = steps.next("2_eia")
+    df_eia = load_csv(eia_prices)
+    st.rows_in = len(df_eia)
     if not df_eia.empty and {"date","price_usd_per_kwh"}.issubset(df_eia.columns):
-        eia = df_eia.copy()
-        eia["date"] = eia["date"].apply(normalize_month_str)
-        eia = eia.dropna(subset=["date"])
-        eia = eia.sort_values("date").drop_duplicates(subset=["date"], keep="last")
-        grid = pd.date_range(df["date"].min(), df["date"].max(), freq="MS").strftime("%Y-%m-%d")
-        eia = eia.set_index("date").reindex(grid)
-        eia["price_usd_per_kwh"] = eia["price_usd_per_kwh"].ffill().bfill()
-        eia = eia.reset_index().rename(columns={"index":"date"})
-        df = df.merge(eia[["date","price_usd_per_kwh"]], on="date", how="left")
-        df["electricity_price_usd_kwh"] = df["price_usd_per_kwh"]
-        df = df.drop(columns=["price_usd_per_kwh"])
+        eia = df_eia.assign(date=normalize_month_series(df_eia["date"])).dropna(subset=["date"])
+        us = asof_on_grid(eia, dates, ["price_usd_per_kwh"], bfill=True)["price_usd_per_kwh"]
+        df["electricity_price_usd_kwh"] = np.repeat(us.to_numpy(), n_e)
+    # sinon: prix de l'entité s'il est configuré, puis DEFAULTS (fallback, étape 3.5)
+
+    # 2.5) Prix régionaux (états / ISO): clé "region" de l'entité, sinon poids company × region
+    st = steps.next("2.5_regions")
+    df_reg = load_csv(region_prices)
+    st.rows_in = len(df_reg)
+    weights = load_csv(company_regions)
+    if "region" in entities.columns:
+        weights = entities[["company", "region"]].assign(weight=1.0, _e=np.arange(n_e))
+    elif not weights.empty and {"company","region","weight"}.issubset(weights.columns):
+        weights = entities[["company"]].assign(_e=np.arange(n_e)).merge(weights[["company","region","weight"]], on="company")
     else:
-        df["electricity_price_usd_kwh"] = 0.132  # fallback
+        weights = pd.DataFrame()
+    if not df_reg.empty and not weights.empty and {"date","region","price_usd_per_kwh"}.issubset(df_reg.columns):
+        reg = df_reg.assign(date=normalize_month_series(df_reg["date"])).dropna(subset=["date"])
+        wide = asof_on_grid(reg, dates, "price_usd_per_kwh", pivot="region", bfill=True)
+        prices = wide.apply(parse_numeric).to_numpy(dtype=float)                    # (dates, régions)
+        w = weights.assign(weight=parse_numeric(weights["weight"])).dropna(subset=["weight"])
+        W = (w.pivot_table(index="_e", columns="region", values="weight", aggfunc="sum")
+              .reindex(index=range(n_e), columns=wide.columns).fillna(0.0).to_numpy())  # (entités, régions)
+        finite = np.isfinite(prices)
+        num = np.where(finite, prices, 0.0) @ W.T
+        den = finite.astype(float) @ W.T
+        with np.errstate(invalid="ignore", divide="ignore"):
+            regional = np.where(den > 0, num / den, np.nan).ravel()               # dates × entités
+        # Entités sans poids (ou régions inconnues): prix US
+        df["electricity_price_usd_kwh"] = pd.Series(regional).fillna(df["electricity_price_usd_kwh"])
 
-    # 3) Overrides $/GPU-h (H100/L4) — simple & robuste
-    ovr = load_csv(args.gpu_overrides)
+    # 3) Overrides $/GPU-h (H100/L4), as-of + ffill par colonne
+    st = steps.next("3_overrides")
+    ovr = load_csv(gpu_overrides)
+    st.rows_in = len(ovr)
     if not ovr.empty and {"date","H100","L4"}.issubset(ovr.columns):
-        o = ovr.copy()
-        o["date"] = o["date"].apply(normalize_month_str)
-        o = o.dropna(subset=["date"])
-        o = o.sort_values("date").drop_duplicates(subset=["date"], keep="last")
-        grid = pd.DataFrame({"date": pd.date_range(df["date"].min(), df["date"].max(), freq="MS").strftime("%Y-%m-%d")})
-        o = grid.merge(o[["date","H100","L4"]], on="date", how="left").sort_values("date").ffill()
-        df = df.merge(o, on="date", how="left")
-        if "H100" in df.columns:
-            df["gpu_price_hour_flagship"] = df["H100"].fillna(df["gpu_price_hour_flagship"])
-        if "L4" in df.columns:
-            df["gpu_price_hour_mini"] = df["L4"].fillna(df["gpu_price_hour_mini"])
-        for col in ["H100","L4"]:
-            if col in df.columns:
-                df = df.drop(columns=[col])
-
-    # 3.5) Sanity: forcer les types numériques (avant calculs)
+        o = ovr.assign(date=normalize_month_series(ovr["date"])).dropna(subset=["date"])
+        o = asof_on_grid(o, dates, ["H100","L4"])
+        df["gpu_price_hour_flagship"] = pd.Series(np.repeat(o["H100"].to_numpy(), n_e)).fillna(df["gpu_price_hour_flagship"])
+        df["gpu_price_hour_mini"] = pd.Series(np.repeat(o["L4"].to_numpy(), n_e)).fillna(df["gpu_price_hour_mini"])
+
+    # 3.5) Sanity: forcer les types numériques (avant calculs), puis défauts de l'entité en cas de trous
+    st = steps.next("3.5_numeric", rows_in=len(df))
     num_cols = [
         "gpu_price_hour_mini", "gpu_price_hour_flagship",
         "gpu_power_w_mini", "gpu_power_w_flagship",
@@ -104,24 +271,12 @@ def main():
         "pue", "electricity_price_usd_kwh",
         "mix_mini_pct", "mix_flagship_pct"
     ]
-    def _to_num(s):
-        if isinstance(s, str):
-            s = s.strip().replace("€","").replace("$","").replace(" ", "").replace(",", ".")
-        return pd.to_numeric(s, errors="coerce")
     for c in num_cols:
-        if c in df.columns:
-            df[c] = df[c].apply(_to_num)
-    # Valeurs par défaut en cas de trous
-    df["gpu_price_hour_mini"].fillna(0.80, inplace=True)
-    df["gpu_price_hour_flagship"].fillna(3.00, inplace=True)
-    df["gpu_power_w_mini"].fillna(72.0, inplace=True)
-    df["gpu_power_w_flagship"].fillna(700.0, inplace=True)
-    df["throughput_tok_s_mini"].fillna(120.0, inplace=True)
-    df["throughput_tok_s_flagship"].fillna(280.0, inplace=True)
-    df["pue"].fillna(1.09, inplace=True)
-    df["electricity_price_usd_kwh"].fillna(0.132, inplace=True)
-    df["mix_mini_pct"].fillna(85.0, inplace=True)
-    df["mix_flagship_pct"].fillna(15.0, inplace=True)
+        df[c] = parse_numeric(df[c])
+    for c, v in DEFAULTS.items():
+        per_entity = np.tile(parse_numeric(entities[c]).fillna(v).to_numpy(), n_d)
+        df[c] = df[c].fillna(pd.Series(per_entity))
+    st.rows_out = len(df)
 
     # 4) (Optionnel) paliers réalistes — décommente si tu veux plus de dynamique
     # df.loc[df["date"] >= "2025-01-01", "mix_mini_pct"] = 80.0
@@ -129,43 +284,136 @@ def main():
     # df.loc[df["date"] >= "2025-04-01", "throughput_tok_s_mini"] = 150.0
     # df.loc[df["date"] >= "2025-04-01", "throughput_tok_s_flagship"] = 320.0
     # df.loc[df["date"] >= "2025-06-01", "pue"] = 1.06
+    return df
 
-    # 5) Calculs coût / 1M tokens (ordre correct)
-    df["gpu_hours_1m_mini"] = 1_000_000.0 / (df["throughput_tok_s_mini"]     * 3600.0)
-    df["gpu_hours_1m_flag"] = 1_000_000.0 / (df["throughput_tok_s_flagship"] * 3600.0)
+def cost_per_million(x):
+    """
+    Coût / 1M tokens (mix mini/flagship). `x` = DataFrame ou dict de colonnes
+    (Series ou ndarray broadcastables) avec les noms de colonnes de la série.
+    """
+    gpu_hours_1m_mini = 1_000_000.0 / (x["throughput_tok_s_mini"]     * 3600.0)
+    gpu_hours_1m_flag = 1_000_000.0 / (x["throughput_tok_s_flagship"] * 3600.0)
 
-    df["elec_cost_1m_mini"] = (df["gpu_power_w_mini"]/1000.0)     * df["pue"] * df["gpu_hours_1m_mini"] * df["electricity_price_usd_kwh"]
-    df["elec_cost_1m_flag"] = (df["gpu_power_w_flagship"]/1000.0) * df["pue"] * df["gpu_hours_1m_flag"] * df["electricity_price_usd_kwh"]
+    elec_cost_1m_mini = (x["gpu_power_w_mini"]/1000.0)     * x["pue"] * gpu_hours_1m_mini * x["electricity_price_usd_kwh"]
+    elec_cost_1m_flag = (x["gpu_power_w_flagship"]/1000.0) * x["pue"] * gpu_hours_1m_flag * x["electricity_price_usd_kwh"]
 
-    df["gpu_cost_1m_mini"] = df["gpu_hours_1m_mini"] * df["gpu_price_hour_mini"]
-    df["gpu_cost_1m_flag"] = df["gpu_hours_1m_flag"] * df["gpu_price_hour_flagship"]
+    gpu_cost_1m_mini = gpu_hours_1m_mini * x["gpu_price_hour_mini"]
+    gpu_cost_1m_flag = gpu_hours_1m_flag * x["gpu_price_hour_flagship"]
 
-    df["total_1m_mini"] = df["elec_cost_1m_mini"] + df["gpu_cost_1m_mini"]
-    df["total_1m_flag"] = df["elec_cost_1m_flag"] + df["gpu_cost_1m_flag"]
+    total_1m_mini = elec_cost_1m_mini + gpu_cost_1m_mini
+    total_1m_flag = elec_cost_1m_flag + gpu_cost_1m_flag
 
-    df["cost_per_million_tokens_usd"] = (
-        df["total_1m_mini"] * (df["mix_mini_pct"]/100.0) +
-        df["total_1m_flag"] * (df["mix_flagship_pct"]/100.0)
+    return (
+        total_1m_mini * (x["mix_mini_pct"]/100.0) +
+        total_1m_flag * (x["mix_flagship_pct"]/100.0)
     )
 
-        # 5.5) Abonnements break-even selon profils d’usage (marge cible)
-    TARGET_MARGIN = 0.70  # 70%
-    # Profils d’usage (tokens/mois/utilisateur) — ajuste comme tu veux
-    TIER_LITE     = 200_000
-    TIER_STANDARD = 1_000_000
-    TIER_PRO      = 5_000_000
+def break_even_price(cost_per_million_usd, tokens, margin=TARGET_MARGIN):
+    """Prix d’abonnement mensuel pour `tokens`/mois à la marge cible."""
+    return cost_per_million_usd * (tokens / 1_000_000.0) / (1.0 - margin)
 
-    def price_for(tokens):
-        return df["cost_per_million_tokens_usd"] * (tokens / 1_000_000.0) / (1.0 - TARGET_MARGIN)
-
-    df["break_even_lite_usd"]     = price_for(TIER_LITE)
-    df["break_even_standard_usd"] = price_for(TIER_STANDARD)
-    df["break_even_pro_usd"]      = price_for(TIER_PRO)
+def compute_outputs(df):
+    """Étapes 5 → 6 sur les intrants de build_inputs: coût / 1M tokens + break-even par palier."""
+    # 5) Calculs coût / 1M tokens (ordre correct)
+    df["cost_per_million_tokens_usd"] = cost_per_million(df)
 
+    # 5.5) Abonnements break-even selon profils d’usage (marge cible)
+    for tier, tokens in TIERS.items():
+        df[f"break_even_{tier}_usd"] = break_even_price(df["cost_per_million_tokens_usd"], tokens)
 
-    # 6) Sortie
     df["price_per_million_tokens_usd"] = None
+    return df
+
+def write_outputs(df, out, store=None):
+    """Étape 6: série en CSV (ou Parquet typé si `out` finit par .parquet) + table llm_economics du store."""
+    out_dir = os.path.dirname(out)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    extra = entity_columns(df)[1:]  # attributs de grille (model, region...), hors schéma llm_economics
+    with stage("build.6_write", format="parquet" if out.endswith(".parquet") else "csv") as st:
+        st.rows_in = len(df)
+        if out.endswith(".parquet"):
+            from storage import write_frame
+            write_frame(df[output_columns(df)], out, "llm_economics", extra=extra)
+        else:
+            df[output_columns(df)].to_csv(out, index=False)
+        print(f"Wrote monthly series to {out} with {len(df)} rows")
+        if not out.endswith(".parquet") and len(df) > LARGE_CSV_ROWS:
+            # to_csv formate chaque flottant en Python: ~20 µs/ligne, ~10x l'écriture Parquet
+            print(f"Astuce: {len(df):,} lignes, --out {os.path.splitext(out)[0]}.parquet écrit ~10x plus vite")
+        if store:
+            from storage import write_table
+            write_table(df[output_columns(df)], "llm_economics", root=store, mode="overwrite", extra=extra)
+            print(f"Table llm_economics réécrite dans {store}")
+        st.rows_out = len(df)
+
+def positive_int(text):
+    """Type argparse: entier >= 1 (tailles de chunk, nb de processus)."""
+    try:
+        n = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"entier attendu (reçu {text!r})") from None
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"doit être >= 1 (reçu {n})")
+    return n
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--start", required=True, help="YYYY-MM (ex: 2023-08)")
+    ap.add_argument("--end",   required=True, help="YYYY-MM (ex: 2026-09)")
+    ap.add_argument("--out",   required=True, help="Sortie (.csv, ou .parquet typé)")
+    ap.add_argument("--eia_prices", default="data/eia_electricity_us_commercial.csv")
+    ap.add_argument("--gpu_overrides", default="data/gpu_hour_overrides.csv")
+    ap.add_argument("--region_prices", default="data/eia_electricity_us_commercial_by_region.csv",
+                    help="Prix par état / région ISO (sortie de fetch_eia.py)")
+    ap.add_argument("--company_regions", default="data/company_regions.csv",
+                    help="CSV company,region,weight (absent → prix US pour tous)")
+    ap.add_argument("--grid", metavar="CONFIG",
+                    help="JSON de la grille: fréquence (monthly/weekly/daily) + entités et leurs défauts (voir load_grid)")
+    ap.add_argument("--hourly", metavar="CONFIG",
+                    help="JSON des prix TOU / courbes horaires et profils de charge (voir hourly_energy.py)")
+    ap.add_argument("--store", help="Racine du stockage Parquet (ex: data/store): réécrit la table llm_economics")
+    ap.add_argument("--incremental", action="store_true",
+                    help="Ne recalcule que les mois dont les intrants ont changé (manifeste <out>.manifest.json)")
+    ap.add_argument("--monte-carlo", type=int, default=0, metavar="N",
+                    help="N tirages / mois → bandes de percentiles (voir --mc-config)")
+    ap.add_argument("--mc-config", default="data/monte_carlo.json", help="JSON des distributions par intrant")
+    ap.add_argument("--mc-out", help="CSV des bandes (défaut: <out>_mc.csv)")
+    ap.add_argument("--mc-workers", type=positive_int, default=None, help="Processus (défaut: nb de CPU)")
+    ap.add_argument("--mc-chunk", type=positive_int, default=250_000, help="Tirages par chunk")
+    ap.add_argument("--mc-seed", type=int, default=None, help="Graine (défaut: 'seed' du JSON)")
+    ap.add_argument("--mc-percentiles", default="5,50,95")
+    args = ap.parse_args(argv)
+
+    if args.hourly and args.grid and load_grid(args.grid)[0] != "MS":
+        ap.error("--hourly: grille mensuelle uniquement")
+    if args.incremental:
+        if args.monte_carlo:
+            ap.error("--incremental et --monte-carlo sont exclusifs")
+        if args.grid:
+            ap.error("--incremental: grille par défaut uniquement")
+        if not args.out.endswith(".csv"):
+            ap.error("--incremental: sortie CSV uniquement")
+        from incremental import run_incremental
+        run_incremental(args)
+        return
+
+    df = build_inputs(args.start, args.end, args.eia_prices, args.gpu_overrides,
+                      args.region_prices, args.company_regions, grid=args.grid)
+    if args.hourly:
+        # 4.5) Intégration horaire → intrants mensuels effectifs
+        from hourly_energy import apply_hourly
+        with stage("build.4.5_hourly") as st:
+            st.rows_in = len(df)
+            df = apply_hourly(df, args.hourly, args.company_regions)
+            st.rows_out = len(df)
 
+    with stage("build.5_costs") as st:
+        st.rows_in = len(df)
+        df = compute_outputs(df)
+        st.rows_out = len(df)
+
+    # 6) Sortie
     print("EIA uniques dans la sortie:",
           df["electricity_price_usd_kwh"].nunique(),
           "| min/max:",
@@ -174,22 +422,17 @@ def main():
     print("GPU $/h échantillon:",
           df[["date","company","gpu_price_hour_mini","gpu_price_hour_flagship"]].head(4).to_string(index=False))
 
-    cols = [
-        "date","company","run_rate_revenue_usd","tokens_volume_est_m",
-        "mix_mini_pct","mix_flagship_pct",
-        "gpu_type_mini","gpu_type_flagship",
-        "gpu_price_hour_mini","gpu_price_hour_flagship",
-        "gpu_power_w_mini","gpu_power_w_flagship",
-        "throughput_tok_s_mini","throughput_tok_s_flagship",
-        "pue","electricity_price_usd_kwh",
-        "price_per_million_tokens_usd","cost_per_million_tokens_usd","gross_margin_pct",
-        "break_even_lite_usd","break_even_standard_usd","break_even_pro_usd"
-    ]
-    out_dir = os.path.dirname(args.out)
-    if out_dir:
-        os.makedirs(out_dir, exist_ok=True)
-    df[cols].to_csv(args.out, index=False)
-    print(f"Wrote monthly series to {args.out} with {len(df)} rows")
+    write_outputs(df, args.out, args.store)
+
+    # 7) (Optionnel) Incertitude Monte Carlo sur les mêmes intrants
+    if args.monte_carlo > 0:
+        from monte_carlo import run_monte_carlo
+        mc_out = args.mc_out or os.path.splitext(args.out)[0] + "_mc.csv"
+        with stage("build.7_monte_carlo", draws=args.monte_carlo) as st:
+            st.rows_in = len(df)
+            run_monte_carlo(df, args.monte_carlo, args.mc_config, mc_out,
+                            workers=args.mc_workers, chunk_size=args.mc_chunk, seed=args.mc_seed,
+                            percentiles=[float(q) for q in args.mc_percentiles.split(",")])
 
 if __name__ == "__main__":
     main()
@@ -1,37 +1,46 @@
 #!/usr/bin/env python3
 import argparse, os, sys, time, csv
+from datetime import datetime
 import requests
-from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 
-def fetch_anthropic_pricing(user_agent: str):
+from http_client import make_session
+from instrument import stage
+from price_extract import extract_llm_prices
+
+def fetch_anthropic_pricing(user_agent: str, session=None):
     url = "https://www.anthropic.com/api#pricing"
     headers = {"User-Agent": user_agent}
-    r = requests.get(url, headers=headers, timeout=30)
+    r = (session or requests).get(url, headers=headers, timeout=30)
     r.raise_for_status()
-    soup = BeautifulSoup(r.text, "html.parser")
+    # Un seul passage sur le document: (modèle, $/1M input, $/1M output)
+    fetched_at = datetime.utcnow().strftime("%Y-%m-01")  # snapshot mensuel, comme Lambda / Vast
     rows = []
-    text = " ".join(soup.get_text(" ", strip=True).split())
-    # Heuristique: capture la section "Pricing"
-    # TODO: affiner avec des sélecteurs spécifiques si la page a des tables identifiables
-    if "pricing" in text.lower():
-        rows.append({"model":"unknown","price_per_million_input":"","price_per_million_output":"","currency":"USD","source_url":url,"raw":text[:1200]})
+    for rec in extract_llm_prices(r.text):
+        rows.append({"fetched_at": fetched_at, "model": rec["model"], "price_per_million_input": rec["price_per_million_input"],
+                     "price_per_million_output": rec["price_per_million_output"],
+                     "currency": "USD", "source_url": url, "raw": rec["raw"]})
     return rows
 
-def main():
+def write_csv(rows, out_path):
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    with open(out_path, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=["fetched_at","model","price_per_million_input","price_per_million_output","currency","source_url","raw"])
+        w.writeheader()
+        for r in rows:
+            w.writerow(r)
+
+def main(argv=None):
     load_dotenv()
     ua = os.getenv("HTTP_USER_AGENT", "llm-econ-research-bot/0.1")
     ap = argparse.ArgumentParser()
     ap.add_argument("--out", required=True, help="Chemin CSV de sortie")
-    args = ap.parse_args()
+    args = ap.parse_args(argv)
 
-    rows = fetch_anthropic_pricing(ua)
-    os.makedirs(os.path.dirname(args.out), exist_ok=True)
-    with open(args.out, "w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=["model","price_per_million_input","price_per_million_output","currency","source_url","raw"])
-        w.writeheader()
-        for r in rows:
-            w.writerow(r)
+    with stage("fetch.anthropic") as st:
+        rows = fetch_anthropic_pricing(ua, session=make_session())
+        write_csv(rows, args.out)
+        st.rows_out = len(rows)
     print(f"Wrote {len(rows)} rows to {args.out}")
 
 if __name__ == "__main__":
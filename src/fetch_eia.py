@@ -1,14 +1,33 @@
 #!/usr/bin/env python3
 import argparse, os, csv, requests
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+
+from http_client import make_session
+from instrument import bind, stage
 
 BASE_URL = "https://api.eia.gov/v2/electricity/retail-sales/data/"
 
-def fetch_us_commercial_price_monthly(api_key: str, start: str, end: str):
-    """
-    Prix commercial US mensuel = sum(revenue)/sum(sales) agrégé sur tous les états.
-    start/end: 'YYYY-MM'
-    Retour: liste {date (YYYY-MM-01), price_usd_per_kwh}
-    """
+PAGE_SIZE = 5000   # max accepté par l'API v2 par requête
+FIELDNAMES = ["date","price_usd_per_kwh","sector","region","source_series_id","source_url"]
+SOURCE_SERIES_ID = "retail-sales sum(revenue)/sum(sales) COM monthly"
+
+# Approximation état → ISO/RTO (ou grande région hors marché organisé) où tournent les datacenters.
+# Un état à cheval sur plusieurs ISO est rattaché à l'ISO majoritaire. AK/HI: états seuls.
+REGION_STATES = {
+    "CAISO":     ["CA"],
+    "ERCOT":     ["TX"],
+    "NYISO":     ["NY"],
+    "ISO-NE":    ["CT", "MA", "ME", "NH", "RI", "VT"],
+    "PJM":       ["DC", "DE", "MD", "NJ", "OH", "PA", "VA", "WV"],
+    "MISO":      ["AR", "IA", "IL", "IN", "LA", "MI", "MN", "MS", "ND", "WI", "MO"],
+    "SPP":       ["KS", "NE", "OK", "SD"],
+    "SOUTHEAST": ["AL", "FL", "GA", "KY", "NC", "SC", "TN"],
+    "NORTHWEST": ["ID", "MT", "OR", "UT", "WA", "WY"],
+    "SOUTHWEST": ["AZ", "CO", "NM", "NV"],
+}
+
+def _get_page(http, api_key, start, end, offset, length):
     params = {
         "api_key": api_key,
         "frequency": "monthly",
@@ -18,77 +37,171 @@ def fetch_us_commercial_price_monthly(api_key: str, start: str, end: str):
         # Ne **pas** fixer stateid → on récupère tous les états et on agrège
         "start": start,
         "end": end,
-        "length": 5000,                   # large pour couvrir états x mois
+        "offset": offset,
+        "length": length,
+        # Tri total (période puis état) → pages stables entre requêtes parallèles
         "sort[0][column]": "period",
         "sort[0][direction]": "asc",
+        "sort[1][column]": "stateid",
+        "sort[1][direction]": "asc",
     }
-    r = requests.get(BASE_URL, params=params, timeout=30)
+    r = http.get(BASE_URL, params=params, timeout=30)
     r.raise_for_status()
-    js = r.json()
-
-    # *** v2: les données sont sous 'response' -> 'data' ***
-    data = js.get("response", {}).get("data", [])
-
-    by_period = {}
-    for rec in data:
-        period = rec.get("period")   # 'YYYY-MM'
-        rev = rec.get("revenue")
-        sales = rec.get("sales")
-        if not period or rev is None or sales is None:
-            continue
-        try:
-            rev = float(rev)         # million dollars
-            sales = float(sales)     # million kWh
-        except ValueError:
-            continue
-        agg = by_period.setdefault(period, {"rev": 0.0, "sales": 0.0})
-        agg["rev"] += rev
-        agg["sales"] += sales
-
-    rows = []
-    for period in sorted(by_period.keys()):
-        agg = by_period[period]
-        if agg["sales"] > 0:
-            price = agg["rev"] / agg["sales"]  # USD/kWh (les "millions" s'annulent)
-            rows.append({
-                "date": f"{period}-01",
-                "price_usd_per_kwh": price,
-                "sector": "commercial",
-                "region": "US_weighted",
-                "source_series_id": "retail-sales sum(revenue)/sum(sales) COM monthly",
-                "source_url": BASE_URL,
-            })
-    return rows
-
-def main():
+    # *** v2: les données sont sous 'response' -> 'data' (+ 'total' = nb de lignes du filtre) ***
+    resp = r.json().get("response", {})
+    return resp.get("data", []), int(resp.get("total") or 0)
+
+def fetch_retail_sales_records(api_key: str, start: str, end: str, session=None,
+                               page_size=PAGE_SIZE, workers=4):
+    """
+    Tous les enregistrements retail-sales COM du window (pagination par offset).
+    La 1re page donne le total; les suivantes partent en parallèle.
+    """
+    http = session or requests
+    data, total = _get_page(http, api_key, start, end, 0, page_size)
+    offsets = list(range(page_size, total, page_size))
+    if offsets:
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            for page, _ in ex.map(bind(lambda o: _get_page(http, api_key, start, end, o, page_size)), offsets):
+                data.extend(page)
+    if total and len(data) != total:
+        print(f"[warn] EIA: {len(data)} enregistrements reçus pour un total annoncé de {total}")
+    return data
+
+def aggregate_prices(records):
+    """
+    Prix = sum(revenue)/sum(sales) par période, vectorisé (groupby), à trois niveaux:
+    chaque état (region = code état), chaque région de REGION_STATES, et US_weighted.
+    Seuls les codes état (2 lettres, hors 'US') sont agrégés: l'API renvoie aussi le total US
+    et les divisions census, qu'on ne veut pas compter deux fois.
+    Retour: DataFrame date, region, level (state|region|us), revenue, sales, price_usd_per_kwh.
+    """
+    cols = ["date", "region", "level", "revenue", "sales", "price_usd_per_kwh"]
+    df = pd.DataFrame.from_records(records, columns=["period", "stateid", "revenue", "sales"])
+    if df.empty:
+        return pd.DataFrame(columns=cols)
+    df["revenue"] = pd.to_numeric(df["revenue"], errors="coerce")   # million dollars
+    df["sales"] = pd.to_numeric(df["sales"], errors="coerce")       # million kWh
+    df = df.dropna(subset=["period", "revenue", "sales"])
+    ids = df["stateid"].astype("string")
+    df = df[ids.str.fullmatch(r"[A-Z]{2}", na=False) & (ids != "US")]
+
+    states = df.groupby(["period", "stateid"], as_index=False)[["revenue", "sales"]].sum()
+    states = states.rename(columns={"stateid": "region"}).assign(level="state")
+
+    membership = pd.DataFrame(
+        [(st, region) for region, sts in REGION_STATES.items() for st in sts],
+        columns=["region", "iso_region"],
+    )
+    regions = (states.merge(membership, on="region")
+                     .groupby(["period", "iso_region"], as_index=False)[["revenue", "sales"]].sum()
+                     .rename(columns={"iso_region": "region"}).assign(level="region"))
+
+    us = states.groupby("period", as_index=False)[["revenue", "sales"]].sum().assign(region="US_weighted", level="us")
+
+    out = pd.concat([us, regions, states], ignore_index=True)
+    out = out[out["sales"] > 0]
+    out["price_usd_per_kwh"] = out["revenue"] / out["sales"]   # USD/kWh (les "millions" s'annulent)
+    out["date"] = out["period"] + "-01"
+    out["_order"] = out["level"].map({"us": 0, "region": 1, "state": 2})
+    return out.sort_values(["date", "_order", "region"])[cols].reset_index(drop=True)
+
+def to_frame(agg):
+    """Table au format CSV (FIELDNAMES) depuis la sortie de aggregate_prices."""
+    out = agg[["date", "price_usd_per_kwh", "region"]].assign(
+        sector="commercial",
+        source_series_id=SOURCE_SERIES_ID,
+        source_url=BASE_URL,
+    )
+    return out[FIELDNAMES].reset_index(drop=True)
+
+def to_rows(agg):
+    """Lignes CSV (FIELDNAMES) depuis la sortie de aggregate_prices."""
+    return to_frame(agg).to_dict("records")
+
+def fetch_us_commercial_price_monthly(api_key: str, start: str, end: str, session=None,
+                                      page_size=PAGE_SIZE, workers=4):
+    """
+    Prix commercial US mensuel = sum(revenue)/sum(sales) agrégé sur tous les états.
+    start/end: 'YYYY-MM'
+    Retour: liste {date (YYYY-MM-01), price_usd_per_kwh}
+    """
+    data = fetch_retail_sales_records(api_key, start, end, session=session,
+                                      page_size=page_size, workers=workers)
+    agg = aggregate_prices(data)
+    return to_rows(agg[agg["level"] == "us"])
+
+def regional_path(out_path):
+    root, ext = os.path.splitext(out_path)
+    return f"{root}_by_region{ext or '.csv'}"
+
+def write_csv(rows, out_path):
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    with open(out_path, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        w.writeheader()
+        w.writerows(rows)
+
+def read_existing(out_path):
+    if not os.path.exists(out_path):
+        return []
+    with open(out_path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+def upsert_rows(existing, fresh):
+    """Fusion par (date, region): les lignes fraîches remplacent les anciennes, le reste est conservé."""
+    merged = {(r["date"], r["region"]): r for r in existing}
+    merged.update({(r["date"], r["region"]): r for r in fresh})
+    return [merged[k] for k in sorted(merged)]
+
+def main(argv=None):
     ap = argparse.ArgumentParser(description="EIA v2 → prix élec. commercial US mensuel (agrégé États).")
     ap.add_argument("--start", required=True, help="YYYY-MM, ex: 2023-08")
     ap.add_argument("--end",   required=True, help="YYYY-MM, ex: 2026-09")
     ap.add_argument("--out",   required=True, help="CSV de sortie")
-    args = ap.parse_args()
+    ap.add_argument("--out_regions", help="CSV par état / région ISO (défaut: <out>_by_region.csv)")
+    ap.add_argument("--incremental", action="store_true",
+                    help="Ne récupère que depuis la dernière période déjà présente dans --out (incluse, révisions EIA) puis fusionne")
+    ap.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    ap.add_argument("--workers", type=int, default=4, help="Pages récupérées en parallèle")
+    args = ap.parse_args(argv)
+    out_regions = args.out_regions or regional_path(args.out)
 
     api_key = os.environ.get("EIA_API_KEY")
     if not api_key:
         raise SystemExit("EIA_API_KEY manquant (export EIA_API_KEY=...)")
 
-    rows = fetch_us_commercial_price_monthly(api_key, args.start, args.end)
+    start, existing, existing_regions = args.start, [], []
+    if args.incremental:
+        existing, existing_regions = read_existing(args.out), read_existing(out_regions)
+        if existing:
+            last = max(r["date"] for r in existing)[:7]   # 'YYYY-MM'
+            start = max(start, last)
+            print(f"Incrémental: dernière période {last} → fetch {start}..{args.end}")
 
-    os.makedirs(os.path.dirname(args.out), exist_ok=True)
-    with open(args.out, "w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=[
-            "date","price_usd_per_kwh","sector","region","source_series_id","source_url"
-        ])
-        w.writeheader()
-        w.writerows(rows)
+    with stage("fetch.eia", incremental=args.incremental) as st:
+        data = fetch_retail_sales_records(api_key, start, args.end, session=make_session(),
+                                          page_size=args.page_size, workers=args.workers)
+        st.rows_in = len(data)
+        agg = aggregate_prices(data)
+        rows = to_rows(agg[agg["level"] == "us"])
+        regional = to_rows(agg)
+        fetched = len(rows)
+        if existing:
+            rows = upsert_rows(existing, rows)
+        if existing_regions:
+            regional = upsert_rows(existing_regions, regional)
+        write_csv(rows, args.out)
+        write_csv(regional, out_regions)
+        st.rows_out = len(rows)
+        st.set(rows_regional=len(regional))
 
-    print(f"Wrote {len(rows)} rows to {args.out}")
+    print(f"Wrote {len(rows)} rows to {args.out} ({fetched} fetched)")
+    print(f"Wrote {len(regional)} rows to {out_regions} "
+          f"({agg['region'].nunique()} séries: US, {len(REGION_STATES)} régions, états)")
     if rows:
         print("Sample first:", rows[:2])
         print("Sample last :", rows[-2:])
 
 if __name__ == "__main__":
     main()
-
-
-
-
@@ -1,50 +1,137 @@
 #!/usr/bin/env python3
 import argparse, os, csv, re, asyncio
 from datetime import datetime
-from bs4 import BeautifulSoup
+from urllib.parse import urlsplit
 
-# Playwright
-from playwright.async_api import async_playwright
+from http_client import make_session
+from instrument import stage
+from price_extract import extract_gpu_prices
 
 URL = "https://lambdalabs.com/service/gpu-cloud#pricing"
 
-# On veut au minimum H100 et L4
+# Modèles suivis (une offre peut disparaître du catalogue: un seul suffit à valider une page)
 TARGETS = ["H100", "L4"]
 
-PRICE_RE = re.compile(r"\$?\s*([0-9]+(?:\.[0-9]+)?)\s*/\s*(?:hour|hr)", re.I)
+# Ressources inutiles pour lire des prix: jamais téléchargées par le navigateur
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media", "stylesheet"}
+BLOCKED_HOSTS = re.compile(
+    r"(googletagmanager|google-analytics|doubleclick|facebook|hotjar|segment|hubspot|"
+    r"intercom|clarity\.ms|sentry|fullstory|linkedin|twitter)", re.I)
+
+# Condition d'attente (remplace networkidle): un prix "/hour" est présent dans le texte rendu
+PRICES_READY_JS = "() => document.body && /\\/\\s*(hour|hr)\\b/i.test(document.body.innerText)"
+
+class BrowserPool:
+    """
+    Un seul Chromium (lancé au premier rendu) et un contexte partagé qui bloque images,
+    polices, médias, CSS et trackers; au plus `max_pages` onglets rendus en parallèle.
+    À utiliser en `async with BrowserPool() as pool:` pour toutes les pages d'un run.
+    """
+    def __init__(self, max_pages=4, headless=True):
+        self.max_pages = max_pages
+        self.headless = headless
+        self._sem = asyncio.Semaphore(max_pages)
+        self._lock = asyncio.Lock()
+        self._pw = self._browser = self._context = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _ensure(self):
+        async with self._lock:
+            if self._context is None:
+                # Import paresseux: pas de Playwright requis si le HTML statique suffit
+                from playwright.async_api import async_playwright
+                self._pw = await async_playwright().start()
+                self._browser = await self._pw.chromium.launch(headless=self.headless)
+                self._context = await self._browser.new_context()
+                await self._context.route("**/*", self._filter)
+        return self._context
+
+    @staticmethod
+    async def _filter(route):
+        req = route.request
+        if req.resource_type in BLOCKED_RESOURCE_TYPES or BLOCKED_HOSTS.search(urlsplit(req.url).netloc):
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def render(self, url: str, timeout_ms: int = 30000) -> str:
+        context = await self._ensure()
+        async with self._sem:
+            page = await context.new_page()
+            try:
+                await page.goto(url, wait_until="domcontentloaded", timeout=timeout_ms)
+                try:
+                    await page.wait_for_function(PRICES_READY_JS, timeout=timeout_ms)
+                except Exception:
+                    pass  # page sans prix détectable: on renvoie le DOM tel quel
+                return await page.content()
+            finally:
+                await page.close()
+
+    async def render_many(self, urls, timeout_ms: int = 30000):
+        return await asyncio.gather(*(self.render(u, timeout_ms) for u in urls))
+
+    async def close(self):
+        if self._browser is not None:
+            await self._browser.close()
+        if self._pw is not None:
+            await self._pw.stop()
+        self._pw = self._browser = self._context = None
 
 async def render_and_get_html(url: str, timeout_ms: int = 30000) -> str:
-    async with async_playwright() as pw:
-        browser = await pw.chromium.launch(headless=True)
-        context = await browser.new_context()
-        page = await context.new_page()
-        # Va à la page et attend que le réseau soit calme (utile pour hydratation JS)
-        await page.goto(url, wait_until="networkidle", timeout=timeout_ms)
-        html = await page.content()
-        await browser.close()
-        return html
-
-def extract_prices_from_html(html: str):
+    async with BrowserPool(max_pages=1) as pool:
+        return await pool.render(url, timeout_ms)
+
+def fetch_static_html(url: str, session=None, timeout_s: float = 20.0):
+    """HTML servi sans JS (None si la requête échoue)."""
+    try:
+        r = (session or make_session()).get(url, timeout=timeout_s)
+        r.raise_for_status()
+        return r.text
+    except Exception:
+        return None
+
+async def fetch_prices(urls, session=None, pool=None, timeout_ms: int = 30000):
     """
-    Heuristique robuste:
-    - Scan tout le texte rendu
-    - Pour chaque mention de modèle (H100/L4), cherche un prix "$X.xx / hour" dans le voisinage
-    - Conserve le plus petit prix trouvé par modèle (au cas où plusieurs occurrences)
+    Pour chaque URL: HTML statique d'abord; le navigateur (pool partagé) n'est lancé que
+    pour les pages dont le statique ne donne aucun prix de GPU suivi (page rendue en JS).
+    Retour: (rows, {url: "static" | "browser"}).
     """
-    soup = BeautifulSoup(html, "html.parser")
-    text = soup.get_text(" ", strip=True)
-
-    rows = []
-    for model in TARGETS:
-        # Cherche l'index du modèle dans le texte rendu
-        for m in re.finditer(model, text, flags=re.I):
-            start = max(0, m.start() - 200)
-            end = min(len(text), m.end() + 200)
-            window = text[start:end]
-            price_m = PRICE_RE.search(window)
-            if price_m:
-                price = float(price_m.group(1))
-                rows.append({"gpu_model": model, "hourly_price_usd": price})
+    with stage("lambda.static", urls=len(urls)):
+        statics = await asyncio.gather(*(asyncio.to_thread(fetch_static_html, u, session, timeout_ms / 1000)
+                                         for u in urls))
+    rows, how, todo = [], {}, []
+    for url, html in zip(urls, statics):
+        found = extract_prices_from_html(html, url) if html else []
+        if found:  # un modèle retiré du catalogue ne doit pas forcer Chromium à chaque run
+            rows.extend(found)
+            how[url] = "static"
+        else:
+            todo.append(url)
+    if todo:
+        own = pool is None
+        pool = pool or BrowserPool()
+        try:
+            with stage("lambda.browser", urls=len(todo)):
+                for url, html in zip(todo, await pool.render_many(todo, timeout_ms)):
+                    rows.extend(extract_prices_from_html(html, url))
+                    how[url] = "browser"
+        finally:
+            if own:
+                await pool.close()
+    return rows, how
+
+def extract_prices_from_html(html: str, source_url: str = URL):
+    """
+    Un seul passage sur le document (price_extract): chaque prix "$X / hour" est rattaché
+    à la dernière mention de modèle (H100/L4) qui le précède; on garde le plus petit prix par modèle.
+    """
+    rows = list(extract_gpu_prices(html, TARGETS))
 
     # dédoublonnage: garde le plus petit prix observé par modèle
     best = {}
@@ -59,27 +146,35 @@ def extract_prices_from_html(html: str):
             "fetched_at": fetched_at,
             "gpu_model": k,
             "hourly_price_usd": v["hourly_price_usd"],
-            "source_url": URL
+            "source_url": source_url
         })
     return out
 
-async def main_async(out_path: str):
-    html = await render_and_get_html(URL)
-    rows = extract_prices_from_html(html)
+def write_csv(rows, out_path):
     os.makedirs(os.path.dirname(out_path), exist_ok=True)
     with open(out_path, "w", newline="", encoding="utf-8") as f:
         w = csv.DictWriter(f, fieldnames=["fetched_at","gpu_model","hourly_price_usd","source_url"])
         w.writeheader()
         w.writerows(rows)
-    print(f"Wrote {len(rows)} rows to {out_path}")
+
+async def main_async(out_path: str, urls, max_pages: int = 4, timeout_ms: int = 30000):
+    with stage("fetch.lambda") as st:
+        async with BrowserPool(max_pages=max_pages) as pool:
+            rows, how = await fetch_prices(urls, session=make_session(), pool=pool, timeout_ms=timeout_ms)
+        write_csv(rows, out_path)
+        st.rows_out = len(rows)
+    print(f"Wrote {len(rows)} rows to {out_path} | rendu: {how}")
     if rows:
         print("Sample:", rows)
 
-def main():
+def main(argv=None):
     ap = argparse.ArgumentParser()
     ap.add_argument("--out", required=True)
-    args = ap.parse_args()
-    asyncio.run(main_async(args.out))
+    ap.add_argument("--url", action="append", default=[], help="Page de prix (répétable, défaut: Lambda)")
+    ap.add_argument("--max-pages", type=int, default=4, help="Onglets rendus en parallèle")
+    ap.add_argument("--timeout-ms", type=int, default=30000)
+    args = ap.parse_args(argv)
+    asyncio.run(main_async(args.out, args.url or [URL], args.max_pages, args.timeout_ms))
 
 if __name__ == "__main__":
     main()
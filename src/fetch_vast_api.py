@@ -1,7 +1,11 @@
 #!/usr/bin/env python3
-import argparse, os, csv, requests
+import argparse, os, csv, glob, re, requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+from http_client import make_session
+from instrument import bind, stage
+
 CANDIDATES = [
     # Officiel public browse (le plus courant)
     "https://vast.ai/api/v0/bundles/public",
@@ -10,77 +14,193 @@ CANDIDATES = [
     "https://vast.ai/api/v0/market/bundles",          # alias marché
 ]
 
+GPU_FAMILIES = ["H100", "H200", "A100", "L4"]
 QUERY = 'gpu_name in ["H100","H200","A100","L4"]'
+PAGE_SIZE = 500
+
+FIELDNAMES = ["fetched_at","gpu_model","hourly_price_usd","location","provider_id","spot","source_url"]
+HISTORY_FIELDS = FIELDNAMES + ["snapshot_at"]
+
+def gpu_family(name):
+    """'H100 SXM' / 'h100_pcie' → 'H100'; nom inconnu → nom nettoyé (partition / clé de sketch)."""
+    up = str(name or "").upper()
+    for fam in sorted(GPU_FAMILIES, key=len, reverse=True):
+        if re.search(rf"(?<![A-Z0-9]){fam}(?![0-9])", up):
+            return fam
+    return re.sub(r"[^A-Z0-9]+", "_", up).strip("_") or "UNKNOWN"
 
-def try_fetch(url: str):
+def try_fetch(url: str, session=None, offset=0, limit=PAGE_SIZE):
     params = {
         "q": QUERY,
-        "limit": 200,
-        "order": "score",
-        "desc": "true",
+        "limit": limit,
+        "offset": offset,
+        # Tri par id (stable) plutôt que par score: pages disjointes entre requêtes parallèles
+        "order": "id",
+        "desc": "false",
     }
     headers = {
         "User-Agent": os.getenv("HTTP_USER_AGENT", "llm-econ-research-bot/0.1"),
         "Accept": "application/json",
     }
-    r = requests.get(url, params=params, headers=headers, timeout=30)
+    r = (session or requests).get(url, params=params, headers=headers, timeout=30)
     r.raise_for_status()
     js = r.json()
     # les réponses Vast peuvent mettre la liste sous "offers" ou "data"
     offers = js.get("offers") or js.get("data") or []
     return offers
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--out", required=True)
-    args = ap.parse_args()
-
+def pick_endpoint(session=None, page_size=PAGE_SIZE):
+    """Essaie les endpoints candidats dans l'ordre. Retour: (endpoint retenu, 1re page)."""
     last_err = None
-    offers = []
-    chosen = None
     for url in CANDIDATES:
         try:
-            offers = try_fetch(url)
-            chosen = url
-            break
+            return url, try_fetch(url, session=session, offset=0, limit=page_size)
         except Exception as e:
             last_err = e
             continue
+    raise RuntimeError(
+        "Impossible d'atteindre Vast.ai API via les endpoints testés.\n"
+        f"Dernière erreur: {last_err}\n"
+        "Astuce: teste dans ton shell:\n"
+        "  curl -s 'https://vast.ai/api/v0/bundles/public?limit=3' | head\n"
+    )
+
+def iter_offers(url, first_page, session=None, page_size=PAGE_SIZE, concurrency=4, max_pages=10_000):
+    """
+    Parcourt tout le carnet d'offres par vagues de `concurrency` pages en parallèle (dans l'ordre).
+    Dédoublonne par id fournisseur; s'arrête à la première page incomplète, ou si une vague
+    entière n'apporte aucune offre nouvelle (endpoint qui ignorerait `offset`).
+    """
+    seen = set()
+    def fresh(page):
+        for it in page:
+            pid = it.get("id")
+            if pid is None or pid not in seen:
+                seen.add(pid)
+                yield it
+
+    yield from fresh(first_page)
+    if len(first_page) < page_size:
+        return
+    offset, pages = page_size, 1
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        while pages < max_pages:
+            offsets = [offset + i * page_size for i in range(concurrency)]
+            before = len(seen)
+            for page in ex.map(bind(lambda o: try_fetch(url, session=session, offset=o, limit=page_size)), offsets):
+                yield from fresh(page)
+                if len(page) < page_size:
+                    return
+            if len(seen) == before:
+                return
+            offset += concurrency * page_size
+            pages += concurrency
+
+def offer_to_row(it, chosen, fetched_at):
+    return {
+        "fetched_at": fetched_at,
+        "gpu_model": it.get("gpu_name"),
+        "hourly_price_usd": it.get("dph"),
+        "location": it.get("geolocation") or it.get("country"),
+        "provider_id": it.get("id"),
+        "spot": bool(it.get("is_spot")) if "is_spot" in it else None,
+        "source_url": chosen,
+    }
 
-    if chosen is None:
-        raise SystemExit(
-            "Impossible d'atteindre Vast.ai API via les endpoints testés.\n"
-            f"Dernière erreur: {last_err}\n"
-            "Astuce: teste dans ton shell:\n"
-            "  curl -s 'https://vast.ai/api/v0/bundles/public?limit=3' | head\n"
-        )
+def history_path(root, snapshot_at, gpu):
+    """Partition append-only: <root>/month=YYYY-MM/gpu=<famille>/<snapshot>.csv"""
+    month = f"{snapshot_at[:4]}-{snapshot_at[4:6]}"
+    return os.path.join(root, f"month={month}", f"gpu={gpu}", f"{snapshot_at}.csv")
 
+def stream_snapshot(offers, chosen, out_path=None, history_root=None, snapshot_at=None):
+    """
+    Écrit les offres au fil de l'eau: snapshot courant (--out, écrasé) + une partition
+    d'historique par famille GPU. Rien n'est gardé en mémoire hormis les fichiers ouverts.
+    Retour: {famille: nb de lignes}.
+    """
+    snapshot_at = snapshot_at or datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
     fetched_at = datetime.utcnow().strftime("%Y-%m-01")
-    rows = []
-    for it in offers:
-        rows.append({
-            "fetched_at": fetched_at,
-            "gpu_model": it.get("gpu_name"),
-            "hourly_price_usd": it.get("dph"),
-            "location": it.get("geolocation") or it.get("country"),
-            "provider_id": it.get("id"),
-            "spot": bool(it.get("is_spot")) if "is_spot" in it else None,
-            "source_url": chosen,
-        })
-
-    os.makedirs(os.path.dirname(args.out), exist_ok=True)
-    with open(args.out, "w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=[
-            "fetched_at","gpu_model","hourly_price_usd","location","provider_id","spot","source_url"
-        ])
-        w.writeheader()
-        for r in rows:
-            w.writerow(r)
+    files, writers, counts = [], {}, {}
+    latest = None
+    try:
+        if out_path:
+            os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+            f = open(out_path, "w", newline="", encoding="utf-8")
+            files.append(f)
+            latest = csv.DictWriter(f, fieldnames=FIELDNAMES)
+            latest.writeheader()
+        for it in offers:
+            row = offer_to_row(it, chosen, fetched_at)
+            if latest:
+                latest.writerow(row)
+            fam = gpu_family(row["gpu_model"])
+            counts[fam] = counts.get(fam, 0) + 1
+            if history_root:
+                if fam not in writers:
+                    path = history_path(history_root, snapshot_at, fam)
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    f = open(path + ".part", "w", newline="", encoding="utf-8")
+                    files.append(f)
+                    writers[fam] = csv.DictWriter(f, fieldnames=HISTORY_FIELDS)
+                    writers[fam].writeheader()
+                writers[fam].writerow({**row, "snapshot_at": snapshot_at})
+    finally:
+        for f in files:
+            f.close()
+    # Publication atomique des partitions (un snapshot interrompu reste en .part, ignoré en lecture)
+    for fam in writers:
+        path = history_path(history_root, snapshot_at, fam)
+        os.replace(path + ".part", path)
+    return counts
+
+def history_files(root, months=None, gpus=None):
+    """Fichiers de snapshots des partitions demandées (élagage par chemin, sans rien lire)."""
+    month_globs = [f"month={m}" for m in months] if months else ["month=*"]
+    gpu_globs = [f"gpu={g}" for g in gpus] if gpus else ["gpu=*"]
+    out = []
+    for m in month_globs:
+        for g in gpu_globs:
+            out.extend(glob.glob(os.path.join(root, m, g, "*.csv")))
+    return sorted(out)
+
+def read_history(root, months=None, gpus=None, columns=None, chunksize=None):
+    """
+    Historique filtré par mois ('YYYY-MM') et famille GPU. Avec `chunksize`, renvoie un
+    itérateur de DataFrames (mémoire bornée), sinon un seul DataFrame.
+    """
+    import pandas as pd
+    paths = history_files(root, months, gpus)
+    if chunksize:
+        return (chunk for p in paths for chunk in pd.read_csv(p, usecols=columns, chunksize=chunksize))
+    if not paths:
+        return pd.DataFrame(columns=columns or HISTORY_FIELDS)
+    return pd.concat((pd.read_csv(p, usecols=columns) for p in paths), ignore_index=True)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--out", required=True, help="CSV du snapshot courant (écrasé)")
+    ap.add_argument("--history", default="data/vast_history",
+                    help="Racine de l'historique partitionné month=/gpu= (append-only)")
+    ap.add_argument("--no-history", action="store_true")
+    ap.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    ap.add_argument("--concurrency", type=int, default=4, help="Pages récupérées en parallèle")
+    args = ap.parse_args(argv)
+
+    session = make_session()
+    with stage("fetch.vast") as st:
+        try:
+            chosen, first = pick_endpoint(session=session, page_size=args.page_size)
+        except RuntimeError as e:
+            raise SystemExit(str(e))
+
+        offers = iter_offers(chosen, first, session=session, page_size=args.page_size, concurrency=args.concurrency)
+        counts = stream_snapshot(offers, chosen, out_path=args.out,
+                                 history_root=None if args.no_history else args.history)
+        st.rows_out = sum(counts.values())
+        st.set(endpoint=chosen)
 
     print(f"Endpoint OK: {chosen}")
-    print(f"Wrote {len(rows)} rows to {args.out}")
+    print(f"Wrote {sum(counts.values())} rows to {args.out} | par GPU: {counts}")
 
 if __name__ == "__main__":
     main()
-
-
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+import argparse, os, time
+import numpy as np
+import pandas as pd
+
+from build_monthly_series import DEFAULTS, TARGET_MARGIN, TIER_STANDARD, build_inputs, cost_per_million
+from quote_service import check_inputs
+from scenario_sweep import axis_values
+
+MODEL_INPUTS = list(DEFAULTS.keys())
+
+# Forme du coût en fonction d'un seul intrant (les autres fixés): C = a + b·v ou C = a + b/v.
+# Les deux coefficients sont lus sur cost_per_million lui-même (deux évaluations), puis inversés
+# en forme fermée: la formule du modèle reste à un seul endroit.
+FORMS = {c: "linear" for c in MODEL_INPUTS}
+FORMS["throughput_tok_s_mini"] = "reciprocal"
+FORMS["throughput_tok_s_flagship"] = "reciprocal"
+
+# Domaine de validité (solution hors domaine → NaN, feasible=False) et bornes de la bissection
+BOUNDS = {c: (0.0, 1e6) for c in MODEL_INPUTS}
+BOUNDS.update({
+    "mix_mini_pct": (0.0, 100.0), "mix_flagship_pct": (0.0, 100.0),
+    "pue": (1.0, 10.0), "electricity_price_usd_kwh": (0.0, 10.0),
+    "throughput_tok_s_mini": (1e-6, 1e7), "throughput_tok_s_flagship": (1e-6, 1e7),
+})
+
+def model_inputs(base):
+    """Colonnes du modèle en (R, 1) pour broadcaster contre K cibles."""
+    return {c: base[c].to_numpy(dtype=float)[:, None] for c in MODEL_INPUTS}
+
+def evaluate(x, var, value):
+    """Coût / 1M tokens avec `var` remplacé par `value` (mix: le complément suit)."""
+    y = dict(x)
+    y[var] = value
+    if var == "mix_mini_pct":
+        y["mix_flagship_pct"] = 100.0 - value
+    elif var == "mix_flagship_pct":
+        y["mix_mini_pct"] = 100.0 - value
+    return cost_per_million(y)
+
+def coefficients(x, var):
+    """(a, b) tels que C = a + b·v (linéaire) ou C = a + b/v (réciproque), par ligne."""
+    if FORMS[var] == "linear":
+        c0 = evaluate(x, var, 0.0)
+        return c0, evaluate(x, var, 1.0) - c0
+    c1, c2 = evaluate(x, var, 1.0), evaluate(x, var, 2.0)
+    b = 2.0 * (c1 - c2)
+    return c1 - b, b
+
+def target_cost_from_break_even(price, tokens=TIER_STANDARD, margin=TARGET_MARGIN):
+    """Inverse de break_even_price: coût / 1M tokens qui donne `price` pour `tokens`/mois à la marge."""
+    return np.asarray(price, dtype=float) * (1.0 - margin) * 1_000_000.0 / tokens
+
+def _bisect(x, var, target, iters=80):
+    lo_b, hi_b = BOUNDS[var]
+    shape = np.broadcast_shapes(np.shape(target), np.shape(x[var]))
+    lo, hi = np.full(shape, lo_b), np.full(shape, hi_b)
+    f_lo = evaluate(x, var, lo) - target
+    f_hi = evaluate(x, var, hi) - target
+    bracketed = np.sign(f_lo) != np.sign(f_hi)
+    for _ in range(iters):
+        mid = 0.5 * (lo + hi)
+        f_mid = evaluate(x, var, mid) - target
+        left = np.sign(f_mid) == np.sign(f_lo)
+        lo, f_lo = np.where(left, mid, lo), np.where(left, f_mid, f_lo)
+        hi = np.where(left, hi, mid)
+    return np.where(bracketed, 0.5 * (lo + hi), np.nan)
+
+def solve(x, var, target_cost, method="closed"):
+    """
+    Valeur de `var` qui amène le coût / 1M tokens à `target_cost` (broadcast (R, 1) × (1, K)).
+    method="closed": inversion analytique; "bisect": bissection vectorisée (aussi le repli
+    pour tout intrant sans forme connue). Retour: (valeurs (R, K), feasible (R, K)).
+    """
+    target = np.asarray(target_cost, dtype=float)
+    if method == "closed" and var in FORMS:
+        a, b = coefficients(x, var)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            v = (target - a) / b if FORMS[var] == "linear" else b / (target - a)
+    else:
+        v = _bisect(x, var, target)
+    lo, hi = BOUNDS[var]
+    feasible = np.isfinite(v) & (v >= lo) & (v <= hi)
+    return np.where(feasible, v, np.nan), feasible
+
+def sensitivities(x, bump=0.10):
+    """
+    Dérivées analytiques dC/dv, élasticités (dC/dv · v / C) et coûts à v·(1 ± bump) pour chaque
+    intrant (barres d'un tornado). Partielles, sauf pour le mix: comme dans evaluate, le complément
+    suit (mini + flagship = 100), d'où la dérivée totale dC/dmix_mini = C_mini - C_flagship (par point).
+    Retour: dict intrant → dict de tableaux (R,).
+    """
+    out = {}
+    for var in MODEL_INPUTS:
+        a, b = coefficients(x, var)
+        v = x[var]
+        if FORMS[var] == "linear":
+            cost, grad = a + b * v, b
+            at = lambda s: a + b * v * s
+        else:
+            cost, grad = a + b / v, -b / v ** 2
+            at = lambda s: a + b / (v * s)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            elasticity = grad * v / cost
+        out[var] = {
+            "value": v.ravel(), "cost": cost.ravel(), "d_cost_d_input": grad.ravel(),
+            "elasticity": elasticity.ravel(),
+            "cost_low": at(1.0 - bump).ravel(), "cost_high": at(1.0 + bump).ravel(),
+        }
+    return out
+
+def solve_frame(base, solve_for, targets, kind="cost", tokens=TIER_STANDARD, margin=TARGET_MARGIN, method="closed"):
+    """Tableau long: une ligne par (date, company, intrant résolu, cible)."""
+    x = model_inputs(base)
+    targets = np.asarray(targets, dtype=float)
+    tcost = targets if kind == "cost" else target_cost_from_break_even(targets, tokens, margin)
+    R, K = len(base), len(targets)
+    frames = []
+    for var in solve_for:
+        v, ok = solve(x, var, tcost[None, :], method)
+        baseline = np.repeat(x[var][:, 0], K)
+        frame = {
+            "date": np.repeat(base["date"].to_numpy(), K),
+            "company": np.repeat(base["company"].to_numpy(), K),
+            "solve_for": var,
+            "target_cost_per_million_usd": np.tile(tcost, R),
+        }
+        if kind == "break_even":
+            frame.update(target_break_even_usd=np.tile(targets, R), tokens_per_month=tokens, target_margin=margin)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            frame.update(baseline_value=baseline, required_value=v.ravel(),
+                         change_pct=(v.ravel() / baseline - 1.0) * 100.0, feasible=ok.ravel())
+        frames.append(pd.DataFrame(frame))
+    return pd.concat(frames, ignore_index=True)
+
+def sensitivity_frame(base, bump=0.10):
+    sens = sensitivities(model_inputs(base), bump)
+    frames = [pd.DataFrame({"date": base["date"].to_numpy(), "company": base["company"].to_numpy(),
+                            "input": var, **cols}) for var, cols in sens.items()]
+    df = pd.concat(frames, ignore_index=True)
+    df["swing"] = (df["cost_high"] - df["cost_low"]).abs()
+    return df.sort_values(["date", "company", "swing"], ascending=[True, True, False], kind="stable")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Goal-seek: intrant requis pour atteindre un coût / 1M tokens ou un break-even cible.")
+    ap.add_argument("--start", required=True, help="YYYY-MM (ex: 2023-08)")
+    ap.add_argument("--end",   required=True, help="YYYY-MM (ex: 2026-09)")
+    ap.add_argument("--out", help="CSV des solutions (une ligne par mois × company × intrant × cible)")
+    ap.add_argument("--solve-for", default="throughput_tok_s_flagship",
+                    help=f"Intrant(s) à résoudre, séparés par des virgules ({', '.join(MODEL_INPUTS)})")
+    ap.add_argument("--target-cost", help="$/1M tokens cibles: a:b:n ou v1,v2,...")
+    ap.add_argument("--target-break-even", help="Prix d'abonnement cibles ($/mois): a:b:n ou v1,v2,...")
+    ap.add_argument("--tokens", type=float, default=TIER_STANDARD, help="Tokens / mois (avec --target-break-even)")
+    ap.add_argument("--margin", type=float, default=TARGET_MARGIN, help="Marge cible (avec --target-break-even)")
+    ap.add_argument("--method", choices=["closed", "bisect"], default="closed")
+    ap.add_argument("--sensitivities", help="CSV des dérivées / élasticités (tornado; mix: dérivée totale, complément inclus)")
+    ap.add_argument("--bump", type=float, default=0.10, help="Variation relative des barres du tornado (0.10 = ±10 %%)")
+    ap.add_argument("--eia_prices", default="data/eia_electricity_us_commercial.csv")
+    ap.add_argument("--gpu_overrides", default="data/gpu_hour_overrides.csv")
+    ap.add_argument("--region_prices", default="data/eia_electricity_us_commercial_by_region.csv")
+    ap.add_argument("--company_regions", default="data/company_regions.csv")
+    args = ap.parse_args(argv)
+    try:
+        check_inputs(args.tokens, args.margin)
+    except ValueError as e:
+        ap.error(str(e))
+
+    solve_for = [v.strip() for v in args.solve_for.split(",") if v.strip()]
+    unknown = set(solve_for) - set(MODEL_INPUTS)
+    if unknown:
+        raise SystemExit(f"Intrants inconnus: {sorted(unknown)} (attendus: {MODEL_INPUTS})")
+    if args.out and bool(args.target_cost) == bool(args.target_break_even):
+        raise SystemExit("--out: donner exactement une cible (--target-cost ou --target-break-even)")
+    if not args.out and not args.sensitivities:
+        raise SystemExit("Rien à faire: --out (goal-seek) et/ou --sensitivities")
+
+    base = build_inputs(args.start, args.end, args.eia_prices, args.gpu_overrides,
+                        args.region_prices, args.company_regions)
+
+    for path in (args.out, args.sensitivities):
+        if path and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    if args.out:
+        kind = "cost" if args.target_cost else "break_even"
+        targets = axis_values(args.target_cost or args.target_break_even)
+        t0 = time.perf_counter()
+        df = solve_frame(base, solve_for, targets, kind, args.tokens, args.margin, args.method)
+        dt = time.perf_counter() - t0
+        df.to_csv(args.out, index=False)
+        print(f"{len(base)} lignes × {len(targets)} cibles × {len(solve_for)} intrants résolus en {dt * 1000:.1f} ms "
+              f"({args.method}) | faisables: {df['feasible'].mean():.1%}")
+        print(f"Wrote {len(df)} rows to {args.out}")
+
+    if args.sensitivities:
+        sens = sensitivity_frame(base, args.bump)
+        sens.to_csv(args.sensitivities, index=False)
+        print(f"Wrote {len(sens)} rows to {args.sensitivities} (±{args.bump:.0%})")
+
+if __name__ == "__main__":
+    main()
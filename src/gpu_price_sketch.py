@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+import argparse, os, json, hashlib, time
+import numpy as np
+import pandas as pd
+
+from fetch_vast_api import gpu_family, history_files
+
+# Plage couverte par les sketches ($/GPU-h); au-delà les valeurs sont rabattues sur les bords
+MIN_PRICE, MAX_PRICE = 0.01, 1000.0
+
+class LogSketch:
+    """
+    Sketch de quantiles à erreur relative bornée (type DDSketch): buckets log de ratio
+    gamma = (1+alpha)/(1-alpha) sur [MIN_PRICE, MAX_PRICE]. Mémoire constante (~1200 buckets
+    pour alpha=0.5 %) quel que soit le nombre d'offres; fusion = somme des compteurs.
+    """
+    def __init__(self, alpha=0.005, counts=None):
+        self.alpha = alpha
+        self.log_gamma = np.log((1 + alpha) / (1 - alpha))
+        self.offset = int(np.floor(np.log(MIN_PRICE) / self.log_gamma))
+        n = int(np.ceil(np.log(MAX_PRICE) / self.log_gamma)) - self.offset + 1
+        self.counts = np.zeros(n, dtype=np.int64) if counts is None else counts
+
+    def update(self, values):
+        v = np.asarray(values, dtype=float)
+        v = v[np.isfinite(v) & (v > 0)]
+        if v.size == 0:
+            return
+        idx = np.ceil(np.log(np.clip(v, MIN_PRICE, MAX_PRICE)) / self.log_gamma).astype(np.int64) - self.offset
+        self.counts += np.bincount(np.clip(idx, 0, len(self.counts) - 1), minlength=len(self.counts))
+
+    def merge(self, other):
+        self.counts += other.counts
+        return self
+
+    @property
+    def n(self):
+        return int(self.counts.sum())
+
+    def quantile(self, q):
+        """q dans [0, 1]; valeur du bucket (erreur relative ≤ alpha)."""
+        if self.n == 0:
+            return float("nan")
+        i = int(np.searchsorted(np.cumsum(self.counts), q * (self.n - 1), side="right"))
+        gamma = np.exp(self.log_gamma)
+        return float(2.0 * gamma ** (i + self.offset) / (gamma + 1.0))
+
+    def to_json(self):
+        nz = np.flatnonzero(self.counts)
+        return {"idx": nz.tolist(), "counts": self.counts[nz].tolist()}
+
+    @classmethod
+    def from_json(cls, alpha, d):
+        s = cls(alpha)
+        s.counts[np.asarray(d["idx"], dtype=np.int64)] = np.asarray(d["counts"], dtype=np.int64)
+        return s
+
+class SketchStore:
+    """Sketches par (source, gpu, mois) + fichiers déjà consommés, persistés en JSON."""
+    def __init__(self, path, alpha=0.005):
+        self.path, self.alpha = path, alpha
+        self.sketches, self.consumed = {}, set()
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                st = json.load(f)
+            self.alpha = st["alpha"]
+            self.consumed = set(st["consumed"])
+            self.sketches = {tuple(k.split("|")): LogSketch.from_json(self.alpha, v)
+                             for k, v in st["sketches"].items()}
+
+    def get(self, source, gpu, month):
+        key = (source, gpu, month)
+        if key not in self.sketches:
+            self.sketches[key] = LogSketch(self.alpha)
+        return self.sketches[key]
+
+    def ingest(self, source, frame):
+        """frame: colonnes gpu_model, hourly_price_usd, month ('YYYY-MM')."""
+        prices = pd.to_numeric(frame["hourly_price_usd"], errors="coerce")
+        fam = frame["gpu_model"].map(gpu_family)
+        for (g, m), idx in frame.groupby([fam, frame["month"]]).groups.items():
+            self.get(source, g, m).update(prices.loc[idx].to_numpy())
+
+    def merged(self, sources=None):
+        """Fusion des sources: {(gpu, mois): LogSketch}."""
+        out = {}
+        for (src, g, m), sk in self.sketches.items():
+            if sources and src not in sources:
+                continue
+            out.setdefault((g, m), LogSketch(self.alpha)).merge(sk)
+        return out
+
+    def save(self):
+        state = {
+            "alpha": self.alpha,
+            "consumed": sorted(self.consumed),
+            "sketches": {"|".join(k): v.to_json() for k, v in sorted(self.sketches.items())},
+        }
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.path)
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def ingest_vast_history(store, root, chunksize=100_000):
+    """Snapshots Vast (immuables, nom horodaté unique) non encore consommés, lus par chunks."""
+    n_files = n_rows = 0
+    for path in history_files(root):
+        key = "vast:" + os.path.relpath(path, root)
+        if key in store.consumed:
+            continue
+        for chunk in pd.read_csv(path, usecols=["gpu_model", "hourly_price_usd", "snapshot_at"],
+                                 dtype={"snapshot_at": str}, chunksize=chunksize):
+            chunk["month"] = chunk["snapshot_at"].str[:4] + "-" + chunk["snapshot_at"].str[4:6]
+            store.ingest("vast", chunk)
+            n_rows += len(chunk)
+        store.consumed.add(key)
+        n_files += 1
+    return n_files, n_rows
+
+def ingest_price_csv(store, path, source, chunksize=100_000):
+    """CSV réécrit à chaque run (ex: Lambda): consommé par contenu (sha256) pour ne pas compter deux fois."""
+    if not path or not os.path.exists(path):
+        return 0
+    key = f"{source}:{_sha256(path)}"
+    if key in store.consumed:
+        return 0
+    n = 0
+    for chunk in pd.read_csv(path, usecols=["fetched_at", "gpu_model", "hourly_price_usd"],
+                             dtype={"fetched_at": str}, chunksize=chunksize):
+        chunk["month"] = chunk["fetched_at"].str[:7]
+        store.ingest(source, chunk)
+        n += len(chunk)
+    store.consumed.add(key)
+    return n
+
+def overrides_frame(store, percentile, sources=None, min_count=1):
+    """Table date × GPU ($/h au percentile demandé), format de gpu_hour_overrides.csv."""
+    merged = store.merged(sources)
+    rows = {}
+    for (g, m), sk in merged.items():
+        if sk.n >= min_count:
+            rows.setdefault(f"{m}-01", {})[g] = round(sk.quantile(percentile / 100.0), 4)
+    df = pd.DataFrame.from_dict(rows, orient="index").sort_index()
+    # H100/L4 toujours présentes (attendues par le build), puis les autres familles
+    cols = ["H100", "L4"] + sorted(set(df.columns) - {"H100", "L4"})
+    df = df.reindex(columns=cols).rename_axis("date").reset_index()
+    df["source"] = f"sketch-p{percentile:g}"
+    return df
+
+def refresh_overrides(vast_history, lambda_prices, state, out, percentile=50.0,
+                      sources=("vast", "lambda"), min_count=1, alpha=0.005):
+    """Ingère les nouveaux snapshots dans les sketches persistés puis réécrit les overrides."""
+    store = SketchStore(state, alpha=alpha)
+    n_files, n_vast = ingest_vast_history(store, vast_history)
+    n_lambda = ingest_price_csv(store, lambda_prices, "lambda")
+    os.makedirs(os.path.dirname(state) or ".", exist_ok=True)
+    store.save()
+
+    df = overrides_frame(store, percentile, sources=set(sources), min_count=min_count)
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    df.to_csv(out, index=False)
+    return df, {"snapshots": n_files, "vast": n_vast, "lambda": n_lambda, "sketches": len(store.sketches)}
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Sketches de quantiles streaming → gpu_hour_overrides auto.")
+    ap.add_argument("--vast_history", default="data/vast_history")
+    ap.add_argument("--lambda_prices", default="data/lambda_gpu_pricing.csv")
+    ap.add_argument("--state", default="data/gpu_price_sketches.json", help="Sketches persistés (mergeables)")
+    ap.add_argument("--out", default="data/gpu_hour_overrides_auto.csv")
+    ap.add_argument("--percentile", type=float, default=50.0, help="Percentile émis (ex: 25 = marché bas)")
+    ap.add_argument("--alpha", type=float, default=0.005, help="Erreur relative des sketches (nouvel état seulement)")
+    ap.add_argument("--sources", default="vast,lambda", help="Sources fusionnées à l'émission")
+    ap.add_argument("--min_count", type=int, default=1, help="Offres minimum pour émettre un mois × GPU")
+    args = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    df, st = refresh_overrides(args.vast_history, args.lambda_prices, args.state, args.out,
+                               percentile=args.percentile, sources=args.sources.split(","),
+                               min_count=args.min_count, alpha=args.alpha)
+    print(f"Ingéré: {st['vast']} offres Vast ({st['snapshots']} snapshots nouveaux), {st['lambda']} prix Lambda "
+          f"en {time.perf_counter() - t0:.2f}s | {st['sketches']} sketches")
+    print(f"Wrote {len(df)} rows to {args.out} (p{args.percentile:g})")
+
+if __name__ == "__main__":
+    main()
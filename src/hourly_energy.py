@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Moteur horaire optionnel (build_monthly_series.py --hourly CONFIG).
+
+Chaque mois est déplié sur une grille de 744 heures (masque des heures réelles du mois) et les
+courbes horaires — prix de l'électricité (TOU ou CSV horaire) et utilisation GPU mini/flagship —
+sont intégrées en NumPy sur tout le tableau (scénarios × lignes × heures) d'un coup. Le résultat
+est replié dans les colonnes mensuelles existantes, de sorte que cost_per_million reste inchangé:
+
+- electricity_price_usd_kwh = prix horaire moyen du mois
+- throughput_tok_s_*        = débit nominal × utilisation moyenne (tokens par GPU-heure louée)
+- gpu_power_w_*             = puissance × Σ(charge·prix) / Σ(prix), charge = idle + (1 - idle)·utilisation
+
+Profil plat (utilisation 1, prix constant) → colonnes identiques au modèle mensuel.
+Heures en temps local, sans changement d'heure.
+"""
+import argparse, json, os, time
+import numpy as np
+import pandas as pd
+
+from build_monthly_series import DEFAULTS, build_inputs, cost_per_million, load_csv
+
+MAX_HOURS = 31 * 24
+GPU_TYPES = ("mini", "flagship")
+
+def load_config(path):
+    """
+    JSON: {"idle_power_frac": 0.3,
+           "tou": {"weekday": [24 multiplicateurs], "weekend": [24], "normalize": true},
+           "load": {"mini": {"weekday": [24 utilisations 0–1], "weekend": [24]}, "flagship": ...},
+           "hourly_prices": "data/hourly_prices.csv",   # timestamp,price_usd_per_kwh[,region]
+           "hourly_load": "data/hourly_load.csv",       # timestamp,util_mini,util_flagship
+           "scenarios": {"nom": {"idle_power_frac": ..., "load_scale": ..., "tou": ..., "load": ...}}}
+    Un profil peut aussi être une liste de 24 valeurs (tous les jours) ou un scalaire.
+    """
+    with open(path, encoding="utf-8") as f:
+        cfg = json.load(f)
+    base = os.path.dirname(path)
+    for key in ("hourly_prices", "hourly_load"):
+        # Chemins relatifs au répertoire courant, sinon au JSON
+        if cfg.get(key) and not os.path.exists(cfg[key]) and os.path.exists(os.path.join(base, cfg[key])):
+            cfg[key] = os.path.join(base, cfg[key])
+    return cfg
+
+def hour_grid(months):
+    """(mask, heure du jour, week-end), chacun (M, 744), pour des débuts de mois."""
+    months = pd.DatetimeIndex(months)
+    offs = np.arange(MAX_HOURS)
+    hours_in_month = (months.days_in_month.to_numpy() * 24)[:, None]
+    mask = offs[None, :] < hours_in_month
+    hod = np.broadcast_to(offs % 24, mask.shape)
+    weekend = (months.dayofweek.to_numpy()[:, None] + offs[None, :] // 24) % 7 >= 5
+    return mask, hod, weekend
+
+def profile(spec, default=1.0):
+    """Profil → tableau (2, 24): [jours ouvrés, week-end] × heure du jour."""
+    if spec is None:
+        spec = default
+    if isinstance(spec, dict):
+        wd = spec.get("weekday", spec.get("all", default))
+        we = spec.get("weekend", wd)
+    else:
+        wd = we = spec
+    out = np.empty((2, 24))
+    out[0], out[1] = wd, we
+    return out
+
+def _masked_mean(a, mask):
+    return (a * mask).sum(-1) / mask.sum(-1)
+
+def _to_grid(ts, values, months, group=None, n_groups=1):
+    """Séries horaires (timestamps quelconques) → grilles (n_groups, M, 744), moyenne par heure, NaN si absente."""
+    ts = pd.to_datetime(pd.Series(ts))
+    if ts.dt.tz is not None:
+        ts = ts.dt.tz_localize(None)
+    ts = ts.dt.floor("h")
+    start = ts.dt.to_period("M").dt.to_timestamp()
+    m = pd.DatetimeIndex(months).get_indexer(start)
+    off = ((ts - start) // pd.Timedelta(hours=1)).to_numpy()
+    values = np.asarray(values, dtype=float)
+    g = np.zeros(len(m), dtype=np.int64) if group is None else np.asarray(group)
+    keep = (m >= 0) & np.isfinite(values)
+    flat = ((g[keep] * len(months) + m[keep]) * MAX_HOURS + off[keep]).astype(np.int64)
+    size = n_groups * len(months) * MAX_HOURS
+    sums = np.bincount(flat, weights=values[keep], minlength=size)
+    counts = np.bincount(flat, minlength=size)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        grid = np.where(counts > 0, sums / counts, np.nan)
+    return grid.reshape(n_groups, len(months), MAX_HOURS)
+
+def _hourly_price_grid(path, months, companies, company_regions):
+    """(C, M, 744) $/kWh par company; colonne region optionnelle pondérée par company_regions."""
+    hp = load_csv(path)
+    if hp.empty or not {"timestamp", "price_usd_per_kwh"}.issubset(hp.columns):
+        raise SystemExit(f"{path}: colonnes attendues timestamp,price_usd_per_kwh[,region]")
+    price = pd.to_numeric(hp["price_usd_per_kwh"], errors="coerce").to_numpy()
+    if "region" not in hp.columns:
+        g = _to_grid(hp["timestamp"], price, months)
+        return np.broadcast_to(g, (len(companies),) + g.shape[1:])
+    codes, regions = pd.factorize(hp["region"].astype(str), sort=True)
+    grid = _to_grid(hp["timestamp"], price, months, codes, len(regions))   # (K, M, 744)
+    w = np.zeros((len(companies), len(regions)))
+    weights = load_csv(company_regions)
+    if not weights.empty and {"company", "region", "weight"}.issubset(weights.columns):
+        cidx = {c: i for i, c in enumerate(companies)}
+        rmap = {r: i for i, r in enumerate(regions)}
+        for c, r, v in weights[["company", "region", "weight"]].itertuples(index=False):
+            if c in cidx and str(r) in rmap and pd.notna(pd.to_numeric(v, errors="coerce")):
+                w[cidx[c], rmap[str(r)]] = float(v)
+    w[w.sum(1) == 0] = 1.0  # company sans poids: moyenne des régions
+    finite = np.isfinite(grid)
+    num = np.einsum("ck,kmh->cmh", w, np.where(finite, grid, 0.0))
+    den = np.einsum("ck,kmh->cmh", w, finite.astype(float))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(den > 0, num / den, np.nan)
+
+def hourly_arrays(df, cfg, company_regions=None, cache=None):
+    """
+    Courbes (R, 744) alignées sur les lignes de `df` (date × company): prix $/kWh, utilisation
+    mini/flagship et masque des heures du mois. Le prix TOU redistribue le prix mensuel de `df`
+    (normalisé à moyenne constante par défaut); un CSV horaire le remplace là où il a des valeurs.
+    `cache` (dict) partage les CSV horaires déjà mis en grille entre scénarios.
+    """
+    cache = {} if cache is None else cache
+    dates = pd.to_datetime(df["date"])
+    months = pd.DatetimeIndex(sorted(dates.unique()))
+    companies = sorted(df["company"].unique())
+    row_m = months.get_indexer(dates)
+    row_c = pd.Index(companies).get_indexer(df["company"])
+    mask, hod, weekend = hour_grid(months)
+    we = weekend.astype(int)
+
+    tou = cfg.get("tou")
+    mult = profile(tou)[we, hod]                                        # (M, 744)
+    if not isinstance(tou, dict) or tou.get("normalize", True):
+        mult = mult / _masked_mean(mult, mask)[:, None]
+    monthly = df["electricity_price_usd_kwh"].to_numpy(dtype=float)
+    price = monthly[:, None] * mult[row_m]
+    if cfg.get("hourly_prices"):
+        key = ("prices", cfg["hourly_prices"])
+        if key not in cache:
+            cache[key] = _hourly_price_grid(cfg["hourly_prices"], months, companies, company_regions)
+        hp = cache[key][row_c, row_m]
+        price = np.where(np.isfinite(hp), hp, price)
+
+    scale = float(cfg.get("load_scale", 1.0))
+    spec = cfg.get("load")
+    load = {k: profile(spec.get(k) if isinstance(spec, dict) else spec)[we, hod] for k in GPU_TYPES}
+    if cfg.get("hourly_load"):
+        key = ("load", cfg["hourly_load"])
+        if key not in cache:
+            hl = load_csv(cfg["hourly_load"])
+            cols = [f"util_{k}" for k in GPU_TYPES if f"util_{k}" in hl.columns]
+            if hl.empty or "timestamp" not in hl.columns or not cols:
+                raise SystemExit(f"{cfg['hourly_load']}: colonnes attendues timestamp,util_mini,util_flagship")
+            cache[key] = {c[len("util_"):]: _to_grid(hl["timestamp"], pd.to_numeric(hl[c], errors="coerce"), months)[0]
+                          for c in cols}
+        for k, g in cache[key].items():
+            load[k] = np.where(np.isfinite(g), g, load[k])
+    # Heures hors du mois mises à zéro une fois: l'intégration se réduit à des sommes
+    mask = mask[row_m]
+    return {
+        "price": np.where(mask, price, 0.0),
+        "load_mini": np.where(mask, np.clip(load["mini"] * scale, 0.0, 1.0)[row_m], 0.0),
+        "load_flagship": np.where(mask, np.clip(load["flagship"] * scale, 0.0, 1.0)[row_m], 0.0),
+        "mask": mask,
+    }
+
+def integrate(price, load_mini, load_flagship, mask, idle_power_frac=0.0):
+    """
+    Intègre les courbes sur l'axe des heures (dernier axe; axes de tête = scénarios × lignes…),
+    nulles hors du mois (voir hourly_arrays). Retour: prix moyen, utilisation moyenne et
+    facteur de puissance effectif par type de GPU.
+    """
+    idle = np.asarray(idle_power_frac, dtype=float)
+    n = mask.sum(-1)
+    psum = price.sum(-1)
+    out = {"electricity_price_usd_kwh": psum / n, "hours": n}
+    for k, u in (("mini", load_mini), ("flagship", load_flagship)):
+        out[f"utilization_{k}"] = u.sum(-1) / n
+        # Σ(charge·prix) / Σ(prix), charge = idle + (1 - idle)·u
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out[f"power_factor_{k}"] = idle + (1.0 - idle) * np.einsum("...h,...h->...", u, price) / psum
+    return out
+
+def effective_inputs(x, agg):
+    """Intrants mensuels effectifs (dict de colonnes) à partir de l'intégration horaire."""
+    y = dict(x)
+    y["electricity_price_usd_kwh"] = agg["electricity_price_usd_kwh"]
+    for k in GPU_TYPES:
+        y[f"throughput_tok_s_{k}"] = x[f"throughput_tok_s_{k}"] * agg[f"utilization_{k}"]
+        y[f"gpu_power_w_{k}"] = x[f"gpu_power_w_{k}"] * agg[f"power_factor_{k}"]
+    return y
+
+def apply_hourly(df, config, company_regions=None):
+    """Remplace les intrants mensuels de `df` (sortie de build_inputs) par leurs équivalents horaires."""
+    cfg = load_config(config) if isinstance(config, str) else config
+    arr = hourly_arrays(df, cfg, company_regions)
+    agg = integrate(**arr, idle_power_frac=cfg.get("idle_power_frac", 0.0))
+    cols = ["electricity_price_usd_kwh"] + [f"{p}_{k}" for p in ("throughput_tok_s", "gpu_power_w") for k in GPU_TYPES]
+    x = {c: df[c].to_numpy(dtype=float) for c in cols}
+    df = df.copy()
+    for c, v in effective_inputs(x, agg).items():
+        df[c] = v
+    return df
+
+def run_scenarios(df, cfg, company_regions=None):
+    """Tous les scénarios du JSON (+ "base") intégrés en un seul tableau (S, R, 744)."""
+    scenarios = cfg.get("scenarios") or {}
+    names = ["base"] + [n for n in scenarios if n != "base"]
+    cfgs = [{**cfg, **scenarios.get(n, {})} for n in names]
+    cache = {}
+    arrays = [hourly_arrays(df, c, company_regions, cache) for c in cfgs]
+    stacked = {k: np.stack([a[k] for a in arrays]) for k in arrays[0]}
+    idle = np.array([float(c.get("idle_power_frac", 0.0)) for c in cfgs])[:, None]
+    agg = integrate(**stacked, idle_power_frac=idle)
+    x = {c: df[c].to_numpy(dtype=float)[None, :] for c in DEFAULTS}
+    y = effective_inputs(x, agg)
+    cost = cost_per_million(y)
+    S, R = cost.shape
+    out = pd.DataFrame({
+        "date": np.tile(df["date"].to_numpy(), S),
+        "company": np.tile(df["company"].to_numpy(), S),
+        "scenario": np.repeat(names, R),
+        "hours": np.tile(agg["hours"][0], S),
+        "utilization_mini": agg["utilization_mini"].ravel(),
+        "utilization_flagship": agg["utilization_flagship"].ravel(),
+        "electricity_price_usd_kwh": np.broadcast_to(y["electricity_price_usd_kwh"], (S, R)).ravel(),
+    })
+    for k in GPU_TYPES:
+        out[f"throughput_tok_s_{k}"] = y[f"throughput_tok_s_{k}"].ravel()
+        out[f"gpu_power_w_{k}"] = y[f"gpu_power_w_{k}"].ravel()
+    out["cost_per_million_tokens_usd"] = cost.ravel()
+    out["cost_monthly_model_usd"] = np.tile(cost_per_million(df), S)
+    return out
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Prix TOU / courbes horaires × profils de charge → coût / 1M tokens par scénario.")
+    ap.add_argument("--start", required=True, help="YYYY-MM (ex: 2023-08)")
+    ap.add_argument("--end",   required=True, help="YYYY-MM (ex: 2026-09)")
+    ap.add_argument("--config", default="data/hourly_profiles.json", help="JSON des profils (voir load_config)")
+    ap.add_argument("--out", default="data/hourly_scenarios.csv", help="CSV: une ligne par mois × company × scénario")
+    ap.add_argument("--eia_prices", default="data/eia_electricity_us_commercial.csv")
+    ap.add_argument("--gpu_overrides", default="data/gpu_hour_overrides.csv")
+    ap.add_argument("--region_prices", default="data/eia_electricity_us_commercial_by_region.csv")
+    ap.add_argument("--company_regions", default="data/company_regions.csv")
+    args = ap.parse_args(argv)
+
+    cfg = load_config(args.config)
+    df = build_inputs(args.start, args.end, args.eia_prices, args.gpu_overrides,
+                      args.region_prices, args.company_regions)
+    t0 = time.perf_counter()
+    out = run_scenarios(df, cfg, args.company_regions)
+    dt = time.perf_counter() - t0
+    if os.path.dirname(args.out):
+        os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    out.to_csv(args.out, index=False)
+    summary = out.groupby("scenario", sort=False)[["utilization_flagship", "cost_per_million_tokens_usd",
+                                                   "cost_monthly_model_usd"]].mean()
+    print(summary.to_string(float_format=lambda v: f"{v:.4f}"))
+    print(f"{out['scenario'].nunique()} scénarios × {len(df)} lignes × {MAX_HOURS} h en {dt * 1000:.1f} ms")
+    print(f"Wrote {len(out)} rows to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+import glob, hashlib, json, os, threading, time
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+
+import instrument
+
+DEFAULT_USER_AGENT = "llm-econ-research-bot/0.1"
+
+# Paramètres exclus de la clé de cache et jamais écrits sur disque
+SECRET_PARAMS = {"api_key"}
+CACHED_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+# Bornes du cache (purgé à la création de la session en mode "on"): âge des entrées et taille des corps
+DEFAULT_CACHE_MAX_AGE = 30 * 86400
+DEFAULT_CACHE_MAX_MB = 256
+
+class DeadlineExceeded(requests.Timeout):
+    """Deadline globale du pipeline atteinte avant l'envoi de la requête."""
+
+class CacheMiss(requests.ConnectionError):
+    """Mode replay: aucune réponse enregistrée pour cette requête."""
+
+class ResponseCache:
+    """
+    Cache disque des réponses GET 200.
+    - meta/<clé>.json : url (sans secrets), en-têtes utiles (ETag/Last-Modified), sha256 du corps, date
+    - blobs/<sha[:2]>/<sha> : corps adressé par contenu (dédupliqué entre URLs)
+    La clé = sha256(méthode + URL canonique avec paramètres triés, hors SECRET_PARAMS).
+    prune() borne l'âge (max_age, secondes) et la taille (max_bytes) et supprime les corps orphelins
+    (anciennes versions d'une page); 0 = pas de borne.
+    """
+    def __init__(self, root, ttl=0.0, max_age=0.0, max_bytes=0):
+        self.root = root
+        self.ttl = ttl
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def canonical_url(url, params=None):
+        items = params.items() if isinstance(params, dict) else (params or [])
+        public = sorted(((k, v) for k, v in items if k not in SECRET_PARAMS), key=lambda kv: (kv[0], str(kv[1])))
+        return requests.Request("GET", url, params=public).prepare().url
+
+    def key(self, method, url, params=None):
+        return hashlib.sha256(f"{method.upper()} {self.canonical_url(url, params)}".encode()).hexdigest()
+
+    def _meta_path(self, key):
+        return os.path.join(self.root, "meta", f"{key}.json")
+
+    def _blob_path(self, sha):
+        return os.path.join(self.root, "blobs", sha[:2], sha)
+
+    @staticmethod
+    def _atomic_write(path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp{os.getpid()}.{threading.get_ident()}"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def lookup(self, key):
+        try:
+            with open(self._meta_path(key), encoding="utf-8") as f:
+                meta = json.load(f)
+            return meta if os.path.exists(self._blob_path(meta["sha256"])) else None
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def is_fresh(self, meta):
+        return self.ttl > 0 and time.time() - meta["stored_at"] < self.ttl
+
+    def store(self, key, resp, url):
+        body = resp.content
+        sha = hashlib.sha256(body).hexdigest()
+        try:
+            os.utime(self._blob_path(sha))  # déjà présent: rajeuni, prune() ne le prend pas pour un orphelin
+        except OSError:
+            self._atomic_write(self._blob_path(sha), body)
+        meta = {
+            "url": url,
+            "status": resp.status_code,
+            "encoding": resp.encoding,
+            "headers": {h: resp.headers[h] for h in CACHED_HEADERS if h in resp.headers},
+            "sha256": sha,
+            "stored_at": time.time(),
+        }
+        self._atomic_write(self._meta_path(key), json.dumps(meta).encode())
+        return meta
+
+    def touch(self, key, meta, resp_304):
+        # 304: le corps n'a pas changé; on rafraîchit la date et les validateurs éventuels
+        for h in ("ETag", "Last-Modified"):
+            if h in resp_304.headers:
+                meta["headers"][h] = resp_304.headers[h]
+        meta["stored_at"] = time.time()
+        self._atomic_write(self._meta_path(key), json.dumps(meta).encode())
+        return meta
+
+    def prune(self, grace=300.0):
+        """
+        Entrées plus vieilles que max_age supprimées, puis les moins récemment stockées / revalidées tant
+        que les corps dépassent max_bytes; enfin les corps qu'aucune entrée ne référence. `grace` (s):
+        corps récents gardés, un store() concurrent écrit le corps avant l'entrée.
+        Retour: (entrées supprimées, corps supprimés, octets libérés).
+        """
+        now = time.time()
+        blobs = {}
+        for path in glob.glob(os.path.join(self.root, "blobs", "*", "*")):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            blobs[os.path.basename(path)] = (path, st.st_size, st.st_mtime)
+        entries = []
+        for path in glob.glob(os.path.join(self.root, "meta", "*.json")):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    meta = json.load(f)
+                entries.append((float(meta["stored_at"]), path, meta["sha256"]))
+            except (OSError, ValueError, KeyError, TypeError):
+                entries.append((0.0, path, None))  # illisible: supprimée
+        entries.sort(reverse=True)  # plus récentes d'abord
+
+        kept, size, n_meta = set(), 0, 0
+        for stored_at, path, sha in entries:
+            extra = blobs[sha][1] if sha in blobs and sha not in kept else 0
+            if (sha in blobs and not (self.max_age and now - stored_at > self.max_age)
+                    and not (self.max_bytes and size + extra > self.max_bytes)):
+                kept.add(sha)
+                size += extra
+                continue
+            try:
+                os.remove(path)
+                n_meta += 1
+            except OSError:
+                pass
+        n_blob = freed = 0
+        for name, (path, nbytes, mtime) in blobs.items():
+            if name not in kept and now - mtime > grace:
+                try:
+                    os.remove(path)
+                    n_blob += 1
+                    freed += nbytes
+                except OSError:
+                    pass
+        return n_meta, n_blob, freed
+
+    def conditional_headers(self, meta):
+        h = {}
+        if "ETag" in meta["headers"]:
+            h["If-None-Match"] = meta["headers"]["ETag"]
+        if "Last-Modified" in meta["headers"]:
+            h["If-Modified-Since"] = meta["headers"]["Last-Modified"]
+        return h
+
+    def to_response(self, meta, cache_status):
+        with open(self._blob_path(meta["sha256"]), "rb") as f:
+            body = f.read()
+        resp = requests.Response()
+        resp.status_code = meta["status"]
+        resp.reason = "OK"
+        resp._content = body
+        resp.headers = CaseInsensitiveDict(meta["headers"])
+        resp.url = meta["url"]
+        resp.encoding = meta.get("encoding")
+        resp.cache_status = cache_status  # "hit" | "revalidated" | "replay"
+        return resp
+
+class PooledSession(requests.Session):
+    """
+    Session partagée entre fetchers: pool keep-alive, retries avec backoff exponentiel
+    (429/5xx, Retry-After respecté), limite de requêtes simultanées par hôte et deadline
+    globale (le timeout de chaque requête est borné par le temps restant).
+    """
+    def __init__(self, per_host=4, retries=3, backoff=0.5, pool_maxsize=16, deadline=None,
+                 cache=None, replay=False):
+        super().__init__()
+        retry = Retry(
+            total=retries, backoff_factor=backoff,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset({"GET", "HEAD"}),
+            respect_retry_after_header=True,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize, max_retries=retry)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+        self.headers["User-Agent"] = os.getenv("HTTP_USER_AGENT", DEFAULT_USER_AGENT)
+        self.per_host = per_host
+        self.deadline = deadline  # time.monotonic() absolu, ou None
+        self.cache = cache        # ResponseCache ou None
+        self.replay = replay      # True: aucune requête réseau, uniquement le cache
+        self._host_slots = {}
+        self._lock = threading.Lock()
+
+    def _slot(self, host):
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return self._host_slots[host]
+
+    def request(self, method, url, **kwargs):
+        if self.cache is None or method.upper() != "GET":
+            return self._send(method, url, **kwargs)
+
+        public_url = self.cache.canonical_url(url, kwargs.get("params"))
+        key = self.cache.key(method, url, kwargs.get("params"))
+        meta = self.cache.lookup(key)
+        if self.replay:
+            if meta is None:
+                instrument.record_cache("replay_miss")
+                raise CacheMiss(f"Replay: pas de réponse enregistrée pour {public_url}")
+            return self._from_cache(meta, "replay")
+        if meta is not None and self.cache.is_fresh(meta):
+            return self._from_cache(meta, "hit")
+        if meta is not None:
+            kwargs["headers"] = {**(kwargs.get("headers") or {}), **self.cache.conditional_headers(meta)}
+
+        resp = self._send(method, url, **kwargs)
+        if resp.status_code == 304 and meta is not None:
+            return self._from_cache(self.cache.touch(key, meta, resp), "revalidated")
+        if resp.status_code == 200:
+            self.cache.store(key, resp, public_url)
+        resp.cache_status = "miss"
+        instrument.record_cache("miss")
+        return resp
+
+    def _from_cache(self, meta, cache_status):
+        instrument.record_cache(cache_status)
+        return self.cache.to_response(meta, cache_status)
+
+    def _send(self, method, url, **kwargs):
+        if self.deadline is not None:
+            remaining = self.deadline - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceeded(f"Deadline atteinte avant {method} {url}")
+            timeout = kwargs.get("timeout")
+            kwargs["timeout"] = min(timeout, remaining) if timeout else remaining
+        with self._slot(urlsplit(url).netloc):
+            try:
+                resp = super().request(method, url, **kwargs)
+            except requests.RequestException as e:
+                instrument.record_error(e)
+                raise
+        instrument.record_response(resp)
+        return resp
+
+def make_session(per_host=4, retries=3, backoff=0.5, deadline_s=None,
+                 cache_dir=None, cache_ttl=None, cache_mode=None):
+    """
+    Session poolée; `deadline_s` = budget total en secondes à partir de maintenant.
+    Cache: `cache_mode` on | off | replay (défaut: $HTTP_CACHE_MODE ou "on"),
+    `cache_dir` (défaut: $HTTP_CACHE_DIR ou data/.http_cache), `cache_ttl` en secondes
+    (défaut: $HTTP_CACHE_TTL ou 0 = revalidation conditionnelle à chaque appel).
+    En mode "on", le cache est purgé à l'ouverture: $HTTP_CACHE_MAX_AGE secondes (défaut 30 jours),
+    $HTTP_CACHE_MAX_MB Mo (défaut 256), corps orphelins. Jamais en replay (enregistrements conservés).
+    """
+    deadline = time.monotonic() + deadline_s if deadline_s else None
+    mode = (cache_mode or os.getenv("HTTP_CACHE_MODE", "on")).lower()
+    cache = None
+    if mode != "off":
+        cache = ResponseCache(
+            cache_dir or os.getenv("HTTP_CACHE_DIR", os.path.join("data", ".http_cache")),
+            ttl=float(cache_ttl if cache_ttl is not None else os.getenv("HTTP_CACHE_TTL", "0")),
+            max_age=float(os.getenv("HTTP_CACHE_MAX_AGE", DEFAULT_CACHE_MAX_AGE)),
+            max_bytes=int(float(os.getenv("HTTP_CACHE_MAX_MB", DEFAULT_CACHE_MAX_MB)) * 1e6),
+        )
+        if mode == "on":
+            cache.prune()
+    return PooledSession(per_host=per_host, retries=retries, backoff=backoff, deadline=deadline,
+                         cache=cache, replay=(mode == "replay"))
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Build incrémental de la série mensuelle (build_monthly_series.py --incremental).
+
+Un manifeste JSON à côté de la sortie garde l'empreinte de chaque fichier d'entrée
+(stat puis sha256), du code du modèle, de la sortie elle-même et de chaque mois
+(hash des intrants effectifs après ffill/bfill). Si rien n'a changé on sort avant même
+d'importer pandas (aussi via build_monthly_series.py --incremental et llmecon, cf. up_to_date).
+Sinon les intrants sont reconstruits sur toute la grille (build_inputs: les as-of ffill/bfill
+rendent un mois dépendant des précédents, l'empreinte d'un mois n'est connue qu'après), puis
+seuls les mois dont l'empreinte a bougé passent par compute_outputs et sont fusionnés dans la
+sortie existante (écriture atomique).
+"""
+import argparse, hashlib, json, os, time
+
+MODEL_CODE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "build_monthly_series.py")
+HOURLY_CODE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "hourly_energy.py")
+MANIFEST_VERSION = 1
+
+def manifest_path(out_path):
+    return out_path + ".manifest.json"
+
+def file_fingerprint(path, previous=None):
+    """{path, size, mtime_ns, sha256}; le sha256 n'est recalculé que si taille/mtime ont bougé."""
+    if not path or not os.path.exists(path):
+        return None
+    st = os.stat(path)
+    if (previous and previous.get("path") == path and previous.get("size") == st.st_size
+            and previous.get("mtime_ns") == st.st_mtime_ns):
+        return previous
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return {"path": path, "size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": h.hexdigest()}
+
+def _same_content(a, b):
+    return (a is None and b is None) or (a is not None and b is not None
+                                         and a["path"] == b["path"] and a["sha256"] == b["sha256"])
+
+def load_manifest(out_path):
+    try:
+        with open(manifest_path(out_path), encoding="utf-8") as f:
+            m = json.load(f)
+        return m if m.get("version") == MANIFEST_VERSION else None
+    except (OSError, ValueError):
+        return None
+
+def _atomic_write_text(path, text):
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+def write_manifest(out_path, manifest):
+    _atomic_write_text(manifest_path(out_path), json.dumps(manifest, indent=1, sort_keys=True))
+
+def hourly_files(config):
+    """JSON --hourly + CSV horaires qu'il référence (même résolution que hourly_energy.load_config)."""
+    with open(config, encoding="utf-8") as f:
+        cfg = json.load(f)
+    out = [config]
+    for key in ("hourly_prices", "hourly_load"):
+        path = cfg.get(key)
+        if path and not os.path.exists(path) and os.path.exists(os.path.join(os.path.dirname(config), path)):
+            path = os.path.join(os.path.dirname(config), path)
+        if path:
+            out.append(path)
+    return out
+
+def run_params(args):
+    params = {"start": args.start, "end": args.end}
+    if getattr(args, "hourly", None):
+        params["hourly"] = args.hourly
+    return params
+
+def check_fast_path(args, manifest):
+    """
+    (à_jour, empreintes fichiers courantes). Ne dépend que de la stdlib: c'est le chemin
+    du cron horaire quand rien n'a bougé.
+    """
+    prev = (manifest or {}).get("files", {})
+    files = {
+        "eia_prices": file_fingerprint(args.eia_prices, prev.get("eia_prices")),
+        "gpu_overrides": file_fingerprint(args.gpu_overrides, prev.get("gpu_overrides")),
+        "region_prices": file_fingerprint(args.region_prices, prev.get("region_prices")),
+        "company_regions": file_fingerprint(args.company_regions, prev.get("company_regions")),
+        "model": file_fingerprint(MODEL_CODE, prev.get("model")),
+    }
+    if getattr(args, "hourly", None):
+        files["hourly_model"] = file_fingerprint(HOURLY_CODE, prev.get("hourly_model"))
+        for i, path in enumerate(hourly_files(args.hourly)):
+            files[f"hourly_{i}"] = file_fingerprint(path, prev.get(f"hourly_{i}"))
+    output = file_fingerprint(args.out, (manifest or {}).get("output"))
+    up_to_date = (
+        manifest is not None
+        and manifest.get("params") == run_params(args)
+        and all(_same_content(files[k], prev.get(k)) for k in files)
+        and _same_content(output, manifest.get("output"))
+    )
+    return up_to_date, files, output
+
+def month_fingerprints(df):
+    """Empreinte par date des intrants effectifs (toutes entités de la date confondues)."""
+    import pandas as pd
+    h = pd.util.hash_pandas_object(df, index=False)
+    per_date = h.groupby(df["date"].to_numpy()).sum()  # uint64, indépendant de l'ordre des lignes
+    return {d: f"{int(v):016x}" for d, v in per_date.items()}
+
+def dirty_months(months, manifest, full=False):
+    """Dates à recalculer: toutes si `full` ou sans manifeste, sinon celles dont l'empreinte diffère."""
+    prev = (manifest or {}).get("months", {})
+    if full or manifest is None:
+        return sorted(months)
+    return sorted(d for d, fp in months.items() if prev.get(d) != fp)
+
+def _fast_path(args, t0):
+    """Stdlib seule. Sortie à jour → manifeste rafraîchi si besoin, message, (True, ...)."""
+    manifest = load_manifest(args.out)
+    up_to_date, files, output = check_fast_path(args, manifest)
+    if up_to_date:
+        if files != manifest["files"] or output != manifest["output"]:
+            # Contenu identique mais stat modifié (touch, checkout): on rafraîchit le manifeste
+            manifest["files"], manifest["output"] = files, output
+            write_manifest(args.out, manifest)
+        print(f"À jour ({args.out}) — rien à recalculer ({(time.perf_counter() - t0) * 1000:.1f} ms)")
+    return up_to_date, manifest, files, output
+
+def up_to_date(argv):
+    """
+    build_monthly_series.py --incremental / llmecon build --incremental, avant d'importer pandas:
+    True si la sortie est à jour (message affiché, rien d'autre à faire). Sinon False et le build
+    valide puis exécute normalement (options absentes d'ici, --help, arguments manquants compris).
+    """
+    ap = parser(add_help=False, required=False)
+    ap.allow_abbrev = False  # préfixe ambigu ou propre au build → non reconnu → build normal
+    ap.add_argument("--incremental", action="store_true")
+    args, unknown = ap.parse_known_args(argv)
+    if unknown or not args.incremental or not (args.start and args.end and args.out and args.out.endswith(".csv")):
+        return False
+    return _fast_path(args, time.perf_counter())[0]
+
+def run_incremental(args):
+    t0 = time.perf_counter()
+    done, manifest, files, output = _fast_path(args, t0)
+    if done:
+        return
+
+    import pandas as pd
+    from build_monthly_series import OUTPUT_COLS, build_inputs, compute_outputs
+
+    df = build_inputs(args.start, args.end, args.eia_prices, args.gpu_overrides,
+                      args.region_prices, args.company_regions)
+    if getattr(args, "hourly", None):
+        from hourly_energy import apply_hourly
+        df = apply_hourly(df, args.hourly, args.company_regions)
+    months = month_fingerprints(df)
+
+    prev_months = (manifest or {}).get("months", {})
+    full = (
+        manifest is None or output is None
+        or not _same_content(output, manifest.get("output"))
+        or not _same_content(files["model"], manifest["files"].get("model"))
+    )
+    changed = dirty_months(months, manifest, full)
+
+    if not changed and set(prev_months) == set(months):
+        # Fichiers modifiés sans effet sur les intrants effectifs: seul le manifeste bouge
+        manifest.update(files=files, output=output, months=months)
+        write_manifest(args.out, manifest)
+        print(f"Intrants effectifs inchangés ({args.out}) — 0/{len(months)} mois recalculés "
+              f"({(time.perf_counter() - t0) * 1000:.1f} ms)")
+        return
+
+    new_rows = compute_outputs(df[df["date"].isin(changed)].copy())[OUTPUT_COLS]
+    if full:
+        merged = new_rows
+    else:
+        existing = pd.read_csv(args.out, float_precision="round_trip")
+        kept = existing[existing["date"].isin(list(months)) & ~existing["date"].isin(changed)]
+        merged = df[["date", "company"]].merge(pd.concat([kept, new_rows], ignore_index=True),
+                                                on=["date", "company"], how="left")[OUTPUT_COLS]
+
+    out_dir = os.path.dirname(args.out)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    _atomic_write_text(args.out, merged.to_csv(index=False))
+    write_manifest(args.out, {
+        "version": MANIFEST_VERSION,
+        "params": run_params(args),
+        "files": files,
+        "output": file_fingerprint(args.out),
+        "months": months,
+    })
+    if getattr(args, "store", None):
+        from storage import write_table
+        write_table(merged, "llm_economics", root=args.store, mode="overwrite")
+    mode = "complet" if full else "incrémental"
+    print(f"Build {mode}: {len(changed)}/{len(months)} mois recalculés, {len(merged)} lignes "
+          f"→ {args.out} ({(time.perf_counter() - t0) * 1000:.1f} ms)")
+
+def parser(add_help=True, required=True):
+    ap = argparse.ArgumentParser(description="Build incrémental de la série mensuelle.", add_help=add_help)
+    ap.add_argument("--start", required=required, help="YYYY-MM (ex: 2023-08)")
+    ap.add_argument("--end",   required=required, help="YYYY-MM (ex: 2026-09)")
+    ap.add_argument("--out",   required=required, help="CSV de sortie")
+    ap.add_argument("--eia_prices", default="data/eia_electricity_us_commercial.csv")
+    ap.add_argument("--gpu_overrides", default="data/gpu_hour_overrides.csv")
+    ap.add_argument("--region_prices", default="data/eia_electricity_us_commercial_by_region.csv")
+    ap.add_argument("--company_regions", default="data/company_regions.csv")
+    ap.add_argument("--hourly", metavar="CONFIG", help="JSON des profils horaires (voir hourly_energy.py)")
+    ap.add_argument("--store", help="Racine du stockage Parquet (table llm_economics réécrite si recalcul)")
+    return ap
+
+def main(argv=None):
+    # Point d'entrée cron: stdlib seule tant que rien n'a changé (pandas importé à la demande)
+    run_incremental(parser().parse_args(argv))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Instrumentation commune des fetchers, du build et de l'orchestrateur.
+
+    with stage("fetch.eia") as st:
+        ...
+        st.rows_out = len(rows)
+
+Chaque étape mesure wall, CPU (thread et processus), RSS courant / pic, lignes in/out et les
+requêtes HTTP de PooledSession qui lui sont rattachées (statuts, retries, octets réseau, cache).
+L'étape courante suit le contexte (contextvars): threads du DAG, tâches asyncio; les pools de
+threads internes propagent l'étape via bind(). Réglages par variables d'environnement:
+
+  LLMECON_METRICS=data/metrics.jsonl      une ligne JSON par étape (append)
+  LLMECON_PROM=/var/lib/node_exporter/llmecon.prom
+                                          textfile Prometheus, fusionné avec l'existant et réécrit atomiquement
+  LLMECON_PROFILE=build.5_costs,fetch.*   cProfile sur ces étapes (motifs glob) → LLMECON_PROFILE_DIR
+  LLMECON_PROFILE_DIR=data/profiles       (défaut) fichiers <étape>-<run>.prof
+  LLMECON_TRACEMALLOC=build.*             pic d'allocations Python + lignes les plus coûteuses
+  LLMECON_RUN_ID=...                      identifiant commun aux lignes d'un run (défaut: horodatage-pid)
+
+Sans variable, les mesures restent en mémoire (records()) et rien n'est écrit.
+"""
+import argparse, contextvars, fnmatch, json, os, sys, threading, time
+from collections import deque
+
+_current = contextvars.ContextVar("llmecon_stage", default=None)
+_lock = threading.Lock()
+_records = deque(maxlen=10_000)  # process longs (service, cron en boucle): mémoire bornée
+RUN_ID = os.getenv("LLMECON_RUN_ID") or f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+
+def _patterns(var):
+    return [p.strip() for p in os.getenv(var, "").split(",") if p.strip()]
+
+def _matches(name, var):
+    return any(fnmatch.fnmatchcase(name, p) for p in _patterns(var))
+
+def rss_mb():
+    """(RSS courant, pic RSS du processus) en Mo; None si indisponible sur la plateforme."""
+    cur = peak = None
+    try:
+        with open("/proc/self/statm") as f:
+            cur = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        ru = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak = ru / 1e6 if sys.platform == "darwin" else ru * 1024 / 1e6  # octets (macOS) / Kio (Linux)
+    except ImportError:
+        pass
+    return cur, peak
+
+class Stage:
+    """Mesures d'une étape; à utiliser via stage(). Les compteurs HTTP sont thread-safe."""
+    def __init__(self, name, **labels):
+        self.name = name
+        self.labels = labels
+        self.rows_in = None
+        self.rows_out = None
+        self.http_status = {}
+        self.http_retries = 0
+        self.http_bytes = 0
+        self.http_cache = {}
+        self.extra = {}
+        self.status = "ok"
+        self.parent = None
+        self._lock = threading.Lock()
+        self._prof = self._tm = None
+
+    def set(self, **fields):
+        """Champs libres ajoutés à la ligne JSON (ex: endpoint, backend, nb de pages)."""
+        self.extra.update(fields)
+
+    def add_http(self, status, retries=0, nbytes=0):
+        with self._lock:
+            self.http_status[str(status)] = self.http_status.get(str(status), 0) + 1
+            self.http_retries += retries
+            self.http_bytes += nbytes
+
+    def add_cache(self, cache_status):
+        with self._lock:
+            self.http_cache[cache_status] = self.http_cache.get(cache_status, 0) + 1
+
+    def __enter__(self):
+        parent = _current.get()
+        self.parent = parent.name if parent else None
+        self._token = _current.set(self)
+        if _matches(self.name, "LLMECON_TRACEMALLOC"):
+            import tracemalloc
+            self._tm = not tracemalloc.is_tracing()
+            if self._tm:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        if _matches(self.name, "LLMECON_PROFILE"):
+            import cProfile
+            self._prof = cProfile.Profile()
+            try:
+                self._prof.enable()
+            except ValueError:  # un autre profileur est déjà actif sur ce thread (étape parente)
+                self._prof = None
+        self._started = time.time()
+        self._t0, self._c0, self._p0 = time.perf_counter(), time.thread_time(), time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._t0
+        cpu, cpu_proc = time.thread_time() - self._c0, time.process_time() - self._p0
+        if self._prof is not None:
+            self._prof.disable()
+            out_dir = os.getenv("LLMECON_PROFILE_DIR", os.path.join("data", "profiles"))
+            os.makedirs(out_dir, exist_ok=True)
+            path = os.path.join(out_dir, f"{self.name}-{RUN_ID}.prof")
+            self._prof.dump_stats(path)
+            self.extra["profile"] = path
+        if self._tm is not None:
+            import tracemalloc
+            self.extra["py_alloc_peak_mb"] = tracemalloc.get_traced_memory()[1] / 1e6
+            top = tracemalloc.take_snapshot().statistics("lineno")[:5]
+            self.extra["py_alloc_top"] = [f"{s.traceback[0].filename}:{s.traceback[0].lineno} {s.size / 1e6:.2f}MB"
+                                          for s in top]
+            if self._tm:
+                tracemalloc.stop()
+        if exc_type is not None:
+            self.status = "error"
+            self.extra["error"] = f"{exc_type.__name__}: {(str(exc).splitlines() or [''])[0]}"[:300]
+        _current.reset(self._token)
+        cur, peak = rss_mb()
+        rec = {
+            "run_id": RUN_ID, "ts": self._started, "stage": self.name, "parent": self.parent,
+            "status": self.status, "wall_s": round(wall, 6), "cpu_s": round(cpu, 6),
+            "cpu_process_s": round(cpu_proc, 6), "rss_mb": cur, "rss_peak_mb": peak,
+            "rows_in": self.rows_in, "rows_out": self.rows_out,
+            "http_requests": self.http_status or None, "http_retries": self.http_retries,
+            "http_bytes": self.http_bytes, "http_cache": self.http_cache or None,
+            **self.labels, **self.extra,
+        }
+        emit(rec)
+        return False
+
+def stage(name, **labels):
+    """Context manager d'étape (imbriquable; la parente est notée dans `parent`)."""
+    return Stage(name, **labels)
+
+def current():
+    return _current.get()
+
+def bind(fn):
+    """Rattache `fn` (exécutée dans un autre thread, ex: ThreadPoolExecutor.map) à l'étape courante."""
+    st = _current.get()
+    def run(*args, **kwargs):
+        token = _current.set(st)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return run
+
+class Steps:
+    """
+    Étapes numérotées successives d'une même fonction sans ré-indenter le code:
+        steps = Steps("build"); steps.next("1_grid") ... steps.next("2_eia") ... steps.close()
+    Chaque next() ferme l'étape précédente; close() (ou une exception via `with`) ferme la dernière.
+    """
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.current = None
+
+    def next(self, name, **fields):
+        self.close()
+        self.current = Stage(f"{self.prefix}.{name}")
+        self.current.rows_in = fields.pop("rows_in", None)
+        self.current.set(**fields)
+        return self.current.__enter__()
+
+    def close(self, exc_info=(None, None, None)):
+        if self.current is not None:
+            st, self.current = self.current, None
+            st.__exit__(*exc_info)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close(exc_info)
+        return False
+
+def record_response(resp):
+    """Réponse réseau (PooledSession._send): statut, retries urllib3, octets reçus."""
+    st = _current.get()
+    if st is None:
+        return
+    retries = getattr(getattr(resp, "raw", None), "retries", None)
+    content = getattr(resp, "_content", False)
+    if content not in (False, None):
+        nbytes = len(content)
+    else:  # stream=True: corps pas encore lu
+        try:
+            nbytes = int(resp.headers.get("Content-Length") or 0)
+        except ValueError:
+            nbytes = 0
+    st.add_http(resp.status_code, len(getattr(retries, "history", ()) or ()), nbytes)
+
+def record_error(exc):
+    st = _current.get()
+    if st is not None:
+        st.add_http(type(exc).__name__)
+
+def record_cache(cache_status):
+    st = _current.get()
+    if st is not None:
+        st.add_cache(cache_status)
+
+def records():
+    with _lock:
+        return list(_records)
+
+def emit(rec):
+    with _lock:
+        _records.append(rec)
+        path = os.getenv("LLMECON_METRICS")
+        if path:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(rec, ensure_ascii=False, default=str) + "\n")
+        prom = os.getenv("LLMECON_PROM")
+        if prom:
+            write_prom(prom, [rec])
+
+PROM_HELP = {
+    "llmecon_stage_wall_seconds": "Durée murale de la dernière exécution de l'étape",
+    "llmecon_stage_cpu_seconds": "CPU (thread) de la dernière exécution de l'étape",
+    "llmecon_stage_rss_peak_bytes": "Pic RSS du processus à la fin de l'étape",
+    "llmecon_stage_rows": "Lignes lues (in) / écrites (out)",
+    "llmecon_stage_http_requests": "Requêtes HTTP réseau par statut",
+    "llmecon_stage_http_retries": "Retries urllib3",
+    "llmecon_stage_http_bytes": "Octets HTTP reçus du réseau",
+    "llmecon_stage_http_cache": "Réponses par statut de cache",
+    "llmecon_stage_success": "1 si la dernière exécution a réussi",
+    "llmecon_stage_last_run_timestamp_seconds": "Fin de la dernière exécution (epoch)",
+}
+
+def _label(v):
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def prom_samples(rec):
+    """Échantillons Prometheus (nom{labels} → valeur) d'une ligne d'étape."""
+    lbl = f'stage="{_label(rec["stage"])}"'
+    out = {
+        f"llmecon_stage_wall_seconds{{{lbl}}}": rec["wall_s"],
+        f"llmecon_stage_cpu_seconds{{{lbl}}}": rec["cpu_s"],
+        f"llmecon_stage_success{{{lbl}}}": int(rec["status"] == "ok"),
+        f"llmecon_stage_last_run_timestamp_seconds{{{lbl}}}": round(rec["ts"] + rec["wall_s"], 3),
+        f"llmecon_stage_http_retries{{{lbl}}}": rec["http_retries"],
+        f"llmecon_stage_http_bytes{{{lbl}}}": rec["http_bytes"],
+    }
+    if rec.get("rss_peak_mb") is not None:
+        out[f"llmecon_stage_rss_peak_bytes{{{lbl}}}"] = int(rec["rss_peak_mb"] * 1e6)
+    for direction in ("in", "out"):
+        if rec.get(f"rows_{direction}") is not None:
+            out[f'llmecon_stage_rows{{{lbl},direction="{direction}"}}'] = rec[f"rows_{direction}"]
+    for code, n in (rec.get("http_requests") or {}).items():
+        out[f'llmecon_stage_http_requests{{{lbl},code="{_label(code)}"}}'] = n
+    for cache_status, n in (rec.get("http_cache") or {}).items():
+        out[f'llmecon_stage_http_cache{{{lbl},cache="{_label(cache_status)}"}}'] = n
+    return out
+
+def write_prom(path, recs):
+    """Fusionne les échantillons avec le textfile existant (autres étapes / runs) puis le réécrit atomiquement."""
+    samples = {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip() and not line.startswith("#"):
+                    key, _, value = line.rstrip("\n").rpartition(" ")
+                    samples[key] = value
+    except OSError:
+        pass
+    for rec in recs:
+        # Les séries à labels variables (codes HTTP, cache) de l'étape sont remplacées en bloc
+        lbl = f'stage="{_label(rec["stage"])}"'
+        samples = {k: v for k, v in samples.items() if lbl not in k}
+        samples.update({k: str(v) for k, v in prom_samples(rec).items()})
+    lines = []
+    for metric in sorted({k.split("{")[0] for k in samples}):
+        lines.append(f"# HELP {metric} {PROM_HELP.get(metric, metric)}")
+        lines.append(f"# TYPE {metric} gauge")
+        lines.extend(f"{k} {v}" for k, v in sorted(samples.items()) if k.split("{")[0] == metric)
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp, path)
+
+def read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def summarize(recs):
+    """Par étape: nb d'exécutions, erreurs, wall p50/p95/max, CPU moyen, pic RSS max, retries."""
+    by_stage = {}
+    for r in recs:
+        by_stage.setdefault(r["stage"], []).append(r)
+    out = []
+    for name, rs in sorted(by_stage.items()):
+        walls = sorted(r["wall_s"] for r in rs)
+        q = lambda p: walls[min(len(walls) - 1, int(p * (len(walls) - 1) + 0.5))]
+        peaks = [r["rss_peak_mb"] for r in rs if r.get("rss_peak_mb") is not None]
+        out.append({
+            "stage": name, "runs": len(rs), "errors": sum(r["status"] != "ok" for r in rs),
+            "wall_p50_s": q(0.5), "wall_p95_s": q(0.95), "wall_max_s": walls[-1],
+            "cpu_mean_s": sum(r["cpu_s"] for r in rs) / len(rs),
+            "rss_peak_max_mb": max(peaks) if peaks else None,
+            "http_retries": sum(r.get("http_retries") or 0 for r in rs),
+        })
+    return out
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Résumé des métriques JSONL (SLO / régressions) ou conversion en textfile Prometheus.")
+    ap.add_argument("metrics", nargs="?", default=os.getenv("LLMECON_METRICS", "data/metrics.jsonl"))
+    ap.add_argument("--run", help="Ne garder que ce run_id (défaut: tous)")
+    ap.add_argument("--prom", help="Écrire le dernier état de chaque étape dans ce textfile Prometheus")
+    args = ap.parse_args(argv)
+
+    if not os.path.exists(args.metrics):
+        raise SystemExit(f"Pas de métriques: {args.metrics} (export LLMECON_METRICS=...)")
+    recs = [r for r in read_jsonl(args.metrics) if not args.run or r.get("run_id") == args.run]
+    if args.prom:
+        write_prom(args.prom, recs)
+        print(f"Wrote {len(recs)} étapes to {args.prom}")
+    print(f"{'étape':<28} {'runs':>5} {'err':>4} {'p50 s':>9} {'p95 s':>9} {'max s':>9} {'cpu s':>8} {'rss Mo':>8} {'retries':>7}")
+    for s in summarize(recs):
+        rss = f"{s['rss_peak_max_mb']:.0f}" if s["rss_peak_max_mb"] is not None else "-"
+        print(f"{s['stage']:<28} {s['runs']:>5} {s['errors']:>4} {s['wall_p50_s']:>9.3f} {s['wall_p95_s']:>9.3f} "
+              f"{s['wall_max_s']:>9.3f} {s['cpu_mean_s']:>8.3f} {rss:>8} {s['http_retries']:>7}")
+
+if __name__ == "__main__":
+    main()
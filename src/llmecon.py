@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Point d'entrée unique: `llmecon <commande> [options]` (ex: python src/llmecon.py build --help).
+
+Chaque commande délègue au main(argv) du script correspondant, importé seulement quand elle est
+lancée: `--help` et les commandes légères (metrics, incremental sans changement) ne paient ni
+pandas, ni requests, ni Playwright. `run` enchaîne fetch EIA → build dans un seul process,
+DataFrames en mémoire; les fichiers intermédiaires ne sont écrits qu'en checkpoint (--checkpoint-dir).
+"""
+import sys
+
+# commande → (module de src/, description). Rien n'est importé avant l'appel.
+COMMANDS = {
+    "openai":      ("fetch_openai_pricing", "Prix API OpenAI ($/1M tokens) → CSV"),
+    "anthropic":   ("fetch_anthropic_pricing", "Prix API Anthropic ($/1M tokens) → CSV"),
+    "vast":        ("fetch_vast_api", "Carnet d'offres Vast.ai → snapshot + historique partitionné"),
+    "lambda":      ("fetch_lambda_gpu", "Prix GPU Lambda (HTML statique, Chromium si besoin) → CSV"),
+    "eia":         ("fetch_eia", "Prix électricité commercial EIA (US, régions, états) → CSV"),
+    "gpu-sketch":  ("gpu_price_sketch", "Sketches de quantiles $/GPU-h → overrides auto"),
+    "build":       ("build_monthly_series", "Série coût / break-even (grille dates × entités)"),
+    "incremental": ("incremental", "Build incrémental (ne recalcule que les mois modifiés)"),
+    "pipeline":    ("run_pipeline", "Orchestrateur: DAG des fetchers + build, fichiers entre étapes"),
+    "sweep":       ("scenario_sweep", "Balayage de scénarios (what-if)"),
+    "goal-seek":   ("goal_seek", "Intrant requis pour un coût / break-even cible, sensibilités"),
+    "hourly":      ("hourly_energy", "Électricité horaire (TOU) et profils de charge"),
+    "quote":       ("quote_service", "Cotations break-even (requête unique, bench ou endpoint HTTP)"),
+    "storage":     ("storage", "Stockage Parquet (import, export, info)"),
+    "load-db":     ("load_db", "Chargement PostgreSQL"),
+    "extract":     ("price_extract", "Extracteur de prix HTML en un passage (et son bench)"),
+    "metrics":     ("instrument", "Résumé des métriques par étape (p50 / p95 / max)"),
+}
+RUN_HELP = "Fetch EIA → build dans un seul process, en mémoire (checkpoints optionnels)"
+
+# Étapes de `run`: (dépendances, fonction(ctx)) comme run_pipeline.STAGES. Les fetchers de prix API / GPU
+# n'ont pas de consommateur en mémoire: leur table n'existe que comme checkpoint.
+CHECKPOINT_ONLY = ("openai", "anthropic", "lambda")
+
+def _checkpoint(ctx, name, write):
+    path = ctx["checkpoints"].get(name) if ctx["checkpoints"] else None
+    if path:
+        write(path)
+    return path
+
+def run_openai(ctx):
+    from fetch_openai_pricing import fetch_openai_pricing, write_csv
+    rows = fetch_openai_pricing(ctx["ua"], session=ctx["session"])
+    _checkpoint(ctx, "openai", lambda p: write_csv(rows, p))
+    return len(rows)
+
+def run_anthropic(ctx):
+    from fetch_anthropic_pricing import fetch_anthropic_pricing, write_csv
+    rows = fetch_anthropic_pricing(ctx["ua"], session=ctx["session"])
+    _checkpoint(ctx, "anthropic", lambda p: write_csv(rows, p))
+    return len(rows)
+
+def run_lambda(ctx):
+    import asyncio
+    from fetch_lambda_gpu import URL, fetch_prices, write_csv
+    from run_pipeline import playwright_timeout_ms
+    rows, _ = asyncio.run(fetch_prices([URL], session=ctx["session"], timeout_ms=playwright_timeout_ms(ctx)))
+    _checkpoint(ctx, "lambda", lambda p: write_csv(rows, p))
+    return len(rows)
+
+def run_eia(ctx):
+    import os
+    from fetch_eia import fetch_retail_sales_records, aggregate_prices, to_frame
+    api_key = os.environ.get("EIA_API_KEY")
+    if not api_key:
+        raise RuntimeError("EIA_API_KEY manquant (export EIA_API_KEY=...)")
+    agg = aggregate_prices(fetch_retail_sales_records(api_key, ctx["start"], ctx["end"], session=ctx["session"]))
+    us, regional = to_frame(agg[agg["level"] == "us"]), to_frame(agg)
+    ctx["frames"]["eia"], ctx["frames"]["eia_regions"] = us, regional
+    for name, df in (("eia", us), ("eia_regions", regional)):
+        _checkpoint(ctx, name, lambda p, df=df: _to_csv(df, p))
+    return len(us)
+
+def _to_csv(df, path):
+    import os
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    df.to_csv(path, index=False)
+
+def run_build(ctx):
+    from build_monthly_series import build_inputs, compute_outputs, write_outputs
+    # Intrants en mémoire s'ils viennent d'une étape de ce run, sinon les fichiers de --data-dir
+    src = {k: ctx["frames"].get(k, ctx["paths"][k]) for k in ("eia", "eia_regions")}
+    df = build_inputs(ctx["start"], ctx["end"], src["eia"], ctx["paths"]["gpu_overrides"], src["eia_regions"],
+                      ctx["paths"]["company_regions"], grid=ctx["grid"])
+    if ctx["hourly"]:
+        from hourly_energy import apply_hourly
+        df = apply_hourly(df, ctx["hourly"], ctx["paths"]["company_regions"])
+    df = compute_outputs(df)
+    write_outputs(df, ctx["out"], ctx["store"])
+    return len(df)
+
+RUN_STAGES = {
+    "openai":    ((), run_openai),
+    "anthropic": ((), run_anthropic),
+    "lambda":    ((), run_lambda),
+    "eia":       ((), run_eia),
+    "build":     (("eia",), run_build),
+}
+
+def run(argv):
+    import argparse, os, time
+    from dotenv import load_dotenv
+    from run_pipeline import add_session_args, default_paths, report, run_dag, session_from_args
+
+    load_dotenv()
+    ap = argparse.ArgumentParser(prog="llmecon run", description=RUN_HELP)
+    ap.add_argument("--start", required=True, help="YYYY-MM (ex: 2023-08)")
+    ap.add_argument("--end",   required=True, help="YYYY-MM (ex: 2026-09)")
+    ap.add_argument("--out", help="Sortie du build (défaut: <data-dir>/llm_economics_monthly.csv)")
+    ap.add_argument("--data-dir", default="data", help="Intrants non récupérés par ce run (overrides, company_regions, EIA)")
+    ap.add_argument("--only", default="",
+                    help=f"Étapes ({', '.join(RUN_STAGES)}); défaut: eia,build (+ {', '.join(CHECKPOINT_ONLY)} avec --checkpoint-dir)")
+    ap.add_argument("--checkpoint-dir", metavar="DIR",
+                    help="Écrit aussi les tables intermédiaires (mêmes noms de fichiers que data/)")
+    ap.add_argument("--grid", metavar="CONFIG", help="Grille dates × entités (voir build --grid)")
+    ap.add_argument("--hourly", metavar="CONFIG", help="Intégration horaire (voir hourly)")
+    ap.add_argument("--store", help="Racine du stockage Parquet: réécrit la table llm_economics")
+    add_session_args(ap)
+    ap.add_argument("--strict", action="store_true", help="Ne pas lancer le build si l'étape EIA a échoué")
+    ap.add_argument("--verbose", action="store_true")
+    args = ap.parse_args(argv)
+
+    selected = [s.strip() for s in args.only.split(",") if s.strip()]
+    if not selected:
+        selected = [s for s in RUN_STAGES if args.checkpoint_dir or s not in CHECKPOINT_ONLY]
+    unknown = set(selected) - set(RUN_STAGES)
+    if unknown:
+        ap.error(f"étapes inconnues: {sorted(unknown)} (disponibles: {list(RUN_STAGES)}; vast / gpu-sketch: pipeline)")
+    lost = [s for s in selected if s in CHECKPOINT_ONLY]
+    if lost and not args.checkpoint_dir:
+        ap.error(f"{lost}: sortie uniquement en checkpoint, ajouter --checkpoint-dir")
+
+    paths = default_paths(args.data_dir)
+    session = session_from_args(args)
+    ctx = {
+        "start": args.start, "end": args.end, "out": args.out or paths["build"],
+        "ua": os.getenv("HTTP_USER_AGENT", "llm-econ-research-bot/0.1"),
+        "session": session, "deadline": session.deadline, "paths": paths,
+        "checkpoints": default_paths(args.checkpoint_dir) if args.checkpoint_dir else None,
+        "frames": {}, "grid": args.grid, "hourly": args.hourly, "store": args.store, "verbose": args.verbose,
+    }
+    t0 = time.perf_counter()
+    status = run_dag(selected, ctx, strict=args.strict, stages=RUN_STAGES)
+    return 0 if report(selected, status, time.perf_counter() - t0) else 1
+
+def usage():
+    lines = ["usage: llmecon <commande> [options]   (llmecon <commande> --help pour ses options)", "",
+             "commandes:", f"  {'run':<12} {RUN_HELP}"]
+    lines += [f"  {name:<12} {desc}" for name, (_, desc) in COMMANDS.items()]
+    return "\n".join(lines)
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] in ("-h", "--help") or argv == ["help"]:
+        print(usage())
+        return 0
+    cmd, rest = argv[0], argv[1:]
+    if cmd == "help" and rest:
+        cmd, rest = rest[0], ["--help"]
+    if cmd == "run":
+        return run(rest)
+    if cmd not in COMMANDS:
+        import difflib
+        close = difflib.get_close_matches(cmd, ["run", *COMMANDS], n=3)
+        print(f"llmecon: commande inconnue '{cmd}'" + (f" (voulais-tu: {', '.join(close)} ?)" if close else ""),
+              file=sys.stderr)
+        print(usage(), file=sys.stderr)
+        return 2
+    import importlib
+    sys.argv[0] = f"llmecon {cmd}"  # argparse: "usage: llmecon build ..." au lieu du nom du script
+    if cmd == "build" and "--incremental" in rest:
+        from incremental import up_to_date
+        if up_to_date(rest):
+            return None
+    return importlib.import_module(COMMANDS[cmd][0]).main(rest)
+
+if __name__ == "__main__":
+    sys.exit(main())
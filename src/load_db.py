@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Chargement en masse dans la base (remplace les \\COPY manuels du README).
+
+Chaque source (CSV, Parquet / dataset de storage.py, ou DataFrame) est lue par chunks typés
+(storage.coerce), poussée dans une table temporaire de staging — COPY pour PostgreSQL,
+insertion native pour SQLite / DuckDB — puis fusionnée en une requête
+INSERT ... ON CONFLICT (clé) DO UPDATE: relancer un chargement ne duplique rien.
+Cibles: postgresql://... (pool psycopg2, tables chargées en parallèle), sqlite:///fichier.db,
+duckdb:///fichier.duckdb (embarquées, pour tester en local).
+"""
+import argparse, io, os, time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+
+from storage import SCHEMAS, coerce
+
+# Clés naturelles (index uniques de create_raw_tables.sql) → cible de ON CONFLICT
+KEYS = {
+    "raw_openai_pricing": ["fetched_at", "model"],
+    "raw_anthropic_pricing": ["fetched_at", "model"],
+    "raw_vast_gpu_market": ["fetched_at", "provider_id"],
+    "raw_lambda_gpu_pricing": ["fetched_at", "gpu_model", "source_url"],
+    "raw_eia_electricity": ["date", "region", "sector"],
+    "llm_economics": ["date", "company"],
+}
+
+# Sources par défaut (mêmes fichiers que l'ancien bloc \COPY du README)
+DEFAULT_SOURCES = {
+    "raw_openai_pricing": "data/openai_pricing.csv",
+    "raw_anthropic_pricing": "data/anthropic_pricing.csv",
+    "raw_vast_gpu_market": "data/vast_gpu_market.csv",
+    "raw_lambda_gpu_pricing": "data/lambda_gpu_pricing.csv",
+    "raw_eia_electricity": "data/eia_electricity_us_commercial.csv",
+    "llm_economics": "data/llm_economics_monthly.csv",
+}
+
+CHUNK_ROWS = 200_000
+STAGE = "_stage_load"
+COLUMN_KINDS = {c: k for cols in SCHEMAS.values() for c, k in cols.items()}
+EMBEDDED_TYPES = {"text": "TEXT", "numeric": "DOUBLE", "boolean": "BOOLEAN", "date": "DATE", "timestamp": "TIMESTAMP"}
+
+def parse_fetched_at(value):
+    """'YYYY-MM' ou 'YYYY-MM-DD' → Timestamp (fetched_at explicite des sources qui n'en ont pas)."""
+    ts = pd.to_datetime(value + "-01" if len(value) == 7 else value, format="%Y-%m-%d", errors="coerce")
+    if pd.isna(ts):
+        raise ValueError(f"fetched_at invalide: {value!r} (attendu YYYY-MM ou YYYY-MM-DD)")
+    return ts
+
+def iter_chunks(source, table, chunksize=CHUNK_ROWS, fetched_at=None):
+    """
+    DataFrames typés selon SCHEMAS[table]: CSV lu par chunks, .parquet / dataset par record batches.
+    fetched_at (clé des tables raw_*) manquant: `fetched_at` explicite, sinon ValueError — une date
+    devinée (mtime, heure du chargement) changerait d'un chargement à l'autre et dupliquerait les lignes.
+    """
+    if isinstance(source, pd.DataFrame):
+        chunks = (coerce(source.iloc[lo:lo + chunksize], table) for lo in range(0, len(source), chunksize))
+    elif source.endswith(".parquet") or os.path.isdir(source):
+        import pyarrow.dataset as ds
+        path = os.path.join(source, table) if os.path.isdir(os.path.join(source, table)) else source
+        batches = ds.dataset(path, format="parquet", partitioning="hive").to_batches(batch_size=chunksize)
+        chunks = (coerce(batch.to_pandas(), table) for batch in batches)
+    else:
+        chunks = (coerce(_snapshot_at(chunk), table) for chunk in pd.read_csv(source, dtype=str, chunksize=chunksize))
+    stamp = parse_fetched_at(fetched_at) if isinstance(fetched_at, str) else fetched_at
+    for chunk in chunks:
+        if "fetched_at" in KEYS[table]:
+            if stamp is not None:
+                chunk["fetched_at"] = chunk["fetched_at"].fillna(stamp)
+            missing = int(chunk["fetched_at"].isna().sum())
+            if missing:
+                raise ValueError(f"{table}: {missing} ligne(s) sans fetched_at dans {source if isinstance(source, str) else 'le DataFrame'} "
+                                 "(anciens fetchers): ajouter la colonne ou passer --fetched-at YYYY-MM[-DD]")
+        yield chunk
+
+def _snapshot_at(chunk):
+    if "snapshot_at" in chunk.columns:
+        chunk["fetched_at"] = pd.to_datetime(chunk["snapshot_at"], format="%Y%m%dT%H%M%SZ", errors="coerce")
+    return chunk
+
+def merge_sql(table, cols, keys):
+    """
+    Fusion staging → table; en cas de doublons dans le lot, la dernière ligne chargée gagne.
+    Les lignes identiques ne sont pas réécrites (updated_at intact → rafraîchissement incrémental des vues).
+    """
+    col_list = ", ".join(cols)
+    part = ", ".join(keys)
+    updates = [c for c in cols if c not in keys]
+    action = "DO NOTHING"
+    if updates:
+        action = ("DO UPDATE SET " + ", ".join(f"{c} = excluded.{c}" for c in updates)
+                  + " WHERE " + " OR ".join(f"{table}.{c} IS DISTINCT FROM excluded.{c}" for c in updates))
+    return (
+        f"INSERT INTO {table} ({col_list}) "
+        f"SELECT {col_list} FROM (SELECT *, ROW_NUMBER() OVER (PARTITION BY {part} ORDER BY _seq DESC) AS _rn "
+        f"FROM {STAGE}) s WHERE _rn = 1 "
+        f"ON CONFLICT ({part}) {action}"
+    )
+
+class Target:
+    """Cible générique DB-API; les sous-classes fournissent connexion, DDL et insertion du staging."""
+    def __init__(self, url):
+        self.url = url
+
+    def cursor(self, conn):
+        return conn.cursor()
+
+    def begin(self, cur):
+        pass  # psycopg2 / sqlite3 ouvrent la transaction implicitement
+
+    def columns(self, cur, table):
+        cur.execute(f"SELECT * FROM {table} WHERE 1 = 0")
+        return [d[0] for d in cur.description]
+
+    def load(self, table, source, chunksize=CHUNK_ROWS, fetched_at=None):
+        """
+        Charge une source dans `table` en une transaction. Retour: lignes chargées (clé complète).
+        `fetched_at`: date des lignes qui n'en ont pas (cf. iter_chunks).
+        """
+        conn = self.acquire()
+        try:
+            cur = self.cursor(conn)
+            self.begin(cur)
+            target_cols = set(self.columns(cur, table))
+            cols = [c for c in SCHEMAS[table] if c in target_cols]
+            cur.execute(f"DROP TABLE IF EXISTS {STAGE}")
+            cur.execute(f"CREATE TEMP TABLE {STAGE} AS SELECT {', '.join(cols)}, CAST(0 AS BIGINT) AS _seq "
+                        f"FROM {table} WHERE 1 = 0")
+            n = skipped = 0
+            for chunk in iter_chunks(source, table, chunksize, fetched_at):
+                # Clé incomplète: NULL ne déclenche jamais ON CONFLICT (et les colonnes clés sont NOT NULL)
+                keep = chunk[KEYS[table]].notna().all(axis=1)
+                skipped += int((~keep).sum())
+                chunk = chunk.loc[keep, cols].assign(_seq=np.arange(n, n + int(keep.sum()), dtype=np.int64))
+                self.stage(cur, chunk, cols + ["_seq"])
+                n += len(chunk)
+            cur.execute(merge_sql(table, cols, KEYS[table]))
+            cur.execute(f"DROP TABLE {STAGE}")
+            conn.commit()
+            if skipped:
+                print(f"  {table}: {skipped} ligne(s) sans clé complète ({', '.join(KEYS[table])}) ignorée(s)")
+            return n
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.release(conn)
+
+    def init_schema(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class PostgresTarget(Target):
+    """Pool psycopg2; staging par COPY ... FROM STDIN (CSV) chunk par chunk."""
+    def __init__(self, url, pool_size=4):
+        super().__init__(url)
+        from psycopg2.pool import ThreadedConnectionPool
+        self.pool = ThreadedConnectionPool(1, pool_size, url)
+        self.pool_size = pool_size
+
+    def acquire(self):
+        return self.pool.getconn()
+
+    def release(self, conn):
+        self.pool.putconn(conn)
+
+    def stage(self, cur, chunk, cols):
+        buf = io.StringIO()
+        chunk.to_csv(buf, index=False, header=False, na_rep="", date_format="%Y-%m-%d %H:%M:%S")
+        buf.seek(0)
+        cur.copy_expert(f"COPY {STAGE} ({', '.join(cols)}) FROM STDIN WITH (FORMAT csv)", buf)
+
+    def run_sql_file(self, path):
+        conn = self.acquire()
+        try:
+            with open(path, encoding="utf-8") as f:
+                conn.cursor().execute(f.read())
+            conn.commit()
+        finally:
+            self.release(conn)
+
+    def init_schema(self):
+        sql_dir = os.path.join(os.path.dirname(__file__), "sql")
+        self.run_sql_file(os.path.join(sql_dir, "create_raw_tables.sql"))
+        self.run_sql_file(os.path.join(sql_dir, "build_views.sql"))
+
+    def refresh_views(self, full=False):
+        """refresh_cost_views() de build_views.sql. Retour: nb de (date, company) recalculés."""
+        conn = self.acquire()
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT refresh_cost_views(%s)", (full,))
+            n = cur.fetchone()[0]
+            conn.commit()
+            return n
+        finally:
+            self.release(conn)
+
+    def close(self):
+        self.pool.closeall()
+
+class EmbeddedTarget(Target):
+    """Base SQLite / DuckDB: une connexion, schéma généré depuis storage.SCHEMAS."""
+    def acquire(self):
+        return self.conn
+
+    def release(self, conn):
+        pass
+
+    def init_schema(self):
+        cur = self.conn.cursor()
+        for table, cols in SCHEMAS.items():
+            body = ", ".join(f"{c} {EMBEDDED_TYPES[k]}" + (" NOT NULL" if c in KEYS[table] else "")
+                             for c, k in cols.items())
+            cur.execute(f"CREATE TABLE IF NOT EXISTS {table} ({body})")
+            cur.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS ux_{table} ON {table} ({', '.join(KEYS[table])})")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+class SQLiteTarget(EmbeddedTarget):
+    def __init__(self, url):
+        super().__init__(url)
+        import sqlite3
+        self.conn = sqlite3.connect(url.split("sqlite:///", 1)[1])
+
+    @staticmethod
+    def _py_values(chunk):
+        out = chunk.copy()
+        for c in out.columns:
+            if pd.api.types.is_datetime64_any_dtype(out[c]):
+                # Texte ISO à format fixe par type: les clés restent comparables d'un chargement à l'autre
+                out[c] = out[c].dt.strftime("%Y-%m-%d" if COLUMN_KINDS.get(c) == "date" else "%Y-%m-%d %H:%M:%S")
+        out = out.astype(object)
+        return out.where(out.notna(), None).itertuples(index=False, name=None)
+
+    def stage(self, cur, chunk, cols):
+        cur.executemany(f"INSERT INTO {STAGE} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})",
+                         self._py_values(chunk))
+
+class DuckDBTarget(EmbeddedTarget):
+    def __init__(self, url):
+        super().__init__(url)
+        import duckdb
+        self.conn = duckdb.connect(url.split("duckdb:///", 1)[1])
+
+    def cursor(self, conn):
+        return conn  # conn.cursor() ouvrirait une autre connexion, sans nos tables temporaires
+
+    def begin(self, cur):
+        cur.execute("BEGIN TRANSACTION")
+
+    def stage(self, cur, chunk, cols):
+        # DuckDB lit le DataFrame directement (colonnaire, sans conversion ligne à ligne)
+        cur.register("_chunk", chunk)
+        cur.execute(f"INSERT INTO {STAGE} ({', '.join(cols)}) SELECT {', '.join(cols)} FROM _chunk")
+        cur.unregister("_chunk")
+
+def connect(url, pool_size=4):
+    if url.startswith(("postgresql://", "postgres://")):
+        return PostgresTarget(url, pool_size)
+    if url.startswith("sqlite:///"):
+        return SQLiteTarget(url)
+    if url.startswith("duckdb:///"):
+        return DuckDBTarget(url)
+    raise SystemExit(f"URL de cible non supportée: {url} (postgresql://, sqlite:///, duckdb:///)")
+
+def load_all(target, sources, chunksize=CHUNK_ROWS, fetched_at=None):
+    """{table: source} → {table: lignes}; en parallèle sur le pool PostgreSQL, séquentiel en embarqué."""
+    workers = getattr(target, "pool_size", 1)
+    if workers <= 1 or len(sources) <= 1:
+        return {t: target.load(t, src, chunksize, fetched_at) for t, src in sources.items()}
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(sources)))) as ex:
+        futs = {t: ex.submit(target.load, t, src, chunksize, fetched_at) for t, src in sources.items()}
+        return {t: f.result() for t, f in futs.items()}
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Chargement COPY + upsert (PostgreSQL, SQLite, DuckDB).")
+    ap.add_argument("--target", default=os.getenv("DATABASE_URL"),
+                    help="postgresql://user@host/db | sqlite:///data/llm.db | duckdb:///data/llm.duckdb (défaut: $DATABASE_URL)")
+    ap.add_argument("--table", action="append", default=[], metavar="TABLE=SOURCE",
+                    help="Source CSV / .parquet / racine data/store (répétable; défaut: fichiers data/*.csv existants)")
+    ap.add_argument("--init", action="store_true", help="Crée tables et index uniques avant chargement")
+    ap.add_argument("--refresh", action="store_true",
+                    help="PostgreSQL: refresh_cost_views() après chargement (mv_cost_per_1m, mv_break_even)")
+    ap.add_argument("--full-refresh", action="store_true", help="Avec --refresh: tout recalculer")
+    ap.add_argument("--fetched-at", metavar="YYYY-MM[-DD]",
+                    help="Date des lignes sans fetched_at (anciens CSV de prix); sans elle, ces sources sont refusées")
+    ap.add_argument("--chunk", type=int, default=CHUNK_ROWS, help="Lignes par chunk")
+    ap.add_argument("--pool", type=int, default=4, help="Connexions PostgreSQL (tables chargées en parallèle)")
+    args = ap.parse_args(argv)
+    if not args.target:
+        ap.error("--target ou DATABASE_URL requis")
+    try:
+        fetched_at = parse_fetched_at(args.fetched_at) if args.fetched_at else None
+    except ValueError as e:
+        ap.error(str(e))
+
+    sources = dict(item.split("=", 1) for item in args.table) or \
+        {t: p for t, p in DEFAULT_SOURCES.items() if os.path.exists(p)}
+    unknown = set(sources) - set(SCHEMAS)
+    if unknown:
+        raise SystemExit(f"Tables inconnues: {sorted(unknown)} (disponibles: {list(SCHEMAS)})")
+
+    target = connect(args.target, args.pool)
+    try:
+        if args.init:
+            target.init_schema()
+        t0 = time.perf_counter()
+        counts = load_all(target, sources, args.chunk, fetched_at)
+        refreshed = None
+        if args.refresh:
+            if not isinstance(target, PostgresTarget):
+                raise SystemExit("--refresh: vues matérialisées disponibles sur PostgreSQL uniquement")
+            refreshed = target.refresh_views(full=args.full_refresh)
+    except ValueError as e:
+        raise SystemExit(str(e)) from None
+    finally:
+        target.close()
+    for t, n in counts.items():
+        print(f"  {t:<24} {n:>10,} lignes  ← {sources[t]}")
+    print(f"Chargé en {time.perf_counter() - t0:.2f}s")
+    if refreshed is not None:
+        print(f"Vues matérialisées: {refreshed} (date, company) recalculés")
+
+if __name__ == "__main__":
+    main()
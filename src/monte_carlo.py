@@ -0,0 +1,201 @@
+"""
+Mode Monte Carlo de build_monthly_series.py (--monte-carlo N).
+
+Chaque ligne date × company est échantillonnée par chunks de taille fixe dans un pool de
+processus. Un chunk ne renvoie qu'un histogramme log (bins fixes par ligne) → mémoire bornée
+quel que soit N, et les histogrammes se fusionnent par simple somme. Les percentiles sont
+interpolés dans l'histogramme et écrits au fil de l'eau, ligne par ligne.
+
+Les bornes viennent d'un tirage pilote (×2 de marge). Un tirage hors bornes n'est jamais rabattu
+dans un bin de bord: il est compté, et la ligne est re-binnée sur le min / max observés (mêmes
+graines → mêmes tirages). Les coûts non positifs ou non finis, impossibles à placer en log, sont
+exclus des percentiles et leur part est écrite dans la colonne invalid_pct.
+"""
+import csv, itertools, json, os, sys, time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from build_monthly_series import DEFAULTS, TIERS, TARGET_MARGIN, cost_per_million, break_even_price
+
+MODEL_INPUTS = list(DEFAULTS.keys())
+N_BINS = 8192
+PILOT_DRAWS = 20_000
+PILOT_CHUNK = 2**32 - 1  # identifiant de chunk réservé au tirage pilote
+
+def load_config(path):
+    """
+    JSON: {"seed": 42, "inputs": {nom: {"dist": ..., ...}}}
+    dist: fixed(value) | uniform(low, high) | normal(mean, sd) | lognormal(median, sigma)
+          | triangular(low, mode, high). Options: "relative": true (multiplie la valeur
+          du mois), "min"/"max" (écrêtage).
+    """
+    with open(path, encoding="utf-8") as f:
+        cfg = json.load(f)
+    inputs = cfg.get("inputs", {})
+    unknown = set(inputs) - set(MODEL_INPUTS)
+    if unknown:
+        raise SystemExit(f"Intrants Monte Carlo inconnus: {sorted(unknown)} (attendus: {MODEL_INPUTS})")
+    return cfg
+
+def _draw(rng, spec, n):
+    dist = spec.get("dist", "fixed")
+    if dist == "fixed":
+        return np.full(n, float(spec["value"]))
+    if dist == "uniform":
+        return rng.uniform(spec["low"], spec["high"], n)
+    if dist == "normal":
+        return rng.normal(spec["mean"], spec["sd"], n)
+    if dist == "lognormal":
+        return rng.lognormal(np.log(spec["median"]), spec["sigma"], n)
+    if dist == "triangular":
+        return rng.triangular(spec["low"], spec["mode"], spec["high"], n)
+    raise ValueError(f"Distribution inconnue: {dist}")
+
+def sample_cost(base, specs, rng, n):
+    """n tirages du coût / 1M tokens pour une ligne (`base` = intrants du mois, scalaires)."""
+    x = dict(base)
+    for name, spec in specs.items():
+        v = _draw(rng, spec, n)
+        if spec.get("relative"):
+            v = v * base[name]
+        if "min" in spec or "max" in spec:
+            v = np.clip(v, spec.get("min", -np.inf), spec.get("max", np.inf))
+        x[name] = v
+    # Mix: si un seul côté est incertain, l'autre reste son complément à 100 %
+    if "mix_mini_pct" in specs and "mix_flagship_pct" not in specs:
+        x["mix_flagship_pct"] = 100.0 - x["mix_mini_pct"]
+    elif "mix_flagship_pct" in specs and "mix_mini_pct" not in specs:
+        x["mix_mini_pct"] = 100.0 - x["mix_flagship_pct"]
+    return np.broadcast_to(cost_per_million(x), (n,))
+
+def _rng(seed, row, chunk):
+    # Graine dérivée de (seed, ligne, chunk): reproductible quel que soit le worker / l'ordre
+    return np.random.default_rng([seed, row, chunk])
+
+def _chunk_hist(task):
+    """
+    Histogramme d'un chunk: (row, counts, hors bornes, invalides, log min, log max). Hors bornes = tirages
+    valides sous log_lo ou au-dessus de log_hi; invalides = coût <= 0 ou non fini.
+    """
+    row, chunk, n, base, specs, seed, log_lo, log_hi = task
+    c = sample_cost(base, specs, _rng(seed, row, chunk), n)
+    valid = np.isfinite(c) & (c > 0)
+    logc = np.log(c[valid])
+    pos = (logc - log_lo) * (N_BINS / (log_hi - log_lo))
+    inside = (pos >= 0) & (pos <= N_BINS)  # log_hi inclus (dernier bin)
+    idx = np.minimum(pos[inside], N_BINS - 1).astype(np.int64)
+    lmin, lmax = (float(logc.min()), float(logc.max())) if logc.size else (np.inf, -np.inf)
+    return (row, np.bincount(idx, minlength=N_BINS), int(logc.size - inside.sum()), int(n - logc.size),
+            lmin, lmax)
+
+def _row_hist(results):
+    """Somme des histogrammes de chunks d'une ligne: (counts, hors bornes, invalides, log min, log max)."""
+    acc, out, bad, lmin, lmax = np.zeros(N_BINS, dtype=np.int64), 0, 0, np.inf, -np.inf
+    for _, counts, o, b, lo, hi in results:
+        acc += counts
+        out, bad, lmin, lmax = out + o, bad + b, min(lmin, lo), max(lmax, hi)
+    return acc, out, bad, lmin, lmax
+
+def hist_percentiles(counts, log_lo, log_hi, qs):
+    """Percentiles (0–100) interpolés linéairement (en log) dans l'histogramme."""
+    cum = np.cumsum(counts)
+    total = cum[-1]
+    if total == 0:
+        return [float("nan")] * len(qs)
+    width = (log_hi - log_lo) / N_BINS
+    out = []
+    for q in qs:
+        target = total * q / 100.0
+        i = int(np.searchsorted(cum, target, side="left"))
+        i = min(i, N_BINS - 1)
+        before = cum[i - 1] if i > 0 else 0
+        frac = (target - before) / counts[i] if counts[i] else 0.0
+        out.append(float(np.exp(log_lo + (i + frac) * width)))
+    return out
+
+def run_monte_carlo(df, n_draws, config_path, out_path, workers=None, chunk_size=250_000,
+                    seed=None, percentiles=(5, 50, 95)):
+    """
+    Bandes de percentiles par ligne de `df` (sortie de build_inputs) pour le coût / 1M tokens
+    et les break_even_* (paliers/marge fixes → mêmes quantiles, mis à l'échelle).
+    """
+    if chunk_size < 1 or (workers is not None and workers < 1):
+        raise ValueError(f"chunk_size et workers doivent être >= 1 (reçu {chunk_size}, {workers})")
+    cfg = load_config(config_path)
+    specs = cfg.get("inputs", {})
+    seed = int(cfg.get("seed", 0) if seed is None else seed)
+    workers = workers or os.cpu_count() or 1
+
+    bases = [{c: float(v) for c, v in zip(MODEL_INPUTS, vals)}
+             for vals in df[MODEL_INPUTS].to_numpy(dtype=float)]
+
+    # Bornes des bins par ligne depuis un petit tirage pilote (marge ×2 de chaque côté)
+    bounds = []
+    for row, base in enumerate(bases):
+        pilot = sample_cost(base, specs, _rng(seed, row, PILOT_CHUNK), PILOT_DRAWS)
+        pilot = pilot[np.isfinite(pilot) & (pilot > 0)]
+        lo, hi = (pilot.min(), pilot.max()) if pilot.size else (1e-6, 1e6)
+        bounds.append((float(np.log(lo) - np.log(2.0)), float(np.log(hi) + np.log(2.0))))
+
+    n_chunks = -(-n_draws // chunk_size)
+    def row_tasks(row, lo_hi):
+        for k in range(n_chunks):
+            n = min(chunk_size, n_draws - k * chunk_size)
+            yield (row, k, n, bases[row], specs, seed, *lo_hi)
+
+    def tasks():
+        for row in range(len(bases)):
+            yield from row_tasks(row, bounds[row])
+
+    pct_cols = [f"p{q:g}" for q in percentiles]
+    metrics = ["cost_per_million_tokens_usd"] + [f"break_even_{t}_usd" for t in TIERS]
+    header = ["date", "company", "n_draws"] + [f"{m}_{p}" for m in metrics for p in pct_cols] + ["invalid_pct"]
+    rebinned, invalid_rows = 0, 0
+
+    out_dir = os.path.dirname(out_path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    t0 = time.perf_counter()
+    with open(out_path, "w", newline="", encoding="utf-8") as f, \
+         ProcessPoolExecutor(max_workers=workers) as ex:
+        w = csv.writer(f)
+        w.writerow(header)
+        results = []
+        # Fenêtre bornée de tâches en vol, consommées dans l'ordre → une ligne est complète
+        # après n_chunks résultats, et les histogrammes en attente restent en nombre fixe
+        it = tasks()
+        pending = deque(ex.submit(_chunk_hist, t) for t in itertools.islice(it, 4 * workers))
+        while pending:
+            results.append(pending.popleft().result())
+            nxt = next(it, None)
+            if nxt is not None:
+                pending.append(ex.submit(_chunk_hist, nxt))
+            if len(results) < n_chunks:
+                continue
+            row = results[0][0]
+            acc, out, bad, lmin, lmax = _row_hist(results)
+            results = []
+            if out:
+                # Tirages hors des bornes du pilote: re-binning exact sur l'étendue observée
+                pad = max(lmax - lmin, 1e-9) * 1e-6
+                bounds[row] = (lmin - pad, lmax + pad)
+                acc, out, bad, _, _ = _row_hist(ex.map(_chunk_hist, row_tasks(row, bounds[row])))
+                rebinned += 1
+            invalid_rows += bad > 0
+            cost_q = hist_percentiles(acc, *bounds[row], percentiles)
+            values = list(cost_q)
+            for tokens in TIERS.values():
+                values += [break_even_price(c, tokens, TARGET_MARGIN) for c in cost_q]
+            w.writerow([df["date"].iat[row], df["company"].iat[row], n_draws] + values + [100.0 * bad / n_draws])
+            f.flush()
+
+    dt = time.perf_counter() - t0
+    total = n_draws * len(bases)
+    print(f"Monte Carlo: {total:,} tirages ({len(bases)} lignes × {n_draws:,}) en {dt:.2f}s "
+          f"sur {workers} workers — wrote {out_path}")
+    if rebinned:
+        print(f"Monte Carlo: {rebinned} ligne(s) re-binnées (tirages hors des bornes du pilote)")
+    if invalid_rows:
+        print(f"Attention: {invalid_rows} ligne(s) avec des coûts tirés <= 0 ou non finis, exclus des percentiles "
+              "(colonne invalid_pct): vérifier les distributions (min / max)", file=sys.stderr)
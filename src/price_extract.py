@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Extraction de prix en un seul passage sur le document.
+
+Le HTML est découpé en segments de texte (un par bloc: td, li, p, div...) par un parseur
+streaming, puis un automate parcourt les segments une fois et émet des enregistrements
+structurés: (modèle, $/1M input, $/1M output) pour les API LLM, (GPU, $/h) pour le cloud GPU.
+Backends: "html.parser" (stdlib) ou "lxml" (plus rapide, optionnel); "auto" choisit lxml s'il est installé.
+"""
+import argparse, glob, os, re, time
+from html.parser import HTMLParser
+
+BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt", "figcaption",
+    "footer", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "nav", "ol",
+    "p", "section", "table", "tbody", "td", "th", "thead", "tr", "ul",
+}
+# Pas "head": HTML5 permet d'omettre </head>, le compteur ne redescendrait jamais (tout le body ignoré)
+SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "title"}
+
+LLM_MODEL_RE = (
+    r"gpt-[0-9][\w.]*(?:[- ](?:mini|nano|turbo|pro))?"
+    r"|\bo[0-9](?:-(?:mini|pro))?\b"
+    r"|claude[- ](?:[0-9.]+[- ])?(?:opus|sonnet|haiku)(?:[- ][0-9](?:\.[0-9])?)?"
+    r"|\b(?:opus|sonnet|haiku)[- ][0-9](?:\.[0-9])?\b"
+)
+# "$2.50 / 1M tokens", "$3 / MTok", "$0.15 per 1M input tokens" (étiquette collée au prix seulement si
+# suivie de "tokens": dans "$3 / MTok Output $15", "Output" est l'étiquette du prix suivant)
+PER_MILLION_RE = (
+    r"\$\s*(?P<price>[0-9]+(?:\.[0-9]+)?)\s*(?:/|per)\s*(?:1\s*M\b|MTok\b|million\b)"
+    r"(?:\s*(?P<plabel>input|output)(?=\s*tokens?\b))?"
+)
+LABEL_RE = r"\b(?P<label>cached input|prompt caching|cache (?:writes?|reads?|hits?)|batch|input|output)\b"
+# "$2.49 / hr", "$2.99 / GPU / hr", "$0.50 per hour"
+PER_HOUR_RE = r"\$\s*(?P<price>[0-9]+(?:\.[0-9]+)?)\s*(?:/|per)\s*(?:GPU\s*(?:/|per)\s*)?(?:hour|hr)\b"
+
+LLM_TOKENS = re.compile(f"(?P<model>{LLM_MODEL_RE})|{PER_MILLION_RE}|{LABEL_RE}", re.I)
+
+def gpu_tokens(targets):
+    names = "|".join(re.escape(t) for t in sorted(targets, key=len, reverse=True))
+    return re.compile(rf"(?<![A-Za-z0-9])(?P<gpu>{names})(?![0-9])|{PER_HOUR_RE}", re.I)
+
+class _SegmentParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.segments, self._buf, self._skip = [], [], 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip += 1
+        elif tag in BLOCK_TAGS:
+            self.flush()
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self.flush()
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+        elif tag in BLOCK_TAGS:
+            self.flush()
+
+    def handle_data(self, data):
+        if not self._skip:
+            self._buf.append(data)
+
+    def flush(self):
+        text = " ".join("".join(self._buf).split())
+        self._buf = []
+        if text:
+            self.segments.append(text)
+
+def _chunks(html, size=1 << 16):
+    if isinstance(html, (bytes, bytearray)):
+        html = html.decode("utf-8", "replace")
+    if isinstance(html, str):
+        for i in range(0, len(html), size):
+            yield html[i:i + size]
+    else:
+        yield from html
+
+def _segments_stdlib(html):
+    p = _SegmentParser()
+    for chunk in _chunks(html):
+        p.feed(chunk)
+        yield from p.segments
+        p.segments = []
+    p.close()
+    p.flush()
+    yield from p.segments
+
+def _segments_lxml(html):
+    from lxml import etree, html as lhtml
+    text = html if isinstance(html, (str, bytes)) else "".join(html)
+    root = lhtml.fromstring(text)
+    buf, skip = [], 0
+
+    def flush():
+        t = " ".join("".join(buf).split())
+        buf.clear()
+        return t
+
+    for event, el in etree.iterwalk(root, events=("start", "end")):
+        tag = el.tag if isinstance(el.tag, str) else None  # commentaires / PI
+        if event == "start":
+            if tag in SKIP_TAGS:
+                skip += 1
+                continue
+            if tag in BLOCK_TAGS and (t := flush()):
+                yield t
+            if not skip and tag and el.text:
+                buf.append(el.text)
+        else:
+            if tag in SKIP_TAGS:
+                skip -= 1
+            elif tag in BLOCK_TAGS and (t := flush()):
+                yield t
+            if not skip and el.tail:
+                buf.append(el.tail)
+    if t := flush():
+        yield t
+
+def available_backends():
+    out = ["html.parser"]
+    try:
+        import lxml.html  # noqa: F401
+        out.append("lxml")
+    except ImportError:
+        pass
+    return out
+
+def iter_segments(html, backend="auto"):
+    """Segments de texte visibles dans l'ordre du document (str, bytes ou itérable de chunks)."""
+    if backend == "auto":
+        backend = available_backends()[-1]
+    if backend == "lxml":
+        return _segments_lxml(html)
+    if backend == "html.parser":
+        return _segments_stdlib(html)
+    raise ValueError(f"Backend inconnu: {backend} (disponibles: {available_backends()})")
+
+def _norm_model(name):
+    return re.sub(r"[\s_]+", "-", name.strip().lower())
+
+def extract_llm_prices(html, backend="auto"):
+    """
+    (modèle, $/1M input, $/1M output): un prix est rattaché au dernier modèle vu et classé par
+    l'étiquette qui le précède (input/output), sinon par l'en-tête de colonnes du tableau
+    (étiquettes vues avant le modèle), sinon par ordre (1er = input). Les prix de cache et
+    batch sont ignorés. Un modèle n'est émis qu'une fois.
+    """
+    cur, labels, header, seen = None, [], [], set()
+
+    def emit(rec):
+        if rec and (rec["input"] is not None or rec["output"] is not None) and rec["model"] not in seen:
+            seen.add(rec["model"])
+            return {"model": rec["model"], "price_per_million_input": rec["input"],
+                    "price_per_million_output": rec["output"], "raw": " | ".join(rec["raw"])[:300]}
+        return None
+
+    for seg in iter_segments(html, backend):
+        for m in LLM_TOKENS.finditer(seg):
+            if m.group("model"):
+                if (done := emit(cur)):
+                    yield done
+                if len(labels) >= 2:
+                    header = labels
+                labels = []
+                cur = {"model": _norm_model(m.group("model")), "input": None, "output": None, "raw": [seg], "k": 0}
+            elif m.group("label"):
+                labels.append(m.group("label").lower())
+            elif cur is not None:
+                k = cur["k"]
+                cur["k"] += 1
+                lbl = m.group("plabel") or (labels[-1] if labels else header[k] if k < len(header) else "")
+                labels = []
+                lbl = lbl.lower()
+                if lbl not in ("", "input", "output"):
+                    continue
+                price = float(m.group("price"))
+                if lbl and cur[lbl] is None:
+                    cur[lbl] = price
+                elif not lbl and cur["input"] is None:
+                    cur["input"] = price
+                elif not lbl and cur["output"] is None:
+                    cur["output"] = price
+                if seg not in cur["raw"]:
+                    cur["raw"].append(seg)
+                if cur["input"] is not None and cur["output"] is not None:
+                    if (done := emit(cur)):
+                        yield done
+                    cur = None
+            else:
+                labels = []
+    if (done := emit(cur)):
+        yield done
+
+def extract_gpu_prices(html, targets=("H100", "L4"), backend="auto", max_gap=3):
+    """(gpu, $/h): chaque prix horaire est rattaché à la dernière mention de GPU vue au plus `max_gap` segments avant."""
+    tokens = gpu_tokens(targets)
+    canon = {t.upper(): t for t in targets}
+    gpu, last_seen = None, -1
+    for i, seg in enumerate(iter_segments(html, backend)):
+        for m in tokens.finditer(seg):
+            if m.group("gpu"):
+                gpu, last_seen = canon[m.group("gpu").upper()], i
+            elif gpu is not None and i - last_seen <= max_gap:
+                yield {"gpu_model": gpu, "hourly_price_usd": float(m.group("price")), "raw": seg[:300]}
+                gpu = None
+
+def legacy_find_all(html):
+    """Ancienne méthode (find_all + get_text par bloc), gardée pour le benchmark."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "html.parser")
+    return [t for card in soup.find_all(["section", "div"])
+            if (t := " ".join(card.get_text(" ", strip=True).split())) and "1M" in t]
+
+def synthetic_page(n_models=2000, depth=30):
+    """Page de prix profondément imbriquée (pire cas du find_all/get_text)."""
+    rows = []
+    for i in range(n_models):
+        rows.append(f"<tr><td><span>gpt-{i % 9 + 1}.{i}-mini</span></td>"
+                    f"<td>Input</td><td>${i % 50 / 10 + 0.1:.2f} / 1M tokens</td>"
+                    f"<td>Output</td><td>${i % 50 / 5 + 0.4:.2f} / 1M tokens</td></tr>")
+        if i % 50 == 0:
+            rows.append(f"<tr><td>NVIDIA H100 SXM</td><td>${2 + i % 7 / 10:.2f} / hr</td></tr>")
+    body = "<table>" + "".join(rows) + "</table><script>var x = '$1 / 1M';</script>"
+    return "<html><body>" + "<div class='wrap'>" * depth + body + "</div>" * depth + "</body></html>"
+
+def bench(paths, kind="llm", repeat=3, legacy=False, synthetic=2000):
+    docs = [(p, open(p, encoding="utf-8", errors="replace").read()) for p in paths]
+    if not docs:
+        docs = [(f"synthetic({synthetic} modèles)", synthetic_page(synthetic))]
+    extract = extract_llm_prices if kind == "llm" else extract_gpu_prices
+    for name, html in docs:
+        mb = len(html.encode()) / 1e6
+        print(f"{name}: {mb:.2f} Mo")
+        runs = [(b, lambda h, b=b: list(extract(h, backend=b))) for b in available_backends()]
+        if legacy:
+            runs.append(("legacy find_all", legacy_find_all))
+        for label, fn in runs:
+            best = float("inf")
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                out = fn(html)
+                best = min(best, time.perf_counter() - t0)
+            print(f"  {label:<16} {best * 1000:9.1f} ms  {mb / best:7.1f} Mo/s  {len(out)} enregistrements")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Extracteur de prix en un passage (LLM $/1M, GPU $/h).")
+    ap.add_argument("paths", nargs="*", help="Fichiers HTML (globs acceptés)")
+    ap.add_argument("--kind", choices=["llm", "gpu"], default="llm")
+    ap.add_argument("--backend", default="auto", help="auto | html.parser | lxml")
+    ap.add_argument("--targets", default="H100,L4", help="GPU recherchés (--kind gpu)")
+    ap.add_argument("--bench", action="store_true", help="Chronométrer les backends (page synthétique si aucun fichier)")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--legacy", action="store_true", help="Inclure l'ancienne méthode find_all/get_text au benchmark")
+    ap.add_argument("--synthetic", type=int, default=2000, help="Nb de modèles de la page synthétique")
+    args = ap.parse_args(argv)
+
+    paths = sorted(p for pat in args.paths for p in glob.glob(pat))
+    if args.bench:
+        bench(paths, args.kind, args.repeat, args.legacy, args.synthetic)
+        return
+    for p in paths:
+        with open(p, encoding="utf-8", errors="replace") as f:
+            html = f.read()
+        recs = (extract_llm_prices(html, args.backend) if args.kind == "llm"
+                else extract_gpu_prices(html, args.targets.split(","), args.backend))
+        for r in recs:
+            print(os.path.basename(p), {k: v for k, v in r.items() if k != "raw"})
+
+if __name__ == "__main__":
+    main()
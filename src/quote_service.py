@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+import argparse, csv, json, math, os, threading, time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+import numpy as np
+
+from build_monthly_series import TARGET_MARGIN, break_even_price
+
+def check_inputs(tokens, margin):
+    """(tokens, margin) en float, ou ValueError: tokens > 0 et fini, 0 <= margin < 1 (break-even = coût / (1 - marge))."""
+    try:
+        tokens, margin = float(tokens), float(margin)
+    except (TypeError, ValueError):
+        raise ValueError(f"tokens et margin doivent être numériques (reçu tokens={tokens!r}, margin={margin!r})") from None
+    if not (tokens > 0 and math.isfinite(tokens)):
+        raise ValueError(f"tokens doit être > 0 (reçu {tokens:g})")
+    if not 0 <= margin < 1:
+        raise ValueError(f"margin doit être dans [0, 1[ (reçu {margin:g})")
+    return tokens, margin
+
+class SeriesUnavailable(RuntimeError):
+    """Série vide (aucune date): rien à coter tant que le build n'a pas produit de lignes (HTTP 503)."""
+
+class QuoteIndex:
+    """
+    Série mensuelle chargée une fois en tableau (dates × companies) de coût / 1M tokens.
+    Une cotation = deux lookups dict + une multiplication: O(1), sans pandas.
+    """
+    def __init__(self, path, cache_size=65536):
+        self.path = path
+        st = os.stat(path)
+        self.signature = (st.st_mtime_ns, st.st_size)
+        rows = self._read(path)
+        self.dates = sorted({r["date"][:10] for r in rows})
+        self.companies = sorted({r["company"] for r in rows})
+        self.date_idx = {d: i for i, d in enumerate(self.dates)}
+        self.company_idx = {c: j for j, c in enumerate(self.companies)}
+        self.cost = np.full((len(self.dates), len(self.companies)), np.nan)
+        for r in rows:
+            v = r["cost_per_million_tokens_usd"]
+            if v not in ("", None):
+                self.cost[self.date_idx[r["date"][:10]], self.company_idx[r["company"]]] = float(v)
+        # Cache propre à cet index: un rechargement repart d'un cache vide
+        self.quote = lru_cache(maxsize=cache_size)(self._quote)
+
+    @staticmethod
+    def _read(path):
+        if path.endswith(".parquet") or os.path.isdir(path):
+            from storage import read_frame
+            df = read_frame(path)[["date", "company", "cost_per_million_tokens_usd"]]
+            return df.astype(object).where(df.notna(), None).to_dict("records")
+        with open(path, newline="", encoding="utf-8") as f:
+            return list(csv.DictReader(f))
+
+    @staticmethod
+    def month_key(date):
+        """'YYYY-MM' / 'YYYY-MM-DD' / 'YYYYMM' → 'YYYY-MM-01'."""
+        d = str(date).strip()
+        if len(d) == 6 and d.isdigit():
+            d = f"{d[:4]}-{d[4:]}"
+        return d[:7] + "-01"
+
+    def _cell(self, company, date):
+        if not self.dates:
+            raise SeriesUnavailable(f"série vide: {self.path}")
+        try:
+            i = self.date_idx[self.month_key(date)]
+        except KeyError:
+            raise KeyError(f"mois hors série: {date} (disponibles: {self.dates[0]} → {self.dates[-1]})") from None
+        try:
+            j = self.company_idx[company]
+        except KeyError:
+            raise KeyError(f"company inconnue: {company} (disponibles: {self.companies})") from None
+        return i, j
+
+    def _quote(self, company, date, tokens, margin=TARGET_MARGIN):
+        tokens, margin = check_inputs(tokens, margin)
+        i, j = self._cell(company, date)
+        cost = float(self.cost[i, j])
+        if math.isnan(cost):
+            raise KeyError(f"coût manquant dans la série: {company} {self.dates[i]}")
+        return {
+            "company": company,
+            "date": self.dates[i],
+            "tokens_per_month": tokens,
+            "target_margin": margin,
+            "cost_per_million_tokens_usd": cost,
+            "price_usd": break_even_price(cost, float(tokens), float(margin)),
+        }
+
+    def quote_many(self, queries):
+        """
+        Batch [{company, date, tokens[, margin]}] → liste de cotations (calcul vectorisé NumPy).
+        Une entrée invalide (cellule inconnue ou vide, tokens / marge hors bornes) donne {"error": ...} à sa place.
+        """
+        idx, inputs, errors = [], [], {}
+        for k, q in enumerate(queries):
+            cell, inp = (0, 0), (1.0, 0.0)
+            try:
+                inp = check_inputs(q["tokens"], q.get("margin", TARGET_MARGIN))
+                cell = self._cell(q["company"], q["date"])
+            except (KeyError, ValueError) as e:
+                errors[k] = str(e.args[0])
+            idx.append(cell)
+            inputs.append(inp)
+        if not queries:
+            return []
+        if not self.dates:
+            raise SeriesUnavailable(f"série vide: {self.path}")
+        ij = np.array(idx)
+        tokens, margins = np.array(inputs).T
+        cost = self.cost[ij[:, 0], ij[:, 1]]
+        for k in np.flatnonzero(np.isnan(cost)):
+            errors.setdefault(int(k), f"coût manquant dans la série: {queries[k]['company']} {self.dates[ij[k, 0]]}")
+        price = break_even_price(cost, tokens, margins)
+        out = []
+        for k, q in enumerate(queries):
+            if k in errors:
+                out.append({"error": errors[k], **q})
+                continue
+            out.append({
+                "company": q["company"], "date": self.dates[ij[k, 0]],
+                "tokens_per_month": float(tokens[k]), "target_margin": float(margins[k]),
+                "cost_per_million_tokens_usd": float(cost[k]), "price_usd": float(price[k]),
+            })
+        return out
+
+class QuoteService:
+    """Index courant + rechargement à chaud quand le fichier de la série change (mtime/taille)."""
+    def __init__(self, path, check_interval=1.0, cache_size=65536):
+        self.path = path
+        self.check_interval = check_interval
+        self.cache_size = cache_size
+        self.index = QuoteIndex(path, cache_size)
+        self._next_check = time.monotonic() + check_interval
+        self._lock = threading.Lock()
+
+    def current(self):
+        now = time.monotonic()
+        if now >= self._next_check and self._lock.acquire(blocking=False):
+            try:
+                self._next_check = now + self.check_interval
+                st = os.stat(self.path)
+                if (st.st_mtime_ns, st.st_size) != self.index.signature:
+                    # Nouvel index construit à côté puis publié d'un coup (les requêtes en vol gardent l'ancien)
+                    self.index = QuoteIndex(self.path, self.cache_size)
+            except (OSError, ValueError, KeyError):
+                pass  # fichier en cours d'écriture / illisible: on garde l'index courant
+            finally:
+                self._lock.release()
+        return self.index
+
+    def quote(self, company, date, tokens, margin=TARGET_MARGIN):
+        tokens, margin = check_inputs(tokens, margin)  # avant le cache: clé normalisée, erreurs non mémorisées
+        return self.current().quote(company, date, tokens, margin)
+
+    def quote_many(self, queries):
+        return self.current().quote_many(queries)
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, code, payload):
+            body = json.dumps(payload, allow_nan=False).encode()  # NaN / Infinity: JSON invalide
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path == "/health":
+                idx = service.current()
+                info = idx.quote.cache_info()
+                if not idx.dates:
+                    return self._send(503, {"error": f"série vide: {idx.path}", "series": idx.path})
+                return self._send(200, {"series": idx.path, "dates": [idx.dates[0], idx.dates[-1]],
+                                        "companies": idx.companies, "cache_hits": info.hits,
+                                        "cache_misses": info.misses})
+            if url.path != "/quote":
+                return self._send(404, {"error": "routes: GET /quote, POST /quote/batch, GET /health"})
+            q = {k: v[0] for k, v in parse_qs(url.query).items()}
+            try:
+                return self._send(200, service.quote(q["company"], q["date"], q["tokens"],
+                                                     q.get("margin", TARGET_MARGIN)))
+            except KeyError as e:
+                return self._send(404 if q.keys() >= {"company", "date", "tokens"} else 400,
+                                  {"error": e.args[0]})
+            except ValueError as e:
+                return self._send(400, {"error": str(e)})
+            except SeriesUnavailable as e:
+                return self._send(503, {"error": str(e)})
+
+        def do_POST(self):
+            if urlsplit(self.path).path != "/quote/batch":
+                return self._send(404, {"error": "routes: GET /quote, POST /quote/batch, GET /health"})
+            try:
+                queries = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"[]")
+                return self._send(200, service.quote_many(queries))
+            except SeriesUnavailable as e:
+                return self._send(503, {"error": str(e)})
+            except (ValueError, KeyError, TypeError) as e:
+                return self._send(400, {"error": f"batch invalide: {e}"})
+
+        def log_message(self, fmt, *args):
+            pass  # pas de log par requête (débit)
+    return Handler
+
+def serve(service, host="127.0.0.1", port=8087):
+    httpd = ThreadingHTTPServer((host, port), make_handler(service))
+    httpd.daemon_threads = True
+    print(f"Quotes sur http://{host}:{port}/quote?company=OpenAI&date=2025-03&tokens=2000000&margin=0.6")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Cotations break-even (N tokens / mois, marge M) depuis la série mensuelle.")
+    ap.add_argument("--series", default="data/llm_economics_monthly.csv", help="Sortie du build (.csv ou .parquet)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8087)
+    ap.add_argument("--cache-size", type=int, default=65536, help="Entrées du cache LRU")
+    ap.add_argument("--reload-interval", type=float, default=1.0, help="Secondes entre deux vérifications du fichier")
+    ap.add_argument("--query", help="Cotation unique 'company,date,tokens[,margin]' puis sortie")
+    ap.add_argument("--bench", type=int, default=0, metavar="N", help="Mesure la latence sur N cotations puis sortie")
+    args = ap.parse_args(argv)
+
+    service = QuoteService(args.series, args.reload_interval, args.cache_size)
+    if args.query:
+        parts = args.query.split(",")
+        try:
+            print(json.dumps(service.quote(*parts), ensure_ascii=False))
+        except (KeyError, ValueError, SeriesUnavailable) as e:
+            raise SystemExit(e.args[0])
+        return
+    if args.bench:
+        idx = service.current()
+        if not idx.dates:
+            raise SystemExit(f"série vide: {idx.path}")
+        rng = np.random.default_rng(0)
+        qs = [(idx.companies[rng.integers(len(idx.companies))], idx.dates[rng.integers(len(idx.dates))],
+               float(rng.choice([2e5, 1e6, 5e6, 2e7])), float(rng.choice([0.5, 0.6, 0.7])))
+              for _ in range(args.bench)]
+        t0 = time.perf_counter()
+        for q in qs:
+            service.quote(*q)
+        dt = time.perf_counter() - t0
+        batch = [{"company": c, "date": d, "tokens": t, "margin": m} for c, d, t, m in qs]
+        t1 = time.perf_counter()
+        service.quote_many(batch)
+        db = time.perf_counter() - t1
+        print(f"{args.bench} cotations: {dt / args.bench * 1e6:.2f} µs/cotation (LRU {idx.quote.cache_info().hits} hits) "
+              f"| batch: {db / args.bench * 1e6:.2f} µs/cotation")
+        return
+    serve(service, args.host, args.port)
+
+if __name__ == "__main__":
+    main()
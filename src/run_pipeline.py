@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+import argparse, os, sys, time, asyncio, traceback
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dotenv import load_dotenv
+
+from http_client import make_session
+from instrument import stage
+
+def time_left(deadline):
+    """Secondes restantes avant `deadline` (time.monotonic() absolu), ou None si pas de budget (--deadline 0)."""
+    return None if deadline is None else deadline - time.monotonic()
+
+def playwright_timeout_ms(ctx, cap_ms=30000):
+    """timeout_ms de Playwright: min(cap_ms, budget restant), au moins 1 s."""
+    left = time_left(ctx["deadline"])
+    return cap_ms if left is None else min(cap_ms, int(max(1.0, left) * 1000))
+
+# Chaque étape: (dépendances, fonction(ctx)). Les fetchers tournent en parallèle;
+# le build démarre dès que ses intrants (EIA) sont prêts, sans attendre Playwright.
+def stage_openai(ctx):
+    from fetch_openai_pricing import fetch_openai_pricing, write_csv
+    rows = fetch_openai_pricing(ctx["ua"], session=ctx["session"])
+    write_csv(rows, ctx["paths"]["openai"])
+    return len(rows)
+
+def stage_anthropic(ctx):
+    from fetch_anthropic_pricing import fetch_anthropic_pricing, write_csv
+    rows = fetch_anthropic_pricing(ctx["ua"], session=ctx["session"])
+    write_csv(rows, ctx["paths"]["anthropic"])
+    return len(rows)
+
+def stage_vast(ctx):
+    from fetch_vast_api import pick_endpoint, iter_offers, stream_snapshot
+    chosen, first = pick_endpoint(session=ctx["session"])
+    counts = stream_snapshot(iter_offers(chosen, first, session=ctx["session"]), chosen,
+                             out_path=ctx["paths"]["vast"], history_root=ctx["paths"]["vast_history"])
+    return sum(counts.values())
+
+def stage_lambda(ctx):
+    from fetch_lambda_gpu import URL, fetch_prices, write_csv
+    # HTML statique via la session partagée; Chromium seulement si les prix n'y sont pas
+    rows, _ = asyncio.run(fetch_prices([URL], session=ctx["session"], timeout_ms=playwright_timeout_ms(ctx)))
+    write_csv(rows, ctx["paths"]["lambda"])
+    return len(rows)
+
+def stage_eia(ctx):
+    from fetch_eia import fetch_retail_sales_records, aggregate_prices, to_rows, write_csv
+    api_key = os.environ.get("EIA_API_KEY")
+    if not api_key:
+        raise RuntimeError("EIA_API_KEY manquant (export EIA_API_KEY=...)")
+    data = fetch_retail_sales_records(api_key, ctx["start"], ctx["end"], session=ctx["session"])
+    agg = aggregate_prices(data)
+    rows = to_rows(agg[agg["level"] == "us"])
+    write_csv(rows, ctx["paths"]["eia"])
+    write_csv(to_rows(agg), ctx["paths"]["eia_regions"])
+    return len(rows)
+
+def stage_gpu_sketch(ctx):
+    from gpu_price_sketch import refresh_overrides
+    df, _ = refresh_overrides(ctx["paths"]["vast_history"], ctx["paths"]["lambda"],
+                              ctx["paths"]["gpu_sketches"], ctx["paths"]["gpu_overrides_auto"],
+                              percentile=ctx["gpu_percentile"])
+    return len(df)
+
+def stage_build(ctx):
+    import build_monthly_series
+    build_monthly_series.main([
+        "--start", ctx["start"], "--end", ctx["end"], "--out", ctx["paths"]["build"],
+        "--eia_prices", ctx["paths"]["eia"], "--gpu_overrides", ctx["paths"]["gpu_overrides"],
+        "--region_prices", ctx["paths"]["eia_regions"], "--company_regions", ctx["paths"]["company_regions"],
+    ] + (["--hourly", ctx["hourly"]] if ctx.get("hourly") else []))
+    return None
+
+STAGES = {
+    "openai":    ((), stage_openai),
+    "anthropic": ((), stage_anthropic),
+    "vast":      ((), stage_vast),
+    "lambda":    ((), stage_lambda),
+    "eia":       ((), stage_eia),
+    "gpu_sketch": (("vast", "lambda"), stage_gpu_sketch),
+    "build":     (("eia",), stage_build),
+}
+
+def default_paths(data_dir):
+    return {
+        "openai": os.path.join(data_dir, "openai_pricing.csv"),
+        "anthropic": os.path.join(data_dir, "anthropic_pricing.csv"),
+        "vast": os.path.join(data_dir, "vast_gpu_market.csv"),
+        "vast_history": os.path.join(data_dir, "vast_history"),
+        "lambda": os.path.join(data_dir, "lambda_gpu_pricing.csv"),
+        "eia": os.path.join(data_dir, "eia_electricity_us_commercial.csv"),
+        "eia_regions": os.path.join(data_dir, "eia_electricity_us_commercial_by_region.csv"),
+        "company_regions": os.path.join(data_dir, "company_regions.csv"),
+        "gpu_overrides": os.path.join(data_dir, "gpu_hour_overrides.csv"),
+        "gpu_overrides_auto": os.path.join(data_dir, "gpu_hour_overrides_auto.csv"),
+        "gpu_sketches": os.path.join(data_dir, "gpu_price_sketches.json"),
+        "build": os.path.join(data_dir, "llm_economics_monthly.csv"),
+    }
+
+def _timed(fn, ctx, name):
+    # Étape mesurée (instrument): les requêtes de la session partagée et les sous-étapes
+    # (build.*, lambda.*) lancées depuis ce thread lui sont rattachées
+    t0 = time.perf_counter()
+    with stage(f"pipeline.{name}") as st:
+        result = fn(ctx)
+        if isinstance(result, int):
+            st.rows_out = result
+    return result, time.perf_counter() - t0
+
+def run_dag(selected, ctx, strict=False, stages=STAGES):
+    """
+    Exécute les étapes sélectionnées dès que leurs dépendances sont terminées.
+    Retour: {étape: (statut, durée_s, détail)}.
+    """
+    status = {}
+    pending = {n: [d for d in stages[n][0] if d in selected] for n in selected}
+    running = {}
+    ex = ThreadPoolExecutor(max_workers=len(selected) or 1)
+    try:
+        while pending or running:
+            for name in [n for n, deps in pending.items() if all(d in status for d in deps)]:
+                deps = pending.pop(name)
+                failed = [d for d in deps if status[d][0] != "ok"]
+                if failed and strict:
+                    status[name] = ("skipped", 0.0, f"dépendance en échec: {failed}")
+                    continue
+                if failed:
+                    print(f"[{name}] dépendance en échec {failed} → on continue avec les fichiers existants")
+                running[ex.submit(_timed, stages[name][1], ctx, name)] = name
+            if not running:
+                continue
+            remaining = time_left(ctx["deadline"])
+            done, _ = wait(running, timeout=None if remaining is None else max(0.0, remaining),
+                           return_when=FIRST_COMPLETED)
+            if not done:
+                for fut, name in running.items():
+                    status[name] = ("timeout", None, "deadline globale dépassée")
+                for name in pending:
+                    status[name] = ("skipped", 0.0, "deadline globale dépassée")
+                return status
+            for fut in done:
+                name = running.pop(fut)
+                try:
+                    result, dt = fut.result()
+                    status[name] = ("ok", dt, "" if result is None else f"{result} rows")
+                    print(f"[{name}] OK en {dt:.2f}s {status[name][2]}")
+                except Exception as e:
+                    first_line = (str(e).splitlines() or [""])[0]
+                    status[name] = ("error", None, f"{type(e).__name__}: {first_line}")
+                    print(f"[{name}] ÉCHEC: {status[name][2]}", file=sys.stderr)
+                    if ctx.get("verbose"):
+                        traceback.print_exc()
+    finally:
+        # Sans attendre: les threads encore en vol finissent sur leur propre timeout
+        # (requêtes bornées par la deadline de la session, Playwright par timeout_ms)
+        ex.shutdown(wait=False, cancel_futures=True)
+    return status
+
+def add_session_args(ap):
+    """Options de la session HTTP partagée (deadline, retries, cache), communes à pipeline et llmecon run."""
+    ap.add_argument("--deadline", type=float, default=300.0, help="Budget total en secondes (0 = sans limite)")
+    ap.add_argument("--per-host", type=int, default=4, help="Requêtes simultanées max par hôte")
+    ap.add_argument("--retries", type=int, default=3)
+    ap.add_argument("--backoff", type=float, default=0.5, help="Facteur de backoff exponentiel (s)")
+    ap.add_argument("--cache-dir", default=None, help="Cache HTTP (défaut: $HTTP_CACHE_DIR ou data/.http_cache)")
+    ap.add_argument("--cache-ttl", type=float, default=None,
+                    help="Secondes pendant lesquelles une réponse est servie sans revalidation (défaut: 0)")
+    ap.add_argument("--cache-mode", choices=["on", "off", "replay"], default=None,
+                    help="replay = aucune requête réseau, réponses enregistrées uniquement")
+
+def session_from_args(args):
+    return make_session(per_host=args.per_host, retries=args.retries,
+                        backoff=args.backoff, deadline_s=args.deadline,
+                        cache_dir=args.cache_dir, cache_ttl=args.cache_ttl, cache_mode=args.cache_mode)
+
+def report(selected, status, wall):
+    """Tableau récapitulatif; True si toutes les étapes sont ok."""
+    print(f"\nPipeline terminé en {wall:.2f}s")
+    for name in selected:
+        st, dt, detail = status.get(name, ("?", None, ""))
+        dur = f"{dt:.2f}s" if dt is not None else "-"
+        print(f"  {name:<10} {st:<8} {dur:>8}  {detail}")
+    return all(status.get(n, ("?",))[0] == "ok" for n in selected)
+
+def main(argv=None):
+    load_dotenv()
+    ap = argparse.ArgumentParser(description="Orchestrateur: fetchers en parallèle (DAG) puis build.")
+    ap.add_argument("--start", required=True, help="YYYY-MM (ex: 2023-08)")
+    ap.add_argument("--end",   required=True, help="YYYY-MM (ex: 2026-09)")
+    ap.add_argument("--data-dir", default="data")
+    ap.add_argument("--only", default="", help="Étapes à exécuter, séparées par des virgules (défaut: toutes)")
+    ap.add_argument("--skip", default="", help="Étapes à ignorer, séparées par des virgules")
+    add_session_args(ap)
+    ap.add_argument("--auto-overrides", action="store_true",
+                    help="Le build attend gpu_sketch et utilise gpu_hour_overrides_auto.csv")
+    ap.add_argument("--gpu-percentile", type=float, default=50.0, help="Percentile $/GPU-h émis par gpu_sketch")
+    ap.add_argument("--hourly", metavar="CONFIG", help="Build avec intégration horaire (JSON de hourly_energy.py)")
+    ap.add_argument("--strict", action="store_true", help="Ne pas lancer une étape si une dépendance a échoué")
+    ap.add_argument("--verbose", action="store_true")
+    args = ap.parse_args(argv)
+
+    selected = [s.strip() for s in args.only.split(",") if s.strip()] or list(STAGES)
+    selected = [s for s in selected if s not in {x.strip() for x in args.skip.split(",")}]
+    unknown = set(selected) - set(STAGES)
+    if unknown:
+        raise SystemExit(f"Étapes inconnues: {sorted(unknown)} (disponibles: {list(STAGES)})")
+
+    stages = dict(STAGES)
+    paths = default_paths(args.data_dir)
+    if args.auto_overrides:
+        stages["build"] = (("eia", "gpu_sketch"), stage_build)
+        paths["gpu_overrides"] = paths["gpu_overrides_auto"]
+
+    session = session_from_args(args)
+    ctx = {
+        "start": args.start, "end": args.end,
+        "ua": os.getenv("HTTP_USER_AGENT", "llm-econ-research-bot/0.1"),
+        "session": session, "deadline": session.deadline,
+        "paths": paths, "verbose": args.verbose, "gpu_percentile": args.gpu_percentile,
+        "hourly": args.hourly,
+    }
+
+    t0 = time.perf_counter()
+    status = run_dag(selected, ctx, strict=args.strict, stages=stages)
+    if not report(selected, status, time.perf_counter() - t0):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+import argparse, os, json, time, zipfile
+import numpy as np
+
+from build_monthly_series import (
+    DEFAULTS, TARGET_MARGIN, TIERS, build_inputs, cost_per_million, break_even_price,
+)
+
+# Intrants balayables: toutes les colonnes du modèle + paliers / marge du break-even
+MODEL_INPUTS = list(DEFAULTS.keys())
+BREAK_EVEN_AXES = ["tier_tokens", "target_margin"]
+
+# Taille max (cellules float64) d'un bloc de lignes évalué d'un coup: temporaires NumPy bornés, et avec
+# write_npz le cube n'est jamais entier en mémoire (blocs écrits au fil de l'eau)
+BLOCK_CELLS = 4_000_000
+AXIS_FORMAT = "a:b:n (linspace, n >= 1) ou v1,v2,..."
+
+# Domaine de chaque axe (valeurs finies en plus), comme quote_service.check_inputs: une marge de 1 donne
+# un break-even infini, un débit ou un PUE nul un coût infini / nul. Autres intrants: >= 0.
+AXIS_DOMAINS = {
+    "target_margin": (lambda v: (v >= 0) & (v < 1), "dans [0, 1["),
+    "tier_tokens": (lambda v: v > 0, "> 0"),
+    "throughput_tok_s_mini": (lambda v: v > 0, "> 0"),
+    "throughput_tok_s_flagship": (lambda v: v > 0, "> 0"),
+    "pue": (lambda v: v > 0, "> 0"),
+    "mix_mini_pct": (lambda v: (v >= 0) & (v <= 100), "dans [0, 100]"),
+    "mix_flagship_pct": (lambda v: (v >= 0) & (v <= 100), "dans [0, 100]"),
+}
+
+def axis_values(spec):
+    """
+    Valeurs d'un axe de scénario:
+    - liste [v1, v2, ...]
+    - {"start": a, "stop": b, "num": n}   (linspace, bornes incluses)
+    - {"start": a, "stop": b, "step": s}  (arange, borne haute incluse)
+    - "a:b:n" ou "v1,v2,v3" (forme CLI)
+    """
+    try:
+        if isinstance(spec, str):
+            if ":" in spec:
+                a, b, n = spec.split(":")
+                spec = {"start": float(a), "stop": float(b), "num": int(n)}
+            else:
+                spec = [float(v) for v in spec.split(",") if v.strip()]
+        if isinstance(spec, dict):
+            if "num" in spec:
+                if int(spec["num"]) < 1:
+                    raise ValueError("num < 1")
+                return np.linspace(float(spec["start"]), float(spec["stop"]), int(spec["num"]))
+            step = float(spec["step"])
+            if not step > 0:
+                raise ValueError("step <= 0")
+            return np.arange(float(spec["start"]), float(spec["stop"]) + step / 2, step)
+        return np.asarray(spec, dtype=float).ravel()
+    except (ValueError, TypeError, KeyError) as e:
+        raise SystemExit(f"Axe invalide {spec!r} ({e}): attendu {AXIS_FORMAT}, liste, "
+                         "ou {start, stop, num | step}") from None
+
+def load_axes(config_path=None, cli_axes=()):
+    """Axes depuis un JSON {"axes": {...}} puis surcharges CLI 'nom=spec' (ordre conservé)."""
+    axes = {}
+    if config_path:
+        with open(config_path, encoding="utf-8") as f:
+            cfg = json.load(f)
+        for name, spec in cfg.get("axes", cfg).items():
+            axes[name] = axis_values(spec)
+    for item in cli_axes:
+        name, _, spec = item.partition("=")
+        axes[name.strip()] = axis_values(spec)
+    unknown = set(axes) - set(MODEL_INPUTS) - set(BREAK_EVEN_AXES)
+    if unknown:
+        raise SystemExit(f"Axes inconnus: {sorted(unknown)} (attendus: {MODEL_INPUTS + BREAK_EVEN_AXES})")
+    for name, vals in axes.items():
+        if vals.size == 0:
+            raise SystemExit(f"Axe vide: {name}")
+        ok, domain = AXIS_DOMAINS.get(name, (lambda v: v >= 0, ">= 0"))
+        bad = vals[~(np.isfinite(vals) & ok(vals))]
+        if bad.size:
+            raise SystemExit(f"Axe {name}: valeurs hors domaine {bad.tolist()} (attendu: finies, {domain})")
+    return axes
+
+def sweep_blocks(base, axes):
+    """
+    Évalue le cube (ligne date×company) × axes de scénario en NumPy broadcasté, par blocs de lignes.
+    `base`: DataFrame issu de build_inputs. Retour: (shapes, tiers, margins, blocs) où blocs itère
+    (lo, hi, cost, break_even) des lignes [lo, hi):
+    - cost:       float32 (hi-lo, n_axe1, ..., n_axeK)            — axes modèle seulement
+    - break_even: float32 (hi-lo, n_axe1, ..., n_axeK, n_tiers, n_marges)
+    """
+    model_axes = [a for a in axes if a in MODEL_INPUTS]
+    tiers = axes.get("tier_tokens", np.array(list(TIERS.values()), dtype=float))
+    margins = axes.get("target_margin", np.array([TARGET_MARGIN]))
+    ndim = 1 + len(model_axes)
+    scen_shape = tuple(len(axes[a]) for a in model_axes)
+
+    def on_axis(vals, pos):
+        shape = [1] * ndim
+        shape[pos] = -1
+        return vals.reshape(shape)
+
+    base_cols = {c: base[c].to_numpy(dtype=float) for c in MODEL_INPUTS}
+    swept = {a: on_axis(axes[a], 1 + i) for i, a in enumerate(model_axes)}
+    # Mix: si un seul côté est balayé, l'autre est son complément à 100 %
+    if "mix_mini_pct" in swept and "mix_flagship_pct" not in swept:
+        swept["mix_flagship_pct"] = 100.0 - swept["mix_mini_pct"]
+    elif "mix_flagship_pct" in swept and "mix_mini_pct" not in swept:
+        swept["mix_mini_pct"] = 100.0 - swept["mix_flagship_pct"]
+
+    n_rows = len(base)
+    cost_shape = (n_rows,) + scen_shape
+    be_shape = cost_shape + (len(tiers), len(margins))
+    tier_b = tiers.reshape((1,) * ndim + (-1, 1))
+    margin_b = margins.reshape((1,) * ndim + (1, -1))
+
+    per_row = max(1, int(np.prod(scen_shape)) * len(tiers) * len(margins))
+    block = max(1, BLOCK_CELLS // per_row)
+
+    def blocks():
+        for lo in range(0, n_rows, block):
+            hi = min(n_rows, lo + block)
+            x = {c: swept[c] if c in swept else on_axis(base_cols[c][lo:hi], 0) for c in MODEL_INPUTS}
+            c_blk = np.broadcast_to(cost_per_million(x), (hi - lo,) + scen_shape)
+            be_blk = break_even_price(c_blk[..., None, None], tier_b, margin_b)
+            yield lo, hi, c_blk.astype(np.float32), be_blk.astype(np.float32)
+    return (cost_shape, be_shape), tiers, margins, blocks()
+
+def sweep(base, axes):
+    """Cube complet en mémoire (usage bibliothèque): (cost, break_even, tiers, margins), cf. sweep_blocks."""
+    (cost_shape, be_shape), tiers, margins, blocks = sweep_blocks(base, axes)
+    cost = np.empty(cost_shape, dtype=np.float32)
+    be = np.empty(be_shape, dtype=np.float32)
+    for lo, hi, c_blk, be_blk in blocks:
+        cost[lo:hi] = c_blk
+        be[lo:hi] = be_blk
+    return cost, be, tiers, margins
+
+def write_npz(path, payload, shapes, blocks, compress=False):
+    """
+    .npz lisible par np.load, écrit en flux: `payload` (petits tableaux) d'abord, puis les cubes
+    cost_per_million_tokens_usd / break_even_usd bloc par bloc. Les blocs couvrent des lignes consécutives
+    (premier axe, ordre C): chaque cube est une entrée .npy du zip, écrite sans être assemblée en mémoire.
+    """
+    mode = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+    names = ("cost_per_million_tokens_usd", "break_even_usd")
+    with zipfile.ZipFile(path, "w", compression=mode, allowZip64=True) as zf:
+        for name, arr in payload.items():
+            with zf.open(f"{name}.npy", "w", force_zip64=True) as f:
+                np.lib.format.write_array(f, np.asanyarray(arr), allow_pickle=False)
+        # Deux entrées écrites en parallèle impossibles dans un zip: le cube break-even passe par un
+        # fichier temporaire (même disque que la sortie), le cube de coût est écrit directement.
+        tmp_path = path + ".be.tmp"
+        try:
+            with open(tmp_path, "wb") as tmp, zf.open(f"{names[0]}.npy", "w", force_zip64=True) as f:
+                for name, shape, out in ((names[0], shapes[0], f), (names[1], shapes[1], tmp)):
+                    np.lib.format.write_array_header_1_0(
+                        out, {"descr": np.lib.format.dtype_to_descr(np.dtype(np.float32)),
+                              "fortran_order": False, "shape": shape})
+                for _, _, c_blk, be_blk in blocks:
+                    f.write(np.ascontiguousarray(c_blk).tobytes())
+                    tmp.write(np.ascontiguousarray(be_blk).tobytes())
+            with open(tmp_path, "rb") as tmp, zf.open(f"{names[1]}.npy", "w", force_zip64=True) as f:
+                while chunk := tmp.read(1 << 24):
+                    f.write(chunk)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Balayage de scénarios (mois × company × scénario) en un passage NumPy.")
+    ap.add_argument("--start", required=True, help="YYYY-MM (ex: 2023-08)")
+    ap.add_argument("--end",   required=True, help="YYYY-MM (ex: 2026-09)")
+    ap.add_argument("--out",   required=True, help="Sortie .npz (colonnaire, float32)")
+    ap.add_argument("--config", help="JSON {\"axes\": {nom: liste | {start,stop,num|step}}}")
+    ap.add_argument("--axis", action="append", default=[],
+                    help="nom=a:b:n ou nom=v1,v2,... (répétable, surcharge --config)")
+    ap.add_argument("--eia_prices", default="data/eia_electricity_us_commercial.csv")
+    ap.add_argument("--gpu_overrides", default="data/gpu_hour_overrides.csv")
+    ap.add_argument("--region_prices", default="data/eia_electricity_us_commercial_by_region.csv")
+    ap.add_argument("--company_regions", default="data/company_regions.csv")
+    ap.add_argument("--compress", action="store_true", help="Entrées du .npz compressées (zip DEFLATE, comme np.savez_compressed): plus lent, plus petit")
+    args = ap.parse_args(argv)
+
+    axes = load_axes(args.config, args.axis)
+    base = build_inputs(args.start, args.end, args.eia_prices, args.gpu_overrides,
+                        args.region_prices, args.company_regions)
+
+    t0 = time.perf_counter()
+    (cost_shape, be_shape), tiers, margins, blocks = sweep_blocks(base, axes)
+
+    model_axes = [a for a in axes if a in MODEL_INPUTS]
+    payload = {
+        "date": base["date"].to_numpy(dtype=str),
+        "company": base["company"].to_numpy(dtype=str),
+        "axes": np.array(model_axes, dtype=str),
+        "tier_tokens": tiers,
+        "target_margin": margins,
+    }
+    for a in model_axes:
+        payload[f"axis__{a}"] = axes[a]
+
+    out_dir = os.path.dirname(args.out)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    out = args.out if args.out.endswith(".npz") else args.out + ".npz"  # comme np.savez
+    write_npz(out, payload, (cost_shape, be_shape), blocks, args.compress)
+    dt = time.perf_counter() - t0
+
+    print(f"Axes: {model_axes} | tiers: {tiers.tolist()} | marges: {margins.tolist()}")
+    print(f"Cube coût {cost_shape} ({int(np.prod(cost_shape)):,} cellules), "
+          f"break-even {be_shape} ({int(np.prod(be_shape)):,} cellules)")
+    print(f"Évalué et écrit par blocs en {dt:.3f}s — wrote {out}")
+
+if __name__ == "__main__":
+    main()
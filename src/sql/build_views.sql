@@ -1,4 +1,5 @@
 -- Vue: coût / 1M tokens calculé dynamiquement (utilise les colonnes intrants)
+-- Formules dupliquées dans refresh_cost_views(): modifier les deux ensemble
 CREATE OR REPLACE VIEW v_cost_per_1m_dynamic AS
 WITH per_type AS (
   SELECT
@@ -24,19 +25,175 @@ SELECT
 FROM costs c
 ORDER BY c.date, c.company;
 
--- Vue: break-even standard (1M tokens / abo / mois, marge 70%)
-CREATE OR REPLACE VIEW v_break_even_standard_dynamic AS
-WITH params AS (SELECT 1000000.0::NUMERIC AS tokens_per_user, 0.70::NUMERIC AS target_margin),
-joined AS (
-  SELECT le.date, le.company, v.blended_cost_per_1m
+-- ---------------------------------------------------------------------------
+-- Versions matérialisées (dashboards): tables indexées sur (date, company),
+-- rafraîchies incrémentalement par refresh_cost_views() — seules les lignes de
+-- llm_economics modifiées depuis le dernier rafraîchissement sont recalculées.
+-- ---------------------------------------------------------------------------
+
+-- Paramètres: paliers (tokens / abonné / mois) et marges cibles → une requête = toute la grille
+CREATE TABLE IF NOT EXISTS param_tiers (
+  tier TEXT PRIMARY KEY,
+  tokens_per_user NUMERIC NOT NULL CHECK (tokens_per_user > 0)
+);
+INSERT INTO param_tiers (tier, tokens_per_user) VALUES
+  ('lite', 200000), ('standard', 1000000), ('pro', 5000000)
+ON CONFLICT (tier) DO NOTHING;
+
+CREATE TABLE IF NOT EXISTS param_margins (
+  target_margin NUMERIC PRIMARY KEY CHECK (target_margin >= 0 AND target_margin < 1)
+);
+INSERT INTO param_margins (target_margin) VALUES (0.70) ON CONFLICT (target_margin) DO NOTHING;
+
+-- Horodatage de modification (posé par trigger, y compris sur les upserts de load_db.py)
+ALTER TABLE llm_economics ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+CREATE INDEX IF NOT EXISTS ix_llm_economics_updated_at ON llm_economics (updated_at);
+
+-- Protocole watermark: chaque écriture dans llm_economics prend le verrou consultatif du rafraîchissement
+-- en mode partagé (avant sa première ligne) et horodate ses lignes à l'heure d'écriture (clock_timestamp,
+-- pas NOW() = début de transaction). refresh_cost_views() prend le même verrou en exclusif: il attend que
+-- les écritures en cours soient validées (donc visibles), et toute écriture postérieure est horodatée
+-- après la fin du rafraîchissement, donc au-delà du watermark. Aucune ligne n'échappe au suivant.
+CREATE OR REPLACE FUNCTION lock_cost_sources() RETURNS trigger AS $$
+BEGIN
+  PERFORM pg_advisory_xact_lock_shared(hashtext('refresh_cost_views'));
+  RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION touch_updated_at() RETURNS trigger AS $$
+BEGIN
+  NEW.updated_at := clock_timestamp();
+  RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_llm_economics_lock ON llm_economics;
+CREATE TRIGGER trg_llm_economics_lock BEFORE INSERT OR UPDATE OR DELETE ON llm_economics
+  FOR EACH STATEMENT EXECUTE FUNCTION lock_cost_sources();
+
+DROP TRIGGER IF EXISTS trg_llm_economics_touch ON llm_economics;
+CREATE TRIGGER trg_llm_economics_touch BEFORE INSERT OR UPDATE ON llm_economics
+  FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+
+-- Coût / 1M tokens matérialisé (formules de v_cost_per_1m_dynamic, recopiées dans refresh_cost_views)
+CREATE TABLE IF NOT EXISTS mv_cost_per_1m (
+  date DATE NOT NULL,
+  company VARCHAR(50) NOT NULL,
+  total_1m_mini NUMERIC,
+  total_1m_flagship NUMERIC,
+  blended_cost_per_1m NUMERIC,
+  refreshed_at TIMESTAMPTZ NOT NULL,
+  PRIMARY KEY (date, company)
+);
+CREATE INDEX IF NOT EXISTS ix_mv_cost_per_1m_company_date ON mv_cost_per_1m (company, date);
+
+-- Break-even pour chaque palier × marge
+CREATE TABLE IF NOT EXISTS mv_break_even (
+  date DATE NOT NULL,
+  company VARCHAR(50) NOT NULL,
+  tier TEXT NOT NULL,
+  tokens_per_user NUMERIC NOT NULL,
+  target_margin NUMERIC NOT NULL,
+  blended_cost_per_1m NUMERIC,
+  cost_per_user_month NUMERIC,
+  break_even_price_usd NUMERIC,
+  PRIMARY KEY (date, company, tier, target_margin)
+);
+CREATE INDEX IF NOT EXISTS ix_mv_break_even_company_date ON mv_break_even (company, date);
+
+CREATE TABLE IF NOT EXISTS mv_refresh_state (
+  view_name TEXT PRIMARY KEY,
+  watermark TIMESTAMPTZ NOT NULL,
+  refreshed_at TIMESTAMPTZ NOT NULL
+);
+
+-- Rafraîchit mv_cost_per_1m puis mv_break_even. Retour: nb de (date, company) recalculés.
+-- Incrémental: lignes dont updated_at > watermark; full_refresh => tout recalculer.
+-- Le break-even est aussi recalculé pour les paliers / marges ajoutés ou modifiés.
+-- Verrou exclusif (cf. lock_cost_sources): sûr en parallèle des chargements et des autres rafraîchissements.
+CREATE OR REPLACE FUNCTION refresh_cost_views(full_refresh BOOLEAN DEFAULT FALSE) RETURNS INTEGER AS $$
+DECLARE
+  wm TIMESTAMPTZ;
+  new_wm TIMESTAMPTZ;
+  ts TIMESTAMPTZ := clock_timestamp();
+  n INTEGER;
+BEGIN
+  -- Attend les écritures en cours dans llm_economics; les suivantes attendent la fin de ce rafraîchissement
+  PERFORM pg_advisory_xact_lock(hashtext('refresh_cost_views'));
+  SELECT watermark INTO wm FROM mv_refresh_state WHERE view_name = 'cost';
+  IF full_refresh OR wm IS NULL THEN
+    wm := '-infinity';
+    TRUNCATE mv_cost_per_1m, mv_break_even;
+  END IF;
+  SELECT COALESCE(MAX(updated_at), wm) INTO new_wm FROM llm_economics;
+
+  -- Formules de v_cost_per_1m_dynamic recopiées ici: l'ORDER BY de la vue empêche de la remonter dans la
+  -- requête, elle serait calculée sur toute la table à chaque rafraîchissement. Ici seules les lignes
+  -- au-delà du watermark sont lues (ix_llm_economics_updated_at).
+  INSERT INTO mv_cost_per_1m (date, company, total_1m_mini, total_1m_flagship, blended_cost_per_1m, refreshed_at)
+  SELECT le.date, le.company, t.mini, t.flagship,
+         t.mini * (le.mix_mini_pct/100.0) + t.flagship * (le.mix_flagship_pct/100.0), ts
   FROM llm_economics le
-  JOIN v_cost_per_1m_dynamic v USING (date, company)
-)
+  CROSS JOIN LATERAL (
+    SELECT (1000000.0 / (NULLIF(le.throughput_tok_s_mini,0) * 3600.0))     AS mini,
+           (1000000.0 / (NULLIF(le.throughput_tok_s_flagship,0) * 3600.0)) AS flagship
+  ) h
+  CROSS JOIN LATERAL (
+    SELECT (h.mini * le.gpu_price_hour_mini
+            + (le.gpu_power_w_mini/1000.0) * le.pue * h.mini * le.electricity_price_usd_kwh)             AS mini,
+           (h.flagship * le.gpu_price_hour_flagship
+            + (le.gpu_power_w_flagship/1000.0) * le.pue * h.flagship * le.electricity_price_usd_kwh) AS flagship
+  ) t
+  WHERE le.updated_at > wm
+  ON CONFLICT (date, company) DO UPDATE SET
+    total_1m_mini = EXCLUDED.total_1m_mini,
+    total_1m_flagship = EXCLUDED.total_1m_flagship,
+    blended_cost_per_1m = EXCLUDED.blended_cost_per_1m,
+    refreshed_at = EXCLUDED.refreshed_at;
+  GET DIAGNOSTICS n = ROW_COUNT;
+
+  -- Lignes supprimées de llm_economics / paramètres retirés
+  DELETE FROM mv_cost_per_1m m
+  WHERE NOT EXISTS (SELECT 1 FROM llm_economics le WHERE le.date = m.date AND le.company = m.company);
+  DELETE FROM mv_break_even b
+  WHERE NOT EXISTS (SELECT 1 FROM mv_cost_per_1m m WHERE m.date = b.date AND m.company = b.company)
+     OR NOT EXISTS (SELECT 1 FROM param_tiers t WHERE t.tier = b.tier)
+     OR NOT EXISTS (SELECT 1 FROM param_margins p WHERE p.target_margin = b.target_margin);
+
+  INSERT INTO mv_break_even (date, company, tier, tokens_per_user, target_margin,
+                             blended_cost_per_1m, cost_per_user_month, break_even_price_usd)
+  SELECT c.date, c.company, t.tier, t.tokens_per_user, p.target_margin, c.blended_cost_per_1m,
+         c.blended_cost_per_1m * t.tokens_per_user / 1000000.0,
+         c.blended_cost_per_1m * t.tokens_per_user / 1000000.0 / (1 - p.target_margin)
+  FROM mv_cost_per_1m c
+  CROSS JOIN param_tiers t
+  CROSS JOIN param_margins p
+  LEFT JOIN mv_break_even b
+    ON b.date = c.date AND b.company = c.company AND b.tier = t.tier AND b.target_margin = p.target_margin
+  WHERE c.refreshed_at = ts OR b.date IS NULL OR b.tokens_per_user <> t.tokens_per_user
+  ON CONFLICT (date, company, tier, target_margin) DO UPDATE SET
+    tokens_per_user = EXCLUDED.tokens_per_user,
+    blended_cost_per_1m = EXCLUDED.blended_cost_per_1m,
+    cost_per_user_month = EXCLUDED.cost_per_user_month,
+    break_even_price_usd = EXCLUDED.break_even_price_usd;
+
+  INSERT INTO mv_refresh_state (view_name, watermark, refreshed_at) VALUES ('cost', new_wm, ts)
+  ON CONFLICT (view_name) DO UPDATE SET watermark = EXCLUDED.watermark, refreshed_at = EXCLUDED.refreshed_at;
+  RETURN n;
+END
+$$ LANGUAGE plpgsql;
+
+SELECT refresh_cost_views();
+
+-- Vue: break-even standard (1M tokens / abo / mois, marge 70%) — lue dans la table matérialisée
+CREATE OR REPLACE VIEW v_break_even_standard_dynamic AS
 SELECT
-  j.date,
-  j.company,
-  j.blended_cost_per_1m,
-  (j.blended_cost_per_1m * (SELECT tokens_per_user FROM params) / 1000000.0) AS cost_per_user_month,
-  (j.blended_cost_per_1m * (SELECT tokens_per_user FROM params) / 1000000.0) / (1 - (SELECT target_margin FROM params)) AS break_even_price_usd
-FROM joined j
-ORDER BY j.date, j.company;
+  b.date,
+  b.company,
+  b.blended_cost_per_1m,
+  b.cost_per_user_month,
+  b.break_even_price_usd
+FROM mv_break_even b
+WHERE b.tier = 'standard' AND b.target_margin = 0.70
+ORDER BY b.date, b.company;
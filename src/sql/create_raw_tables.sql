@@ -1,8 +1,8 @@
 -- Schéma brut et table finale
 
 CREATE TABLE IF NOT EXISTS raw_openai_pricing (
-  fetched_at TIMESTAMP DEFAULT NOW(),
-  model TEXT,
+  fetched_at TIMESTAMP NOT NULL DEFAULT NOW(),
+  model TEXT NOT NULL,
   price_per_million_input NUMERIC,
   price_per_million_output NUMERIC,
   currency TEXT,
@@ -10,8 +10,8 @@ CREATE TABLE IF NOT EXISTS raw_openai_pricing (
 );
 
 CREATE TABLE IF NOT EXISTS raw_anthropic_pricing (
-  fetched_at TIMESTAMP DEFAULT NOW(),
-  model TEXT,
+  fetched_at TIMESTAMP NOT NULL DEFAULT NOW(),
+  model TEXT NOT NULL,
   price_per_million_input NUMERIC,
   price_per_million_output NUMERIC,
   currency TEXT,
@@ -19,18 +19,18 @@ CREATE TABLE IF NOT EXISTS raw_anthropic_pricing (
 );
 
 CREATE TABLE IF NOT EXISTS raw_vast_gpu_market (
-  fetched_at TIMESTAMP DEFAULT NOW(),
+  fetched_at TIMESTAMP NOT NULL DEFAULT NOW(),
   gpu_model TEXT,
   hourly_price_usd NUMERIC,
   location TEXT,
-  provider_id TEXT,
+  provider_id TEXT NOT NULL,
   spot BOOLEAN,
   source_url TEXT
 );
 
 CREATE TABLE IF NOT EXISTS raw_lambda_gpu_pricing (
-  fetched_at TIMESTAMP DEFAULT NOW(),
-  gpu_model TEXT,
+  fetched_at TIMESTAMP NOT NULL DEFAULT NOW(),
+  gpu_model TEXT NOT NULL,
   hourly_price_usd NUMERIC,
   instance_type TEXT,
   notes TEXT,
@@ -39,10 +39,10 @@ CREATE TABLE IF NOT EXISTS raw_lambda_gpu_pricing (
 
 CREATE TABLE IF NOT EXISTS raw_eia_electricity (
   fetched_at TIMESTAMP DEFAULT NOW(),
-  date DATE,
+  date DATE NOT NULL,
   price_usd_per_kwh NUMERIC,
-  sector TEXT,
-  region TEXT,
+  sector TEXT NOT NULL,
+  region TEXT NOT NULL,
   source_series_id TEXT,
   source_url TEXT
 );
@@ -70,3 +70,21 @@ CREATE TABLE IF NOT EXISTS llm_economics (
     price_per_million_tokens_usd NUMERIC,
     gross_margin_pct NUMERIC
 );
+
+-- Clés naturelles: cibles des upserts INSERT ... ON CONFLICT de src/load_db.py. Colonnes NOT NULL: une clé
+-- NULL ne déclenche jamais ON CONFLICT (chaque rechargement ajouterait une ligne).
+-- Sur une base existante, supprimer ou dater les lignes à clé NULL et dédoublonner avant: ces ALTER et
+-- les index échouent sinon.
+ALTER TABLE raw_openai_pricing     ALTER COLUMN fetched_at SET NOT NULL, ALTER COLUMN model SET NOT NULL;
+ALTER TABLE raw_anthropic_pricing  ALTER COLUMN fetched_at SET NOT NULL, ALTER COLUMN model SET NOT NULL;
+ALTER TABLE raw_vast_gpu_market    ALTER COLUMN fetched_at SET NOT NULL, ALTER COLUMN provider_id SET NOT NULL;
+ALTER TABLE raw_lambda_gpu_pricing ALTER COLUMN fetched_at SET NOT NULL, ALTER COLUMN gpu_model SET NOT NULL,
+                                   ALTER COLUMN source_url SET NOT NULL;
+ALTER TABLE raw_eia_electricity    ALTER COLUMN date SET NOT NULL, ALTER COLUMN region SET NOT NULL,
+                                   ALTER COLUMN sector SET NOT NULL;
+CREATE UNIQUE INDEX IF NOT EXISTS ux_raw_openai_pricing     ON raw_openai_pricing (fetched_at, model);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_raw_anthropic_pricing  ON raw_anthropic_pricing (fetched_at, model);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_raw_vast_gpu_market    ON raw_vast_gpu_market (fetched_at, provider_id);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_raw_lambda_gpu_pricing ON raw_lambda_gpu_pricing (fetched_at, gpu_model, source_url);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_raw_eia_electricity    ON raw_eia_electricity (date, region, sector);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_llm_economics          ON llm_economics (date, company);
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Stockage colonnaire (Parquet/Arrow) des tables raw_* et de la table finale llm_economics.
+
+Mêmes colonnes que src/sql/create_raw_tables.sql (types SQL → types Arrow), datasets
+partitionnés façon Hive sous <root>/<table>/, lecture memory-mappée avec projection de
+colonnes et filtres poussés (partitions élaguées, row groups filtrés par statistiques).
+Le CSV ne sert plus qu'à l'export. pyarrow est importé à l'usage.
+"""
+import argparse, glob, os, shutil, time, uuid
+import pandas as pd
+
+DEFAULT_ROOT = os.path.join("data", "store")
+
+# Colonnes et types de create_raw_tables.sql (l'id SERIAL de llm_economics n'est pas stocké)
+SCHEMAS = {
+    "raw_openai_pricing": {
+        "fetched_at": "timestamp", "model": "text", "price_per_million_input": "numeric",
+        "price_per_million_output": "numeric", "currency": "text", "source_url": "text",
+    },
+    "raw_anthropic_pricing": {
+        "fetched_at": "timestamp", "model": "text", "price_per_million_input": "numeric",
+        "price_per_million_output": "numeric", "currency": "text", "source_url": "text",
+    },
+    "raw_vast_gpu_market": {
+        "fetched_at": "timestamp", "gpu_model": "text", "hourly_price_usd": "numeric",
+        "location": "text", "provider_id": "text", "spot": "boolean", "source_url": "text",
+    },
+    "raw_lambda_gpu_pricing": {
+        "fetched_at": "timestamp", "gpu_model": "text", "hourly_price_usd": "numeric",
+        "instance_type": "text", "notes": "text", "source_url": "text",
+    },
+    "raw_eia_electricity": {
+        "fetched_at": "timestamp", "date": "date", "price_usd_per_kwh": "numeric", "sector": "text",
+        "region": "text", "source_series_id": "text", "source_url": "text",
+    },
+    "llm_economics": {
+        "date": "date", "company": "text",
+        "run_rate_revenue_usd": "numeric", "tokens_volume_est_m": "numeric",
+        "mix_mini_pct": "numeric", "mix_flagship_pct": "numeric",
+        "gpu_type_mini": "text", "gpu_type_flagship": "text",
+        "gpu_price_hour_mini": "numeric", "gpu_price_hour_flagship": "numeric",
+        "gpu_power_w_mini": "numeric", "gpu_power_w_flagship": "numeric",
+        "throughput_tok_s_mini": "numeric", "throughput_tok_s_flagship": "numeric",
+        "pue": "numeric", "electricity_price_usd_kwh": "numeric",
+        "price_per_million_tokens_usd": "numeric", "cost_per_million_tokens_usd": "numeric",
+        "gross_margin_pct": "numeric",
+        # Colonnes du build absentes du SQL (calculées par v_break_even_*): gardées pour l'export
+        "break_even_lite_usd": "numeric", "break_even_standard_usd": "numeric", "break_even_pro_usd": "numeric",
+    },
+}
+
+# Colonne temporelle de chaque table (filtres start/end) et clés de partition Hive
+DATE_COLUMN = {t: ("date" if "date" in cols else "fetched_at") for t, cols in SCHEMAS.items()}
+PARTITIONS = {t: ["month"] for t in SCHEMAS}
+PARTITIONS["llm_economics"] = ["company"]
+
+def _arrow_type(kind):
+    import pyarrow as pa
+    return {
+        "text": pa.string(), "numeric": pa.float64(), "boolean": pa.bool_(),
+        "date": pa.date32(), "timestamp": pa.timestamp("s"),
+    }[kind]
+
+def schema_columns(table, extra=()):
+    """Colonnes typées de `table`; `extra` (attributs d'entité de la grille: model, region...) en texte après company."""
+    cols = list(SCHEMAS[table].items())
+    extra = [(c, "text") for c in extra if c not in SCHEMAS[table]]
+    i = [c for c, _ in cols].index("company") + 1 if "company" in SCHEMAS[table] else len(cols)
+    return dict(cols[:i] + extra + cols[i:])
+
+def arrow_schema(table, partitioned=False, extra=()):
+    import pyarrow as pa
+    fields = [pa.field(c, _arrow_type(k)) for c, k in schema_columns(table, extra).items()]
+    if partitioned:
+        fields += [pa.field(p, pa.string()) for p in PARTITIONS[table] if p not in SCHEMAS[table]]
+    return pa.schema(fields)
+
+def coerce(df, table, extra=()):
+    """
+    Aligne un DataFrame sur le schéma: colonnes manquantes → nulles, en trop → ignorées (sauf `extra`,
+    gardées en texte); conversions vectorisées (décimales à virgule "3,2", dates 'YYYY-MM' / 'YYYYMM',
+    booléens texte).
+    """
+    out = pd.DataFrame(index=df.index)
+    for col, kind in schema_columns(table, extra).items():
+        s = df[col] if col in df.columns else pd.Series(None, index=df.index, dtype=object)
+        if kind == "numeric":
+            if s.dtype == object or pd.api.types.is_string_dtype(s):
+                s = s.astype("string").str.strip().str.replace(r"[€$\s]", "", regex=True).str.replace(",", ".", regex=False)
+                try:
+                    # Parse exact (arrondi correct, comme float()): relire un CSV redonne les mêmes valeurs
+                    s = s.astype("float64")
+                except ValueError:
+                    s = pd.to_numeric(s, errors="coerce")
+            s = pd.to_numeric(s, errors="coerce").astype("float64")
+        elif kind in ("date", "timestamp"):
+            if not pd.api.types.is_datetime64_any_dtype(s):
+                txt = s.astype("string").str.strip()
+                txt = txt.where(~txt.str.fullmatch(r"\d{6}", na=False), txt.str[:4] + "-" + txt.str[4:6])
+                s = pd.to_datetime(txt, errors="coerce", format="mixed")
+            s = s.dt.tz_localize(None) if getattr(s.dt, "tz", None) is not None else s
+            s = s.dt.normalize() if kind == "date" else s
+        elif kind == "boolean":
+            if s.dtype != bool:
+                s = s.astype("string").str.lower().map({"true": True, "1": True, "false": False, "0": False})
+            s = s.astype("boolean")
+        else:
+            s = s.astype("string")
+        out[col] = s
+    return out
+
+def to_arrow(df, table, extra=()):
+    import pyarrow as pa
+    return pa.Table.from_pandas(coerce(df, table, extra), schema=arrow_schema(table, extra=extra), preserve_index=False)
+
+def table_path(root, table):
+    return os.path.join(root, table)
+
+def _with_partition_keys(df, table, extra=()):
+    out = coerce(df, table, extra)
+    for p in PARTITIONS[table]:
+        if p == "month":
+            out["month"] = out[DATE_COLUMN[table]].dt.strftime("%Y-%m").fillna("unknown")
+        else:
+            out[p] = out[p].fillna("unknown")
+    return out.sort_values(DATE_COLUMN[table], kind="stable")
+
+def _write_dataset(data, target, table, behavior):
+    """Table ou dataset Arrow (lu en flux) → dataset partitionné sous `target`."""
+    import pyarrow as pa, pyarrow.dataset as ds
+    part = ds.partitioning(pa.schema([pa.field(p, pa.string()) for p in PARTITIONS[table]]), flavor="hive")
+    ds.write_dataset(data, target, format="parquet", partitioning=part,
+                     basename_template=f"part-{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}-{{i}}.parquet",
+                     existing_data_behavior=behavior, max_rows_per_group=256_000)
+
+def write_table(df, table, root=DEFAULT_ROOT, mode="append", extra=()):
+    """
+    `extra`: colonnes hors schéma à conserver (texte), ex. attributs de grille model/region de llm_economics.
+    mode:
+    - "append": nouveaux fichiers dans les partitions (historique, imports successifs)
+    - "replace_partitions": remplace uniquement les partitions présentes dans `df`
+    - "overwrite": remplace toute la table (écrite à côté puis basculée par renommage)
+    """
+    import pyarrow as pa, pyarrow.dataset as ds
+    if table not in SCHEMAS:
+        raise ValueError(f"Table inconnue: {table} (disponibles: {list(SCHEMAS)})")
+    data = pa.Table.from_pandas(_with_partition_keys(df, table, extra),
+                                schema=arrow_schema(table, partitioned=True, extra=extra), preserve_index=False)
+    dest = table_path(root, table)
+    target = f"{dest}.tmp-{os.getpid()}" if mode == "overwrite" else dest
+    behavior = {"append": "overwrite_or_ignore", "replace_partitions": "delete_matching",
+                "overwrite": "overwrite_or_ignore"}[mode]
+    _write_dataset(data, target, table, behavior)
+    if mode == "overwrite":
+        old = f"{dest}.old-{os.getpid()}"
+        if os.path.exists(dest):
+            os.replace(dest, old)
+        os.replace(target, dest)
+        shutil.rmtree(old, ignore_errors=True)
+    return data.num_rows
+
+def dataset(table, root=DEFAULT_ROOT, memory_map=True):
+    import pyarrow as pa, pyarrow.dataset as ds, pyarrow.fs as pafs
+    part = ds.partitioning(pa.schema([pa.field(p, pa.string()) for p in PARTITIONS[table]]), flavor="hive")
+    return ds.dataset(os.path.abspath(table_path(root, table)), format="parquet", partitioning=part,
+                      filesystem=pafs.LocalFileSystem(use_mmap=memory_map))
+
+def _bound(value, kind):
+    """'YYYY-MM' ou 'YYYY-MM-DD' → scalaire Arrow du type de la colonne."""
+    import pyarrow as pa
+    ts = pd.Timestamp(value + "-01" if len(value) == 7 else value)
+    return pa.scalar(ts.date(), type=pa.date32()) if kind == "date" else pa.scalar(ts, type=pa.timestamp("s"))
+
+def build_filter(table, start=None, end=None, companies=None):
+    """Expression de filtre: partition `month` élaguée + bornes sur la colonne date + company."""
+    import pyarrow.dataset as ds
+    col, kind = DATE_COLUMN[table], SCHEMAS[table][DATE_COLUMN[table]]
+    expr = None
+    def add(e):
+        nonlocal expr
+        expr = e if expr is None else expr & e
+    if start:
+        add(ds.field(col) >= _bound(start, kind))
+        if "month" in PARTITIONS[table]:
+            add(ds.field("month") >= start[:7])
+    if end:
+        # fin incluse: 'YYYY-MM' couvre tout le mois
+        upper = (pd.Timestamp(end + "-01") + pd.offsets.MonthBegin(1)).strftime("%Y-%m-%d") if len(end) == 7 else None
+        add(ds.field(col) < _bound(upper, kind) if upper else ds.field(col) <= _bound(end, kind))
+        if "month" in PARTITIONS[table]:
+            add(ds.field("month") <= end[:7])
+    if companies:
+        if "company" not in SCHEMAS[table]:
+            raise ValueError(f"{table} n'a pas de colonne company")
+        add(ds.field("company").isin(list(companies)))
+    return expr
+
+def read_table(table, root=DEFAULT_ROOT, columns=None, start=None, end=None, companies=None,
+               memory_map=True, as_arrow=False):
+    """
+    Lecture projetée (colonnes) et filtrée (start/end 'YYYY-MM[-DD]', companies), memory-mappée.
+    Sans `columns`: schéma de la table plus les colonnes en trop des fichiers (attributs model, region...).
+    """
+    dset = dataset(table, root, memory_map)
+    if columns:
+        cols = list(columns)
+    else:
+        extra = [c for c in dset.schema.names if c not in SCHEMAS[table] and c not in PARTITIONS[table]]
+        cols = list(schema_columns(table, extra))
+    tbl = dset.to_table(columns=cols, filter=build_filter(table, start, end, companies))
+    return tbl if as_arrow else tbl.to_pandas()
+
+def read_frame(path, table=None):
+    """Fichier .parquet ou dataset (répertoire) → DataFrame; dates en texte ISO comme dans les CSV."""
+    import pyarrow.dataset as ds
+    df = ds.dataset(path, format="parquet", partitioning="hive").to_table().to_pandas()
+    for c in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[c]):
+            df[c] = df[c].dt.strftime("%Y-%m-%d")
+        elif df[c].dtype == object and len(df[c].dropna()) and hasattr(df[c].dropna().iloc[0], "isoformat"):
+            df[c] = pd.to_datetime(df[c]).dt.strftime("%Y-%m-%d")
+    return df
+
+def write_frame(df, path, table, extra=()):
+    """Fichier Parquet unique typé selon le schéma de `table` (ex: --out *.parquet du build), plus `extra` en texte."""
+    import pyarrow.parquet as pq
+    out_dir = os.path.dirname(path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    tmp = f"{path}.tmp{os.getpid()}"
+    pq.write_table(to_arrow(df, table, extra), tmp)
+    os.replace(tmp, path)
+
+def import_csv(paths, table, root=DEFAULT_ROOT, chunksize=500_000, mode="append"):
+    """
+    CSV (ex: snapshots data/vast_history/**) → dataset, par chunks (mémoire bornée).
+
+    replace_partitions: delete_matching ne vaut que pour un appel à write_dataset, or une partition
+    peut être touchée par plusieurs fichiers/chunks. Les chunks sont donc empilés dans un dataset
+    temporaire sous `root`, puis réécrits en un seul write_dataset (lu en flux) qui remplace toutes
+    les partitions touchées; un import interrompu laisse la table intacte.
+    """
+    if mode == "replace_partitions":
+        stage = os.path.join(root, f".import-{os.getpid()}-{uuid.uuid4().hex[:8]}")
+        try:
+            total = import_csv(paths, table, stage, chunksize, mode="append")
+            if total:
+                _write_dataset(dataset(table, stage), table_path(root, table), table, "delete_matching")
+        finally:
+            shutil.rmtree(stage, ignore_errors=True)
+        return total
+    total = 0
+    for i, path in enumerate(paths):
+        for j, chunk in enumerate(pd.read_csv(path, dtype=str, chunksize=chunksize)):
+            if "snapshot_at" in chunk.columns:
+                # Historique Vast: l'horodatage du snapshot est le vrai fetched_at
+                chunk["fetched_at"] = pd.to_datetime(chunk["snapshot_at"], format="%Y%m%dT%H%M%SZ", errors="coerce")
+            first = i == 0 and j == 0
+            total += write_table(chunk, table, root, mode=mode if first else "append")
+    return total
+
+def export_csv(table, out, root=DEFAULT_ROOT, **filters):
+    df = read_table(table, root, **filters)
+    for col, kind in SCHEMAS[table].items():
+        if kind == "date" and col in df.columns:
+            df[col] = pd.to_datetime(df[col]).dt.strftime("%Y-%m-%d")
+    df.to_csv(out, index=False)
+    return len(df)
+
+def info(root=DEFAULT_ROOT):
+    import pyarrow.parquet as pq
+    for table in SCHEMAS:
+        files = glob.glob(os.path.join(table_path(root, table), "**", "*.parquet"), recursive=True)
+        if not files:
+            continue
+        rows = sum(pq.ParquetFile(f).metadata.num_rows for f in files)
+        size = sum(os.path.getsize(f) for f in files)
+        parts = {os.path.basename(os.path.dirname(f)) for f in files}
+        print(f"{table:<24} {rows:>12,} lignes  {size / 1e6:9.2f} Mo  {len(files):>5} fichiers  {len(parts):>4} partitions")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Stockage Parquet partitionné (tables raw_* et llm_economics).")
+    ap.add_argument("--root", default=DEFAULT_ROOT)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    imp = sub.add_parser("import", help="CSV → dataset")
+    imp.add_argument("table", choices=list(SCHEMAS))
+    imp.add_argument("paths", nargs="+", help="Fichiers CSV (globs acceptés, ** récursif)")
+    imp.add_argument("--mode", choices=["append", "replace_partitions", "overwrite"], default="append")
+    exp = sub.add_parser("export", help="dataset → CSV (filtré / projeté)")
+    exp.add_argument("table", choices=list(SCHEMAS))
+    exp.add_argument("out")
+    exp.add_argument("--columns", default="", help="Colonnes séparées par des virgules")
+    exp.add_argument("--start", help="YYYY-MM[-DD]")
+    exp.add_argument("--end", help="YYYY-MM[-DD] (inclus)")
+    exp.add_argument("--company", action="append", default=[], help="Répétable (llm_economics)")
+    sub.add_parser("info", help="Lignes / taille / partitions par table")
+    args = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    if args.cmd == "import":
+        paths = sorted(p for pat in args.paths for p in glob.glob(pat, recursive=True))
+        n = import_csv(paths, args.table, args.root, mode=args.mode)
+        print(f"Importé {n} lignes ({len(paths)} fichiers) dans {table_path(args.root, args.table)} "
+              f"en {time.perf_counter() - t0:.2f}s")
+    elif args.cmd == "export":
+        cols = [c for c in args.columns.split(",") if c] or None
+        n = export_csv(args.table, args.out, args.root, columns=cols, start=args.start, end=args.end,
+                       companies=args.company or None)
+        print(f"Wrote {n} rows to {args.out} ({time.perf_counter() - t0:.2f}s)")
+    else:
+        info(args.root)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+import os, sys
+
+# Les scripts de src/ s'importent entre eux par nom de module (comme lancés depuis src/)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
@@ -0,0 +1,42 @@
+import pytest
+import pandas as pd
+
+from build_monthly_series import OUTPUT_COLS, load_grid, output_columns
+
+def test_grid_attributes_follow_company():
+    freq, ents = load_grid({"freq": "daily", "entities": [
+        {"company": "OpenAI/gpt-4o", "model": "gpt-4o", "region": "CA"},
+        {"company": "Anthropic/sonnet", "model": "sonnet", "region": "TX", "pue": 1.12}]})
+    assert freq == "D"
+    assert list(ents["company"]) == ["OpenAI/gpt-4o", "Anthropic/sonnet"]
+    cols = output_columns(ents)
+    assert cols[cols.index("company") + 1:cols.index("company") + 3] == ["model", "region"]
+
+def test_grid_rejects_duplicate_company():
+    # (date, company) est la clé en aval: deux modèles d'une même company seraient écrasés
+    with pytest.raises(SystemExit, match="company en double"):
+        load_grid({"entities": [{"company": "OpenAI", "model": "gpt-4o"}, {"company": "OpenAI", "model": "o3"}]})
+
+def test_parquet_and_store_keep_grid_attributes(tmp_path):
+    pytest.importorskip("pyarrow")
+    from build_monthly_series import write_outputs
+    from storage import read_frame, read_table
+    df = pd.DataFrame({"date": ["2025-03-01", "2025-03-01"], "company": ["OpenAI/gpt-4o", "Anthropic/sonnet"],
+                       "model": ["gpt-4o", "sonnet"], "region": ["CA", "TX"], "cost_per_million_tokens_usd": [2.0, 3.0]})
+    df = df.reindex(columns=OUTPUT_COLS + ["model", "region"])
+    out, store = str(tmp_path / "series.parquet"), str(tmp_path / "store")
+    write_outputs(df, out, store)
+    back = read_frame(out)
+    assert list(back.columns) == output_columns(df)
+    assert list(back["region"]) == ["CA", "TX"]
+    stored = read_table("llm_economics", store).sort_values("company")
+    assert list(stored.columns) == output_columns(df)
+    assert list(stored["model"]) == ["sonnet", "gpt-4o"]
+
+@pytest.mark.parametrize("flag, value", [("--mc-chunk", "0"), ("--mc-chunk", "-5"), ("--mc-chunk", "x"),
+                                         ("--mc-workers", "0")])
+def test_mc_sizes_must_be_positive(flag, value, capsys):
+    from build_monthly_series import main
+    with pytest.raises(SystemExit):
+        main(["--start", "2025-01", "--end", "2025-02", "--out", "x.csv", "--monte-carlo", "10", flag, value])
+    assert flag in capsys.readouterr().err
@@ -0,0 +1,42 @@
+import asyncio
+
+import fetch_lambda_gpu as lg
+
+class Resp:
+    def __init__(self, text):
+        self.text = text
+
+    def raise_for_status(self):
+        pass
+
+class Session:
+    def __init__(self, html):
+        self.html = html
+
+    def get(self, url, timeout=None, **kw):
+        return Resp(self.html)
+
+class NoBrowser:
+    async def render_many(self, urls, timeout_ms=30000):
+        raise AssertionError("Chromium lancé alors que le HTML statique avait des prix")
+
+class FakeBrowser:
+    def __init__(self, html):
+        self.html, self.rendered = html, []
+
+    async def render_many(self, urls, timeout_ms=30000):
+        self.rendered += urls
+        return [self.html for _ in urls]
+
+H100_ONLY = "<div><h3>NVIDIA H100 SXM</h3><p>$2.49 / GPU / hr</p></div>"
+
+def test_static_page_with_one_target_skips_browser():
+    rows, how = asyncio.run(lg.fetch_prices([lg.URL], session=Session(H100_ONLY), pool=NoBrowser()))
+    assert how == {lg.URL: "static"}
+    assert [(r["gpu_model"], r["hourly_price_usd"]) for r in rows] == [("H100", 2.49)]
+
+def test_page_without_prices_is_rendered():
+    browser = FakeBrowser(H100_ONLY)
+    rows, how = asyncio.run(lg.fetch_prices([lg.URL], session=Session("<div id='app'></div>"), pool=browser))
+    assert how == {lg.URL: "browser"} and browser.rendered == [lg.URL]
+    assert [r["gpu_model"] for r in rows] == ["H100"]
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import goal_seek as gs
+from build_monthly_series import DEFAULTS, break_even_price, cost_per_million
+
+@pytest.fixture
+def x():
+    rows = [dict(DEFAULTS), {**DEFAULTS, "pue": 1.3, "mix_mini_pct": 60.0, "mix_flagship_pct": 40.0,
+                             "throughput_tok_s_flagship": 180.0, "electricity_price_usd_kwh": 0.2}]
+    return gs.model_inputs(pd.DataFrame(rows))
+
+@pytest.mark.parametrize("method", ["closed", "bisect"])
+@pytest.mark.parametrize("var", gs.MODEL_INPUTS)
+def test_solve_round_trip(x, var, method):
+    current = cost_per_million(x)                      # (R, 1)
+    targets = current * np.array([[0.9, 1.0, 1.1]])    # (R, K)
+    v, ok = gs.solve(x, var, targets, method)
+    assert ok[:, 1].all()  # la cible = coût actuel est toujours atteignable
+    np.testing.assert_allclose(v[:, 1], x[var][:, 0], rtol=1e-6)
+    np.testing.assert_allclose(gs.evaluate(x, var, v)[ok], targets[ok], rtol=1e-9)
+
+def test_closed_and_bisect_agree(x):
+    targets = cost_per_million(x) * np.array([[0.8, 1.25]])
+    for var in gs.MODEL_INPUTS:
+        closed, ok_c = gs.solve(x, var, targets, "closed")
+        bisect, ok_b = gs.solve(x, var, targets, "bisect")
+        both = ok_c & ok_b
+        np.testing.assert_allclose(closed[both], bisect[both], rtol=1e-6)
+
+def test_break_even_round_trip():
+    cost = np.array([0.5, 2.0, 7.5])
+    price = break_even_price(cost, 1_000_000, 0.6)
+    np.testing.assert_allclose(gs.target_cost_from_break_even(price, 1_000_000, 0.6), cost, rtol=1e-12)
+
+def test_mix_sensitivity_is_total_derivative(x):
+    # le complément suit: dérivée le long de mini + flagship = 100, pas à flagship fixé
+    sens = gs.sensitivities(x)["mix_mini_pct"]["d_cost_d_input"]
+    v = x["mix_mini_pct"]
+    fd = (gs.evaluate(x, "mix_mini_pct", v + 1e-3) - gs.evaluate(x, "mix_mini_pct", v - 1e-3)) / 2e-3
+    np.testing.assert_allclose(sens, fd.ravel(), rtol=1e-6)
+
+@pytest.mark.parametrize("args", [["--margin", "1"], ["--margin", "-0.1"], ["--tokens", "0"], ["--tokens", "nan"]])
+def test_cli_rejects_invalid_tokens_and_margin(args, capsys):
+    with pytest.raises(SystemExit):
+        gs.main(["--start", "2025-01", "--end", "2025-02", "--sensitivities", "s.csv", *args])
+    assert ("margin" if args[0] == "--margin" else "tokens") in capsys.readouterr().err
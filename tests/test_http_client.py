@@ -0,0 +1,57 @@
+import json, os, time
+
+import requests
+
+from http_client import ResponseCache, make_session
+
+def response(body):
+    r = requests.Response()
+    r.status_code = 200
+    r._content = body
+    r.headers["ETag"] = '"v1"'
+    return r
+
+def store(cache, url, body, stored_at=None):
+    key = cache.key("GET", url)
+    meta = cache.store(key, response(body), url)
+    if stored_at is not None:
+        meta["stored_at"] = stored_at
+        cache._atomic_write(cache._meta_path(key), json.dumps(meta).encode())
+    return key, meta
+
+def blobs(cache):
+    root = os.path.join(cache.root, "blobs")
+    return sorted(f for d in os.listdir(root) for f in os.listdir(os.path.join(root, d)))
+
+def test_prune_removes_orphaned_blobs(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    store(cache, "https://example.com/pricing", b"v1")
+    key, new = store(cache, "https://example.com/pricing", b"v2")  # la page a changé: v1 orpheline
+    assert len(blobs(cache)) == 2
+    assert cache.prune(grace=0) == (0, 1, 2)
+    assert blobs(cache) == [new["sha256"]]
+    assert cache.lookup(key)["sha256"] == new["sha256"]
+
+def test_prune_recent_orphans_are_kept(tmp_path):
+    # un store() concurrent écrit le corps avant l'entrée
+    cache = ResponseCache(str(tmp_path))
+    store(cache, "https://example.com/pricing", b"v1")
+    store(cache, "https://example.com/pricing", b"v2")
+    assert cache.prune() == (0, 0, 0)
+
+def test_prune_caps_age_and_size(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_age=3600, max_bytes=250)
+    now = time.time()
+    keys = [store(cache, f"https://example.com/{i}", bytes([i]) * 100, now - (7200 if i == 0 else 10 - i))[0]
+            for i in range(4)]
+    # 0 expirée, puis 250 octets: seules les deux plus récentes (3, 2) tiennent
+    assert cache.prune(grace=0)[:2] == (2, 2)
+    assert [cache.lookup(k) is not None for k in keys] == [False, False, True, True]
+
+def test_replay_never_prunes(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    key, _ = store(cache, "https://example.com/a", b"a", stored_at=0.0)
+    make_session(cache_dir=str(tmp_path), cache_mode="replay")
+    assert cache.lookup(key) is not None
+    make_session(cache_dir=str(tmp_path), cache_mode="on")
+    assert cache.lookup(key) is None
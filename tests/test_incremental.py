@@ -0,0 +1,60 @@
+import os, sys
+
+import pytest
+
+from incremental import dirty_months, load_manifest, main, manifest_path, up_to_date
+
+def write_eia(path, prices):
+    rows = "".join(f"{d},{p},commercial,US_weighted,s,u\n" for d, p in prices.items())
+    path.write_text("date,price_usd_per_kwh,sector,region,source_series_id,source_url\n" + rows, encoding="utf-8")
+
+@pytest.fixture
+def build(tmp_path):
+    eia = tmp_path / "eia.csv"
+    write_eia(eia, {"2024-01-01": 0.12, "2024-02-01": 0.13, "2024-03-01": 0.14, "2024-04-01": 0.15})
+    argv = ["--start", "2024-01", "--end", "2024-04", "--out", str(tmp_path / "series.csv"), "--eia_prices", str(eia),
+            "--gpu_overrides", str(tmp_path / "none.csv"), "--region_prices", str(tmp_path / "none.csv"),
+            "--company_regions", str(tmp_path / "none.csv")]
+    return eia, argv
+
+def test_dirty_months():
+    months = {"2024-01-01": "a", "2024-02-01": "b", "2024-03-01": "c"}
+    assert dirty_months(months, None) == sorted(months)
+    assert dirty_months(months, {"months": {"2024-01-01": "a", "2024-02-01": "x"}}) == ["2024-02-01", "2024-03-01"]
+    assert dirty_months(months, {"months": months}, full=True) == sorted(months)
+
+def test_manifest_and_changed_month(build, capsys):
+    eia, argv = build
+    out = argv[argv.index("--out") + 1]
+    main(argv)
+    assert "4/4 mois" in capsys.readouterr().out
+    manifest = load_manifest(out)
+    assert sorted(manifest["months"]) == ["2024-01-01", "2024-02-01", "2024-03-01", "2024-04-01"]
+    assert manifest["output"]["sha256"] and os.path.exists(manifest_path(out))
+    before = open(out, encoding="utf-8").read().splitlines()
+
+    assert up_to_date(argv + ["--incremental"])
+    assert "À jour" in capsys.readouterr().out
+
+    # Un seul mois EIA modifié: seul ce mois est recalculé, les autres lignes restent identiques
+    write_eia(eia, {"2024-01-01": 0.12, "2024-02-01": 0.13, "2024-03-01": 0.20, "2024-04-01": 0.15})
+    assert not up_to_date(argv + ["--incremental"])
+    main(argv)
+    assert "incrémental: 1/4 mois" in capsys.readouterr().out
+    after = open(out, encoding="utf-8").read().splitlines()
+    assert [a == b for a, b in zip(before, after)] == [True] * 5 + [False] * 2 + [True] * 2
+
+def test_up_to_date_defers_to_build(build):
+    _, argv = build
+    main(argv)
+    # Options propres au build, abréviations, --help: le build valide et exécute lui-même
+    assert not up_to_date(argv + ["--incremental", "--grid", "g.json"])
+    assert not up_to_date(argv + ["--incremental", "--sto", "x"])
+    assert not up_to_date(argv + ["--incremental", "--help"])
+    assert not up_to_date(argv)
+
+def test_fast_path_skips_pandas(build, monkeypatch):
+    _, argv = build
+    main(argv)
+    monkeypatch.setitem(sys.modules, "pandas", None)  # tout import de pandas échouerait
+    main(argv)
@@ -0,0 +1,68 @@
+import csv, os
+
+import pytest
+
+import load_db
+
+PRICING = [
+    {"model": "gpt-4o", "price_per_million_input": "2.50", "price_per_million_output": "10.00",
+     "currency": "USD", "source_url": "https://openai.com/pricing", "raw": "$2.50 / $10.00"},
+    {"model": "gpt-4o-mini", "price_per_million_input": "0.15", "price_per_million_output": "0.60",
+     "currency": "USD", "source_url": "https://openai.com/pricing", "raw": "$0.15 / $0.60"},
+]
+
+def write_rows(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=list(rows[0]))
+        w.writeheader()
+        w.writerows(rows)
+    return str(path)
+
+def count(target, table):
+    cur = target.conn.cursor()
+    cur.execute(f"SELECT COUNT(*) FROM {table}")
+    return cur.fetchone()[0]
+
+@pytest.fixture(params=["sqlite", "duckdb"])
+def target(request, tmp_path):
+    if request.param == "duckdb":
+        pytest.importorskip("duckdb")
+    t = load_db.connect(f"{request.param}:///{tmp_path / 'llm.db'}")
+    t.init_schema()
+    yield t
+    t.close()
+
+@pytest.mark.parametrize("table", ["raw_openai_pricing", "raw_anthropic_pricing"])
+def test_reload_without_fetched_at_is_idempotent(target, tmp_path, table):
+    # CSV des anciens fetchers: pas de colonne fetched_at, date passée explicitement
+    path = write_rows(tmp_path / "pricing.csv", PRICING)
+    assert target.load(table, path, fetched_at="2026-09") == 2
+    os.utime(path, (0, 0))  # la clé ne dépend pas du mtime
+    assert target.load(table, path, fetched_at="2026-09") == 2
+    assert count(target, table) == 2
+
+def test_missing_fetched_at_is_refused(target, tmp_path):
+    path = write_rows(tmp_path / "pricing.csv", PRICING)
+    with pytest.raises(ValueError, match="--fetched-at"):
+        target.load("raw_openai_pricing", path)
+    assert count(target, "raw_openai_pricing") == 0
+
+def test_reload_with_fetched_at_is_idempotent(target, tmp_path):
+    rows = [dict(r, fetched_at="2026-10-01") for r in PRICING]
+    path = write_rows(tmp_path / "pricing.csv", rows)
+    target.load("raw_openai_pricing", path)
+    target.load("raw_openai_pricing", path)
+    assert count(target, "raw_openai_pricing") == 2
+
+def test_rows_without_key_are_skipped(target, tmp_path):
+    path = write_rows(tmp_path / "pricing.csv", PRICING + [dict(PRICING[0], model="")])
+    assert target.load("raw_openai_pricing", path, fetched_at="2026-09-01") == 2
+    assert count(target, "raw_openai_pricing") == 2
+
+def test_llm_economics_reload(target, tmp_path):
+    rows = [{"date": f"2026-0{m}-01", "company": c, "cost_per_million_tokens_usd": "1.5"}
+            for m in (1, 2, 3) for c in ("OpenAI", "Anthropic")]
+    path = write_rows(tmp_path / "build.csv", rows)
+    target.load("llm_economics", path)
+    target.load("llm_economics", path)
+    assert count(target, "llm_economics") == 6
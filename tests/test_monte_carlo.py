@@ -0,0 +1,34 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import monte_carlo as mc
+from build_monthly_series import DEFAULTS
+
+HEAVY = {"seed": 7, "inputs": {
+    # Queue lourde (dépasse les bornes du pilote) + prix GPU parfois négatifs (coûts <= 0)
+    "throughput_tok_s_flagship": {"dist": "lognormal", "median": 1.0, "sigma": 1.5, "relative": True},
+    "gpu_price_hour_mini": {"dist": "normal", "mean": 1.0, "sd": 3.0, "relative": True},
+}}
+
+def test_tails_are_rebinned_not_clipped(tmp_path):
+    cfg = tmp_path / "mc.json"
+    cfg.write_text(json.dumps(HEAVY), encoding="utf-8")
+    df = pd.DataFrame([{"date": "2026-09-01", "company": "OpenAI", **DEFAULTS}])
+    out = tmp_path / "mc.csv"
+    mc.run_monte_carlo(df, 200_000, str(cfg), str(out), workers=1, chunk_size=50_000)
+    res = pd.read_csv(out).iloc[0]
+
+    base = {c: float(DEFAULTS[c]) for c in mc.MODEL_INPUTS}
+    draws = np.concatenate([mc.sample_cost(base, HEAVY["inputs"], mc._rng(7, 0, k), 50_000) for k in range(4)])
+    valid = draws[np.isfinite(draws) & (draws > 0)]
+    for q in (5, 50, 95):
+        assert res[f"cost_per_million_tokens_usd_p{q}"] == pytest.approx(np.percentile(valid, q), rel=5e-3)
+    assert res["invalid_pct"] == pytest.approx(100 * (1 - valid.size / draws.size))
+
+def test_chunk_size_must_be_positive(tmp_path):
+    df = pd.DataFrame([{"date": "2026-09-01", "company": "OpenAI", **DEFAULTS}])
+    with pytest.raises(ValueError, match="chunk_size"):
+        mc.run_monte_carlo(df, 100, str(tmp_path / "mc.json"), str(tmp_path / "mc.csv"), chunk_size=0)
@@ -0,0 +1,42 @@
+import pytest
+
+from price_extract import available_backends, extract_gpu_prices, extract_llm_prices, synthetic_page
+
+BACKENDS = available_backends()
+
+def llm(html, backend):
+    return [(r["model"], r["price_per_million_input"], r["price_per_million_output"])
+            for r in extract_llm_prices(html, backend)]
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_page_without_closing_head(backend):
+    html = ("<html><head><title>gpt-5 $9 / 1M tokens</title><body>"
+            "<div>gpt-4o Input $2.50 / 1M tokens Output $10 / 1M tokens</div></body></html>")
+    assert llm(html, backend) == [("gpt-4o", 2.5, 10.0)]
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_labels_in_table_header(backend):
+    html = ("<table><thead><tr><th>Model</th><th>Input</th><th>Output</th></tr></thead><tbody>"
+            "<tr><td>gpt-4o</td><td>$2.50 / 1M tokens</td><td>$10.00 / 1M tokens</td></tr>"
+            "<tr><td>gpt-4o-mini</td><td>$0.15 / 1M tokens</td><td>$0.60 / 1M tokens</td></tr>"
+            "</tbody></table>")
+    assert llm(html, backend) == [("gpt-4o", 2.5, 10.0), ("gpt-4o-mini", 0.15, 0.6)]
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_scripts_and_styles_are_ignored(backend):
+    html = ("<html><head><style>.x{}</style></head><body><script>var p = 'gpt-4o $1 / 1M';</script>"
+            "<p>claude sonnet 4 Input $3 / MTok Output $15 / MTok</p></body></html>")
+    assert llm(html, backend) == [("claude-sonnet-4", 3.0, 15.0)]
+
+def test_backends_agree():
+    pytest.importorskip("lxml")
+    page = synthetic_page(300)
+    assert llm(page, "lxml") == llm(page, "html.parser")
+    assert list(extract_gpu_prices(page, backend="lxml")) == list(extract_gpu_prices(page, backend="html.parser"))
+    no_head_end = "<html><head><title>t</title><body>" + page.split("<body>", 1)[1]
+    assert llm(no_head_end, "lxml") == llm(page, "html.parser")
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_inline_label_after_price(backend):
+    html = "<p>gpt-4o-mini $0.15 per 1M input tokens, $0.60 per 1M output tokens</p>"
+    assert llm(html, backend) == [("gpt-4o-mini", 0.15, 0.6)]
@@ -0,0 +1,84 @@
+import json, threading, urllib.error, urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from build_monthly_series import break_even_price
+from quote_service import QuoteService, make_handler
+
+@pytest.fixture
+def service(tmp_path):
+    path = tmp_path / "series.csv"
+    path.write_text("date,company,cost_per_million_tokens_usd\n"
+                    "2025-03-01,OpenAI,2.0\n2025-03-01,Anthropic,3.0\n2025-04-01,OpenAI,\n", encoding="utf-8")
+    return QuoteService(str(path))
+
+@pytest.fixture
+def server(service):
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(service))
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+def request(url, body=None):
+    req = urllib.request.Request(url, data=None if body is None else json.dumps(body).encode())
+    try:
+        with urllib.request.urlopen(req, timeout=5) as r:
+            return r.status, json.loads(r.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+def test_quote(service):
+    q = service.quote("OpenAI", "2025-03", 2e6, 0.6)
+    assert q["price_usd"] == pytest.approx(break_even_price(2.0, 2e6, 0.6))
+
+@pytest.mark.parametrize("tokens, margin", [(1e6, 1), (1e6, 1.5), (1e6, -0.1), (0, 0.5), (-5, 0.5),
+                                            ("abc", 0.5), (1e6, "nan")])
+def test_quote_rejects_invalid_inputs(service, tokens, margin):
+    with pytest.raises(ValueError):
+        service.quote("OpenAI", "2025-03", tokens, margin)
+
+def test_quote_many_reports_errors_per_item(service):
+    out = service.quote_many([
+        {"company": "OpenAI", "date": "2025-03", "tokens": 1e6, "margin": 1},
+        {"company": "OpenAI", "date": "2025-03", "tokens": 0},
+        {"company": "OpenAI", "date": "2025-04", "tokens": 1e6},
+        {"company": "Anthropic", "date": "2025-03", "tokens": 1e6, "margin": 0.5},
+    ])
+    assert [("error" in q) for q in out] == [True, True, True, False]
+    assert out[3]["price_usd"] == pytest.approx(6.0)
+    json.dumps(out, allow_nan=False)
+
+def test_http_invalid_margin_is_400(server):
+    code, body = request(f"{server}/quote?company=OpenAI&date=2025-03&tokens=1000000&margin=1")
+    assert code == 400 and "margin" in body["error"]
+    code, body = request(f"{server}/quote?company=OpenAI&date=2025-03&tokens=-1")
+    assert code == 400 and "tokens" in body["error"]
+    code, _ = request(f"{server}/quote?company=OpenAI&date=2025-03&tokens=1000000&margin=0.6")
+    assert code == 200
+
+def test_http_batch_stays_valid_json(server):
+    code, body = request(f"{server}/quote/batch", [{"company": "OpenAI", "date": "2025-03", "tokens": 1e6, "margin": 1}])
+    assert code == 200 and "error" in body[0]
+
+def test_quote_many_normalizes_tokens(service):
+    out = service.quote_many([{"company": "OpenAI", "date": "2025-03", "tokens": "2000000", "margin": "0.6"}])
+    assert out[0]["tokens_per_month"] == 2e6 and isinstance(out[0]["tokens_per_month"], float)
+    assert out[0] == service.quote("OpenAI", "2025-03", "2000000", "0.6")
+
+@pytest.fixture
+def empty_server(tmp_path):
+    path = tmp_path / "empty.csv"
+    path.write_text("date,company,cost_per_million_tokens_usd\n", encoding="utf-8")
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(QuoteService(str(path))))
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+def test_empty_series_is_503(empty_server):
+    for code, body in (request(f"{empty_server}/health"),
+                       request(f"{empty_server}/quote?company=OpenAI&date=2025-03&tokens=1000000"),
+                       request(f"{empty_server}/quote/batch", [{"company": "OpenAI", "date": "2025-03", "tokens": 1e6}])):
+        assert code == 503 and "série vide" in body["error"]
@@ -0,0 +1,35 @@
+import time
+
+from run_pipeline import playwright_timeout_ms, run_dag, time_left
+
+STAGES = {
+    "fetch": ((), lambda ctx: 3),
+    "build": (("fetch",), lambda ctx: 1),
+}
+
+def test_run_dag_without_deadline():
+    # --deadline 0 → session.deadline None: pas de budget, pas de TypeError
+    status = run_dag(list(STAGES), {"deadline": None}, stages=STAGES)
+    assert {n: s[0] for n, s in status.items()} == {"fetch": "ok", "build": "ok"}
+
+def test_run_dag_deadline_exceeded():
+    slow = {"fetch": ((), lambda ctx: time.sleep(0.5)), "build": (("fetch",), lambda ctx: 1)}
+    status = run_dag(list(slow), {"deadline": time.monotonic() + 0.05}, stages=slow)
+    assert status["fetch"][0] == "timeout" and status["build"][0] == "skipped"
+
+def test_time_budget_helpers():
+    assert time_left(None) is None
+    assert playwright_timeout_ms({"deadline": None}) == 30000
+    assert playwright_timeout_ms({"deadline": time.monotonic() + 5}) <= 5000
+    assert playwright_timeout_ms({"deadline": time.monotonic() - 5}) == 1000
+
+def test_llmecon_lambda_without_deadline(monkeypatch, tmp_path):
+    import fetch_lambda_gpu, llmecon
+    seen = {}
+    async def fake_fetch(urls, session=None, timeout_ms=None, **kw):
+        seen["timeout_ms"] = timeout_ms
+        return [], "static"
+    monkeypatch.setattr(fetch_lambda_gpu, "fetch_prices", fake_fetch)
+    ctx = {"deadline": None, "session": None, "checkpoints": None}
+    assert llmecon.run_lambda(ctx) == 0
+    assert seen["timeout_ms"] == 30000
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import scenario_sweep
+from build_monthly_series import DEFAULTS
+from scenario_sweep import load_axes, sweep, sweep_blocks, write_npz
+
+@pytest.mark.parametrize("axis", ["target_margin=0.5,1.0", "target_margin=-0.1", "pue=nan,1.1", "pue=1.1,inf",
+                                  "pue=-1:1:3", "tier_tokens=0,1000", "throughput_tok_s_mini=0:100:3",
+                                  "mix_mini_pct=50,120", "gpu_price_hour_flagship=-2"])
+def test_axis_out_of_domain_is_rejected(axis):
+    with pytest.raises(SystemExit, match=axis.split("=")[0]):
+        load_axes(cli_axes=[axis])
+
+def test_valid_axes():
+    axes = load_axes(cli_axes=["target_margin=0,0.5,0.9", "pue=1.05:1.25:5", "mix_mini_pct=0,100"])
+    assert list(axes) == ["target_margin", "pue", "mix_mini_pct"]
+    assert axes["pue"].size == 5
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_npz_matches_sweep(tmp_path, monkeypatch, compress):
+    base = pd.DataFrame({c: np.full(7, v) * np.linspace(0.9, 1.1, 7) for c, v in DEFAULTS.items()})
+    axes = load_axes(cli_axes=["pue=1.05:1.25:3", "mix_mini_pct=60,80", "target_margin=0.5,0.7"])
+    monkeypatch.setattr(scenario_sweep, "BLOCK_CELLS", 20)  # plusieurs blocs de lignes
+    cost, be, tiers, margins = sweep(base, axes)
+    shapes, _, _, blocks = sweep_blocks(base, axes)
+    path = str(tmp_path / "cube.npz")
+    write_npz(path, {"tier_tokens": tiers, "target_margin": margins}, shapes, blocks, compress)
+    with np.load(path) as z:
+        np.testing.assert_array_equal(z["cost_per_million_tokens_usd"], cost)
+        np.testing.assert_array_equal(z["break_even_usd"], be)
+        np.testing.assert_array_equal(z["target_margin"], [0.5, 0.7])
+    assert cost.shape == (7, 3, 2) and be.shape == (7, 3, 2, len(tiers), 2)
+    assert not (tmp_path / "cube.npz.be.tmp").exists()
@@ -0,0 +1,31 @@
+import pytest
+
+pytest.importorskip("pyarrow")
+
+import storage
+
+def write_month(path, month, n):
+    rows = "".join(f"{month}-0{d}T00:00:00,H100,{2 + d / 10},US,p{d},false,https://vast.ai\n" for d in range(1, n + 1))
+    path.write_text("fetched_at,gpu_model,hourly_price_usd,location,provider_id,spot,source_url\n" + rows, encoding="utf-8")
+    return str(path)
+
+def months(root):
+    df = storage.read_table("raw_vast_gpu_market", str(root))
+    return df["fetched_at"].dt.strftime("%Y-%m").value_counts().to_dict()
+
+def test_replace_partitions_spans_files_and_chunks(tmp_path):
+    root = tmp_path / "store"
+    paths = [write_month(tmp_path / "jan.csv", "2024-01", 3), write_month(tmp_path / "feb.csv", "2024-02", 5)]
+    storage.import_csv(paths, "raw_vast_gpu_market", str(root), mode="append")
+    # chunks de 2 lignes: chaque partition est écrite en plusieurs fois
+    n = storage.import_csv(paths, "raw_vast_gpu_market", str(root), chunksize=2, mode="replace_partitions")
+    assert n == 8
+    assert months(root) == {"2024-01": 3, "2024-02": 5}
+    assert [p.name for p in root.iterdir()] == ["raw_vast_gpu_market"]
+
+def test_replace_partitions_keeps_untouched_months(tmp_path):
+    root = tmp_path / "store"
+    storage.import_csv([write_month(tmp_path / "jan.csv", "2024-01", 3)], "raw_vast_gpu_market", str(root))
+    storage.import_csv([write_month(tmp_path / "feb.csv", "2024-02", 2)], "raw_vast_gpu_market", str(root),
+                       mode="replace_partitions")
+    assert months(root) == {"2024-01": 3, "2024-02": 2}